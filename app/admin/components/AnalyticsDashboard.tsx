@@ -30,6 +30,13 @@ export default function AnalyticsDashboard() {
 
   return (
     <div className="space-y-8">
+      {data.stale && (
+        <div className="text-sm text-muted-foreground">
+          {data.built_at
+            ? `Figures as of ${new Date(data.built_at).toLocaleString()} (rollups are refreshed by build_rollups).`
+            : 'No rollups built yet. Run manage.py build_rollups.'}
+        </div>
+      )}
       {/* Stats Cards */}
       <div className="grid grid-cols-1 md:grid-cols-3 gap-6">
         <div className="bg-card border border-border rounded-xl p-6 flex items-center gap-4 shadow-sm">
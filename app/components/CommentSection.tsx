@@ -16,14 +16,18 @@ interface Comment {
 interface CommentSectionProps {
     mangaId: number;
     chapterId?: number;
+    // Manga/chapter comment_count, so the total shows before every page is loaded
+    count?: number;
 }
 
 import { useAuth } from '../context/AuthContext';
 
 // ... inside component ...
-export default function CommentSection({ mangaId, chapterId }: CommentSectionProps) {
+export default function CommentSection({ mangaId, chapterId, count }: CommentSectionProps) {
     const { user } = useAuth();
     const [comments, setComments] = useState<Comment[]>([]);
+    const [next, setNext] = useState<string | null>(null);
+    const [total, setTotal] = useState<number | undefined>(count);
     const [name, setName] = useState('');
     const [content, setContent] = useState('');
     const [loading, setLoading] = useState(true);
@@ -39,6 +43,7 @@ export default function CommentSection({ mangaId, chapterId }: CommentSectionPro
             const data = response.data;
             const results = Array.isArray(data) ? data : data.results || [];
             setComments(results);
+            setNext(data.next || null);
         } catch (error) {
             console.error("Error fetching comments:", error);
         } finally {
@@ -46,10 +51,26 @@ export default function CommentSection({ mangaId, chapterId }: CommentSectionPro
         }
     };
 
+    // Comments come newest first, a cursor page at a time
+    const loadMore = async () => {
+        if (!next) return;
+        try {
+            const response = await api.get(next);
+            setComments(previous => [...previous, ...response.data.results]);
+            setNext(response.data.next || null);
+        } catch (error) {
+            console.error("Error fetching comments:", error);
+        }
+    };
+
     useEffect(() => {
         fetchComments();
     }, [mangaId, chapterId]);
 
+    useEffect(() => {
+        setTotal(count);
+    }, [count]);
+
     const handleSubmit = async (e: React.FormEvent) => {
         e.preventDefault();
         if (!content.trim()) return;
@@ -67,6 +88,7 @@ export default function CommentSection({ mangaId, chapterId }: CommentSectionPro
             }
 
             await api.post('/api/comments/', payload);
+            setTotal(previous => previous === undefined ? undefined : previous + 1);
             setContent('');
             if (!user) setName('');
             fetchComments(); // Refresh comments
@@ -81,7 +103,7 @@ export default function CommentSection({ mangaId, chapterId }: CommentSectionPro
         <div className="bg-card rounded-xl border border-white/5 p-6 shadow-xl">
             <h3 className="text-xl font-bold text-foreground mb-6 flex items-center gap-2">
                 <MessageSquare className="text-primary" /> Comments
-                <span className="text-sm font-normal text-muted-foreground ml-2">({comments.length})</span>
+                <span className="text-sm font-normal text-muted-foreground ml-2">({total ?? comments.length})</span>
             </h3>
 
             {/* Comment Form */}
@@ -155,6 +177,14 @@ export default function CommentSection({ mangaId, chapterId }: CommentSectionPro
                         No comments yet. Be the first to share your thoughts!
                     </div>
                 )}
+                {next && (
+                    <button
+                        onClick={loadMore}
+                        className="w-full py-2 text-sm text-primary hover:underline"
+                    >
+                        Load more comments
+                    </button>
+                )}
             </div>
         </div>
     );
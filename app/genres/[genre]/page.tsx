@@ -18,33 +18,36 @@ interface Manga {
     rating?: number;
 }
 
+interface Facets {
+    count: number;
+    facets: {
+        genre: Record<string, number>;
+        type: Record<string, number>;
+        status: Record<string, number>;
+    };
+}
+
 export default function GenrePage() {
     const { genre } = useParams();
     const [mangas, setMangas] = useState<Manga[]>([]);
+    const [facets, setFacets] = useState<Facets | null>(null);
     const [loading, setLoading] = useState(true);
     const decodedGenre = decodeURIComponent(genre as string);
 
     useEffect(() => {
         if (genre) {
-            api.get('/api/mangas/')
-                .then(response => {
-                    // Filter locally for now since backend doesn't support filtering yet
-                    // In a real app, we should add ?genre=... to the API
-                    const data = response.data;
-                    const allMangas = Array.isArray(data) ? data : data.results || [];
-                    const filtered = allMangas.filter((m: Manga) => {
-                        // Check if genres is an array (new format) or string (old format fallback)
-                        let genreMatch = false;
-                        if (Array.isArray(m.genres)) {
-                            genreMatch = m.genres.some((g: string) => g.toLowerCase() === decodedGenre.toLowerCase());
-                        } else if (typeof m.genres === 'string') {
-                            genreMatch = (m.genres as string).toLowerCase().includes(decodedGenre.toLowerCase());
-                        }
-                        
-                        const typeMatch = m.type && m.type.toLowerCase() === decodedGenre.toLowerCase();
-                        return genreMatch || typeMatch;
-                    });
-                    setMangas(filtered);
+            const label = encodeURIComponent(decodedGenre);
+            // The page also lists titles whose type matches (e.g. /genres/Manhwa), as before;
+            // or_type merges them server side, in one ordering and one facet count
+            const query = `genre=${label}&or_type=${label}`;
+            Promise.all([
+                api.get(`/api/mangas/?${query}&ordering=last_update&limit=60`),
+                api.get(`/api/mangas/facets/?${query}`)
+            ])
+                .then(([listResponse, facetResponse]) => {
+                    const data = listResponse.data;
+                    setMangas(Array.isArray(data) ? data : data.results || []);
+                    setFacets(facetResponse.data);
                     setLoading(false);
                 })
                 .catch(error => {
@@ -64,8 +67,17 @@ export default function GenrePage() {
                         {decodedGenre} Manga
                     </h1>
                     <p className="text-muted-foreground mt-2">
-                        List of manga in the {decodedGenre} genre.
+                        {facets ? `${facets.count} titles` : 'List of manga'} in the {decodedGenre} genre.
                     </p>
+                    {facets && (
+                        <div className="flex flex-wrap gap-2 mt-4">
+                            {Object.entries({ ...facets.facets.type, ...facets.facets.status }).map(([label, count]) => (
+                                <span key={label} className="bg-secondary text-secondary-foreground text-xs px-3 py-1 rounded-full">
+                                    {label} · {count}
+                                </span>
+                            ))}
+                        </div>
+                    )}
                 </div>
 
                 {loading ? (
@@ -1,6 +1,6 @@
 'use client';
 
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { useAuth } from '../../../../context/AuthContext';
 import { useParams, useRouter } from 'next/navigation';
 import api from '../../../../lib/axios';
@@ -16,15 +16,45 @@ interface Chapter {
     chapter_number: string;
     released_at: string;
     pages: string[];
+    page_variants?: PageVariants[];
     manga: number; // Manga ID
+    comment_count?: number;
 }
 
+interface PageVariants {
+    src: string;
+    width?: number;
+    height?: number;
+    variants: { url: string; width: number; height: number; bytes: number }[];
+}
+
+interface ChapterLink {
+    id: number;
+    chapter_number: string;
+}
+
+interface ReaderBundle {
+    chapter: Chapter;
+    prev: ChapterLink | null;
+    next: (Chapter & ChapterLink) | null;
+}
+
+// Only the header fields; the chapter list is not inlined
 interface Manga {
     id: number;
     title: string;
-    chapters: { id: number; chapter_number: string }[];
 }
 
+interface ProgressEvent {
+    manga: number;
+    chapter: number;
+    page: number;
+    read_at: number;
+}
+
+// Reading progress is queued and sent in batches to /api/history/sync/
+const PROGRESS_SYNC_INTERVAL = 10000;
+
 export default function ChapterReadingPage() {
     const params = useParams();
     const id = params?.id as string;
@@ -33,6 +63,8 @@ export default function ChapterReadingPage() {
     const router = useRouter();
     const [manga, setManga] = useState<Manga | null>(null);
     const [currentChapter, setCurrentChapter] = useState<Chapter | null>(null);
+    const [neighbours, setNeighbours] = useState<{ prev: ChapterLink | null; next: ChapterLink | null }>({ prev: null, next: null });
+    const [pickerChapters, setPickerChapters] = useState<ChapterLink[] | null>(null);
     const [loading, setLoading] = useState(true);
     const [showScrollTop, setShowScrollTop] = useState(false);
 
@@ -55,45 +87,77 @@ export default function ChapterReadingPage() {
 
     useEffect(() => {
         if (id && chapterId) {
-            console.log("Fetching details for Manga:", id, "Chapter:", chapterId);
-            
-            // Fetch Manga Details to get context and chapter list
-            api.get(`/api/mangas/${id}/`)
-                .then(response => {
-                    const mangaData = response.data;
+            // The reader bundle (chapter, neighbours, next chapter's pages) and the
+            // manga header are independent, so fetch them together
+            Promise.all([
+                api.get(`/api/mangas/${id}/`, { params: { fields: 'id,title' } }),
+                api.get('/api/chapters/reader/', { params: { manga: id, number: chapterId } }),
+            ])
+                .then(([mangaResponse, readerResponse]) => {
+                    const mangaData = mangaResponse.data;
+                    const bundle: ReaderBundle = readerResponse.data;
                     setManga(mangaData);
-                    console.log("Manga Data:", mangaData);
-                    
-                    // Find the current chapter from the list
-                    // Ensure robust comparison by converting both to string
-                    const chapter = mangaData.chapters.find((c: any) => String(c.chapter_number) === String(chapterId));
-                    
-                    if (chapter) {
-                        console.log("Found Chapter:", chapter);
-                        // Fetch full chapter details (with pages)
-                        api.get(`/api/chapters/${chapter.id}/`)
-                            .then(chResponse => {
-                                setCurrentChapter(chResponse.data);
-                                setLoading(false);
-                                saveHistory(mangaData, chResponse.data);
-                            })
-                            .catch(err => {
-                                console.error("Error fetching chapter details:", err);
-                                setLoading(false);
-                            });
-                    } else {
-                        console.error("Chapter not found in manga. Available chapters:", mangaData.chapters);
-                        setLoading(false);
-                    }
+                    setCurrentChapter(bundle.chapter);
+                    setNeighbours({ prev: bundle.prev, next: bundle.next });
+                    setLoading(false);
+                    saveHistory(mangaData, bundle.chapter);
+
+                    // Warm the cache with the start of the next chapter
+                    bundle.next?.pages.slice(0, 3).forEach(url => {
+                        const img = new Image();
+                        img.src = getImageUrl(url);
+                    });
                 })
                 .catch(error => {
-                    console.error("Error fetching manga:", error);
+                    console.error("Error fetching chapter:", error);
                     setLoading(false);
                 });
         }
     }, [id, chapterId]);
 
     const { user } = useAuth();
+    const progressQueue = useRef<ProgressEvent[]>([]);
+    const lastPage = useRef<number | null>(null);
+
+    const queueProgress = (page: number) => {
+        if (!user || !currentChapter || lastPage.current === page) return;
+        lastPage.current = page;
+        progressQueue.current.push({ manga: currentChapter.manga, chapter: currentChapter.id, page, read_at: Date.now() });
+    };
+
+    const syncProgress = () => {
+        const events = progressQueue.current;
+        if (events.length === 0) return;
+        progressQueue.current = [];
+        api.post('/api/history/sync/', { events })
+            .catch(err => console.error("Failed to sync reading progress:", err));
+    };
+
+    useEffect(() => {
+        const timer = setInterval(syncProgress, PROGRESS_SYNC_INTERVAL);
+        const onHide = () => document.visibilityState === 'hidden' && syncProgress();
+        document.addEventListener('visibilitychange', onHide);
+        return () => {
+            clearInterval(timer);
+            document.removeEventListener('visibilitychange', onHide);
+            syncProgress();
+        };
+    }, []);
+
+    // The page most of the viewport is on
+    useEffect(() => {
+        if (!currentChapter || !user) return;
+        lastPage.current = null;
+        const observer = new IntersectionObserver(entries => {
+            entries.forEach(entry => {
+                if (entry.isIntersecting) {
+                    queueProgress(Number((entry.target as HTMLElement).dataset.page));
+                }
+            });
+        }, { threshold: 0.5 });
+        document.querySelectorAll('[data-page]').forEach(el => observer.observe(el));
+        return () => observer.disconnect();
+    }, [currentChapter, user]);
 
     const saveHistory = (manga: Manga, chapter: Chapter) => {
         // 1. Save to LocalStorage (Always, for guest support)
@@ -110,12 +174,27 @@ export default function ChapterReadingPage() {
         const newHistory = [historyItem, ...filteredHistory].slice(0, 10);
         localStorage.setItem('reading_history', JSON.stringify(newHistory));
 
-        // 2. Save to Backend (If logged in)
+        // 2. Save to Backend (If logged in): opening a chapter is page 0
         if (user) {
-            api.post('/api/history/update_history/', {
-                manga: manga.id,
-                chapter: chapter.id
-            }).catch(err => console.error("Failed to sync history:", err));
+            progressQueue.current.push({ manga: manga.id, chapter: chapter.id, page: 0, read_at: Date.now() });
+        }
+    };
+
+    // The chapter picker's list is only loaded once it is opened, a compact page at a time
+    const loadPickerChapters = async () => {
+        if (pickerChapters) return;
+        const loaded: ChapterLink[] = [];
+        let url: string | null = `/api/mangas/${id}/chapters/?order=asc&limit=500`;
+        try {
+            while (url) {
+                const response: { data: { fields: string[]; results: any[][]; next: string | null } } = await api.get(url);
+                const { fields, results, next } = response.data;
+                results.forEach(row => loaded.push(Object.fromEntries(fields.map((field, i) => [field, row[i]])) as ChapterLink));
+                url = next;
+            }
+            setPickerChapters(loaded);
+        } catch (err) {
+            console.error("Error fetching chapters:", err);
         }
     };
 
@@ -143,14 +222,12 @@ export default function ChapterReadingPage() {
         );
     }
 
-    // Calculate Next/Prev
-    const sortedChapters = [...manga.chapters].sort((a, b) => {
-        return parseFloat(a.chapter_number) - parseFloat(b.chapter_number);
-    });
+    // Next/Prev come from the reader bundle; the list only feeds the chapter picker
+    // (?order=asc is reading order, parsed server-side, so "10.5" and "Chapter 11" sort correctly)
+    const sortedChapters = pickerChapters ?? [currentChapter];
 
-    const currentIndex = sortedChapters.findIndex(c => String(c.chapter_number) === String(currentChapter.chapter_number));
-    const prevChapter = currentIndex > 0 ? sortedChapters[currentIndex - 1] : null;
-    const nextChapter = currentIndex < sortedChapters.length - 1 ? sortedChapters[currentIndex + 1] : null;
+    const prevChapter = neighbours.prev;
+    const nextChapter = neighbours.next;
 
     return (
         <div className="min-h-screen bg-[#1a1a1a] text-foreground font-sans relative">
@@ -178,6 +255,8 @@ export default function ChapterReadingPage() {
                         <select 
                             value={currentChapter.chapter_number}
                             onChange={(e) => handleChapterChange(e.target.value)}
+                            onFocus={loadPickerChapters}
+                            onMouseDown={loadPickerChapters}
                             className="bg-background border border-border rounded px-4 py-2 text-sm focus:outline-none focus:border-primary min-w-[150px]"
                         >
                             {sortedChapters.map(c => (
@@ -200,15 +279,25 @@ export default function ChapterReadingPage() {
                 {/* Reading Area */}
                 <div className="flex flex-col items-center min-h-[500px]">
                     {currentChapter.pages && currentChapter.pages.length > 0 ? (
-                        currentChapter.pages.map((pageUrl, index) => (
-                            <img 
-                                key={index}
-                                src={getImageUrl(pageUrl)}
-                                alt={`Page ${index + 1}`}
-                                className="w-full max-w-3xl h-auto object-contain"
-                                loading="lazy"
-                            />
-                        ))
+                        currentChapter.pages.map((pageUrl, index) => {
+                            // WebP renditions let the browser pick the width it needs
+                            const page = currentChapter.page_variants?.[index];
+                            const variants = page && page.src === pageUrl ? page.variants : [];
+                            return (
+                                <img 
+                                    key={index}
+                                    data-page={index}
+                                    src={getImageUrl(pageUrl)}
+                                    srcSet={variants.length > 0 ? variants.map(v => `${getImageUrl(v.url)} ${v.width}w`).join(', ') : undefined}
+                                    sizes="(max-width: 768px) 100vw, 768px"
+                                    width={page?.width}
+                                    height={page?.height}
+                                    alt={`Page ${index + 1}`}
+                                    className="w-full max-w-3xl h-auto object-contain"
+                                    loading="lazy"
+                                />
+                            );
+                        })
                     ) : (
                         <div className="p-12 text-center text-muted-foreground">
                             <p>No pages available for this chapter.</p>
@@ -238,7 +327,7 @@ export default function ChapterReadingPage() {
                 
                 {/* Comments Section */}
                 <div className="mt-8">
-                    <CommentSection mangaId={manga.id} chapterId={currentChapter.id} />
+                    <CommentSection mangaId={manga.id} chapterId={currentChapter.id} count={currentChapter.comment_count} />
                 </div>
 
             </main>
@@ -42,33 +42,38 @@ export default function MangaDetailsPage() {
     const [bookmarkId, setBookmarkId] = useState<number | null>(null);
     const [userRating, setUserRating] = useState(0);
     const [hoverRating, setHoverRating] = useState(0);
+    const [chapters, setChapters] = useState<Chapter[]>([]);
+    const [chaptersNext, setChaptersNext] = useState<string | null>(null);
+
+    // /api/mangas/{id}/chapters/ returns rows of `fields` values, a page at a time
+    const loadChapters = (url: string) => {
+        api.get(url)
+            .then(response => {
+                const { fields, results, next } = response.data;
+                const rows: Chapter[] = results.map((row: any[]) =>
+                    Object.fromEntries(fields.map((field: string, i: number) => [field, row[i]]))
+                );
+                setChapters(previous => [...previous, ...rows]);
+                setChaptersNext(next);
+            })
+            .catch(err => console.error("Error fetching chapters:", err));
+    };
 
     useEffect(() => {
         if (id && user) {
-             // Fetch Bookmarks
-             api.get(`/api/bookmarks/`)
+            // Bookmark and rating state for this manga in one call
+            api.get(`/api/mangas/batch/`, { params: { ids: id, fields: 'id' } })
                 .then(response => {
-                    const data = response.data;
-                    const results = Array.isArray(data) ? data : data.results || [];
-                    const bookmark = results.find((b: any) => b.manga === Number(id));
-                    if (bookmark) {
+                    const state = response.data.results[0]?.user;
+                    if (state?.bookmark) {
                         setIsBookmarked(true);
-                        setBookmarkId(bookmark.id);
+                        setBookmarkId(state.bookmark);
                     }
-                })
-                .catch(err => console.error("Error fetching bookmarks:", err));
-
-            // Fetch User Rating
-            api.get(`/api/ratings/`)
-                .then(response => {
-                    const data = response.data;
-                    const results = Array.isArray(data) ? data : data.results || [];
-                    const rating = results.find((r: any) => r.manga === Number(id));
-                    if (rating) {
-                        setUserRating(rating.score);
+                    if (state?.rating) {
+                        setUserRating(state.rating);
                     }
                 })
-                .catch(err => console.error("Error fetching rating:", err));
+                .catch(err => console.error("Error fetching bookmark and rating:", err));
         }
     }, [id, user]);
 
@@ -116,7 +121,7 @@ export default function MangaDetailsPage() {
 
     useEffect(() => {
         if (id) {
-            api.get(`/api/mangas/${id}/`)
+            api.get(`/api/mangas/${id}/`, { params: { chapters: 0 } })
                 .then(response => {
                     setManga(response.data);
                     setLoading(false);
@@ -125,6 +130,9 @@ export default function MangaDetailsPage() {
                     console.error("Error fetching manga details:", error);
                     setLoading(false);
                 });
+
+            setChapters([]);
+            loadChapters(`/api/mangas/${id}/chapters/`);
             
             // Fetch history
             const allHistory = JSON.parse(localStorage.getItem('reading_history') || '[]');
@@ -290,9 +298,9 @@ export default function MangaDetailsPage() {
                                     </div>
                                     
                                     <div className="max-h-[600px] overflow-y-auto custom-scrollbar p-2">
-                                        {manga.chapters && manga.chapters.length > 0 ? (
+                                        {chapters.length > 0 ? (
                                             <div className="grid grid-cols-1 gap-2">
-                                                {manga.chapters.map((chapter) => (
+                                                {chapters.map((chapter) => (
                                                     <Link 
                                                         key={chapter.id} 
                                                         href={`/manga/${manga.id}/chapter/${chapter.chapter_number}`}
@@ -311,6 +319,14 @@ export default function MangaDetailsPage() {
                                                         </span>
                                                     </Link>
                                                 ))}
+                                                {chaptersNext && (
+                                                    <button
+                                                        onClick={() => loadChapters(chaptersNext)}
+                                                        className="p-3 text-sm text-primary hover:bg-white/5 rounded-lg transition-colors"
+                                                    >
+                                                        Load more chapters
+                                                    </button>
+                                                )}
                                             </div>
                                         ) : (
                                             <div className="p-12 text-center text-muted-foreground">
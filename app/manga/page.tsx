@@ -68,7 +68,7 @@ function MangaListContent() {
         if (type) url += `type=${encodeURIComponent(type)}&`;
         
         // Mapping frontend order to backend ordering
-        let ordering = '-updated_at'; // Default to update
+        let ordering = 'last_update'; // Default to update
         if (order === 'latest') ordering = '-created_at';
         if (order === 'popular') ordering = '-views';
         if (order === 'title') ordering = 'title';
@@ -21,6 +21,9 @@ interface Manga {
   rating?: number;
 }
 
+// Only what MangaCard renders
+const CARD_FIELDS = 'id,title,cover_image,rating,type,chapters';
+
 export default function Home() {
   const [mangas, setMangas] = useState<Manga[]>([]);
   const [popularMangas, setPopularMangas] = useState<Manga[]>([]);
@@ -45,7 +48,7 @@ export default function Home() {
   const fetchLatestMangas = async (page: number) => {
     try {
       const offset = (page - 1) * LIMIT;
-      const response = await api.get(`/api/mangas/?limit=${LIMIT}&offset=${offset}`);
+      const response = await api.get(`/api/mangas/?limit=${LIMIT}&offset=${offset}&fields=${CARD_FIELDS}`);
       const data = response.data;
       
       if (Array.isArray(data)) {
@@ -65,7 +68,7 @@ export default function Home() {
   const fetchPopularMangas = async (page: number) => {
     try {
       const offset = (page - 1) * POPULAR_LIMIT;
-      const response = await api.get(`/api/mangas/?ordering=-views&limit=${POPULAR_LIMIT}&offset=${offset}`);
+      const response = await api.get(`/api/mangas/?ordering=-views&limit=${POPULAR_LIMIT}&offset=${offset}&fields=${CARD_FIELDS}`);
       const data = response.data;
 
       if (Array.isArray(data)) {
@@ -13,21 +13,27 @@ export default function ProfilePage() {
     const { user, loading: authLoading } = useAuth();
     const [bookmarks, setBookmarks] = useState<any[]>([]);
     const [history, setHistory] = useState<any[]>([]);
+    // Unread chapter counts by manga id, from /api/bookmarks/updates/
+    const [unread, setUnread] = useState<Record<number, number>>({});
     const [loading, setLoading] = useState(true);
 
     useEffect(() => {
         if (user) {
             const fetchData = async () => {
                 try {
-                    const [bookmarksRes, historyRes] = await Promise.all([
+                    const [bookmarksRes, historyRes, updatesRes] = await Promise.all([
                         api.get('/api/bookmarks/'),
-                        api.get('/api/history/')
+                        api.get('/api/history/'),
+                        api.get('/api/bookmarks/updates/')
                     ]);
                     const bookmarksData = bookmarksRes.data;
                     const historyData = historyRes.data;
                     
                     setBookmarks(Array.isArray(bookmarksData) ? bookmarksData : bookmarksData.results || []);
                     setHistory(Array.isArray(historyData) ? historyData : historyData.results || []);
+                    setUnread(Object.fromEntries(
+                        updatesRes.data.results.map((row: any) => [row.manga, row.unread_count])
+                    ));
                 } catch (error) {
                     console.error("Error fetching profile data:", error);
                 } finally {
@@ -114,6 +120,11 @@ export default function ProfilePage() {
                                             <p className="text-xs text-muted-foreground mt-1">
                                                 Added on {new Date(bookmark.created_at).toLocaleDateString()}
                                             </p>
+                                            {unread[bookmark.manga] > 0 && (
+                                                <span className="bg-primary/20 text-primary text-xs px-2 py-1 rounded font-bold mt-2 self-start">
+                                                    {unread[bookmark.manga]} new
+                                                </span>
+                                            )}
                                         </div>
                                         <button 
                                             onClick={(e) => {
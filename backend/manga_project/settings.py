@@ -5,6 +5,7 @@ Generated by 'django-admin startproject' using Django 5.2.
 """
 
 from pathlib import Path
+import importlib.util
 import os
 import dj_database_url
 from datetime import timedelta
@@ -72,7 +73,49 @@ REST_FRAMEWORK = {
     },
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 20,
+    # orjson-backed JSON (mangas/renderers.py); `manage.py bench_renderers` compares them
+    'DEFAULT_RENDERER_CLASSES': [
+        'mangas.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'mangas.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# MessagePack is offered (Accept: application/msgpack) when msgpack is installed
+if importlib.util.find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('mangas.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('mangas.renderers.MessagePackParser')
+
+# Response cache for anonymous API reads (mangas/cache.py). The 'api' cache is an
+# in-process LRU by default; set REDIS_URL to share entries and invalidations
+# between workers. Production needs REDIS_URL (system check mangas.W001): with
+# the in-process cache, writes made by other workers and by cron/management
+# commands (update_trending, build_page_variants) only show after at most
+# API_CACHE_TIMEOUT seconds, and lists carry no ETag.
+API_CACHE_ALIAS = 'api'
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', '60'))
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-responses',
+        'TIMEOUT': API_CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('API_CACHE_MAX_ENTRIES', '2000'))},
+    },
 }
+if os.getenv('REDIS_URL'):
+    CACHES['api'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+        'TIMEOUT': API_CACHE_TIMEOUT,
+        'KEY_PREFIX': 'api',
+    }
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -175,6 +218,14 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media serving (mangas/media.py). Fingerprinted files are cached for a year, others
+# for MEDIA_CACHE_MAX_AGE seconds. Set MEDIA_OFFLOAD to 'x-accel' (nginx, with an
+# internal location at MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT) or
+# 'x-sendfile' (Apache/lighttpd) so the proxy streams the files instead of Python.
+MEDIA_CACHE_MAX_AGE = 3600
+MEDIA_OFFLOAD = os.getenv('MEDIA_OFFLOAD', '')
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
 # Cloudinary Storage
 CLOUDINARY_STORAGE = {
     'CLOUD_NAME': os.getenv('CLOUDINARY_CLOUD_NAME'),
@@ -192,3 +243,55 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Increase upload limits for large chapters
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
 DATA_UPLOAD_MAX_MEMORY_SIZE = 104857600 # 100 MB
+
+# Chapter page uploads (mangas/ingest.py): parallel uploads to storage and retries per page
+CHAPTER_UPLOAD_WORKERS = int(os.getenv('CHAPTER_UPLOAD_WORKERS', '4'))
+CHAPTER_UPLOAD_RETRIES = 2
+CHAPTER_UPLOAD_BACKOFF = 0.5
+
+# Responsive page variants (mangas/images.py): WebP renditions at these widths
+# (plus the original width) are built on upload and by `manage.py build_page_variants`.
+CHAPTER_PAGE_WIDTHS = [480, 800, 1200]
+CHAPTER_PAGE_WEBP_QUALITY = int(os.getenv('CHAPTER_PAGE_WEBP_QUALITY', '80'))
+
+# Pages of the opened chapter announced with `Link: rel=preload` by /api/chapters/reader/
+READER_PRELOAD_PAGES = 3
+
+# Most ids accepted by one /api/mangas/batch/ call
+MANGA_BATCH_MAX_IDS = 100
+
+# Page views are buffered in memory and flushed to the database every N seconds.
+# Set to 0 to write every view straight through instead (no background flusher).
+VIEW_COUNT_FLUSH_INTERVAL = int(os.getenv('VIEW_COUNT_FLUSH_INTERVAL', '10'))
+
+# Reading progress (mangas/progress.py) is buffered per user and manga, and the
+# latest position written every N seconds (per worker process, so reads served by
+# another worker can lag by up to N seconds). 0 writes every event through instead.
+READING_PROGRESS_FLUSH_INTERVAL = int(os.getenv('READING_PROGRESS_FLUSH_INTERVAL', '5'))
+# Most events accepted by one /api/history/sync/ call
+READING_PROGRESS_SYNC_MAX_EVENTS = 500
+
+# Full-text search index (mangas/search.py). Workers check the database for
+# writes from other processes at most every SEARCH_INDEX_SYNC_INTERVAL seconds,
+# and load the snapshot written by `manage.py rebuild_search_index` if present.
+SEARCH_INDEX_SYNC_INTERVAL = int(os.getenv('SEARCH_INDEX_SYNC_INTERVAL', '5'))
+SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH', str(BASE_DIR / 'search_index.pickle'))
+SEARCH_MAX_RESULTS = 500
+
+# Genre/type/status posting lists (mangas/facets.py), resynced from the database
+# at most every FACET_INDEX_SYNC_INTERVAL seconds.
+FACET_INDEX_SYNC_INTERVAL = int(os.getenv('FACET_INDEX_SYNC_INTERVAL', '5'))
+# Genre filters matching more mangas than this use an SQL join instead of pk IN (...)
+FACET_FILTER_MAX_IDS = 500
+
+# Analytics rollups (mangas/rollups.py). `manage.py build_rollups` must run on a
+# schedule; the dashboard only reads them and flags a build older than the max age as stale.
+ANALYTICS_ROLLUP_MAX_AGE = int(os.getenv('ANALYTICS_ROLLUP_MAX_AGE', '300'))
+ANALYTICS_RAW_RETENTION_DAYS = 90
+ANALYTICS_DAY_ROLLUP_RETENTION_DAYS = 400
+
+# Trending (mangas/trending.py), recomputed by `manage.py update_trending`.
+# A day's views count half as much every TRENDING_HALF_LIFE_DAYS; a new chapter
+# counts as TRENDING_CHAPTER_WEIGHT views on its release day.
+TRENDING_HALF_LIFE_DAYS = float(os.getenv('TRENDING_HALF_LIFE_DAYS', '3'))
+TRENDING_CHAPTER_WEIGHT = 50
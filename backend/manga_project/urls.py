@@ -29,14 +29,11 @@ urlpatterns = [
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
 
-from django.conf import settings
-from django.conf.urls.static import static
-
-from django.views.static import serve
 from django.urls import re_path
 
+from mangas.media import serve_media
+
+# Ranges, ETags and long-lived caching; see MEDIA_OFFLOAD to let the proxy send the bytes
 urlpatterns += [
-    re_path(r'^media/(?P<path>.*)$', serve, {
-        'document_root': settings.MEDIA_ROOT,
-    }),
+    re_path(r'^media/(?P<path>.*)$', serve_media),
 ]
@@ -1,12 +1,17 @@
+from contextvars import ContextVar
+
 from django.contrib import admin
 from django import forms
 from .models import Manga, Chapter, Genre
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-import os
+from .images import align_variants
+from .ingest import ingest_pages, IngestError
 
 admin.site.register(Genre)
 
+# Pages stored by ChapterAdminForm.clean() during the current admin submission,
+# mapped to whether their form was saved (see DiscardUnsavedUploadsMixin)
+_uploads = ContextVar('chapter_uploads', default=None)
+
 class MultipleFileInput(forms.FileInput):
     def __init__(self, attrs=None):
         super().__init__(attrs)
@@ -42,10 +47,30 @@ class ChapterAdminForm(forms.ModelForm):
                 files = [files]
         return files
 
+    def clean(self):
+        cleaned_data = super().clean()
+        # Uploaded here rather than in save() so a failure is reported on the form;
+        # the admin removes the files again if the submission is not saved
+        self.ingested = None
+        files = cleaned_data.get('files_input')
+        if files and not self.errors:
+            # Ensure chapter number is safe for path
+            chapter_num = cleaned_data.get('chapter_number') or self.instance.chapter_number or 'unknown'
+            try:
+                # Streamed to storage in parallel; raises IngestError if pages fail
+                self.ingested = ingest_pages(files, f'chapters/{chapter_num}')
+            except IngestError as exc:
+                self.add_error('files_input', str(exc))
+            else:
+                uploads = _uploads.get()
+                if uploads is not None:
+                    uploads[self.ingested] = False
+        return cleaned_data
+
     class Meta:
         model = Chapter
         fields = '__all__'
-        exclude = ('pages',)
+        exclude = ('pages', 'page_variants', 'comment_count')
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -59,55 +84,66 @@ class ChapterAdminForm(forms.ModelForm):
         pages_text = self.cleaned_data.get('pages_input', '')
         current_pages = [url.strip() for url in pages_text.split('\n') if url.strip()]
         
-        # Handle File Uploads
-        # We can use cleaned_data here since we processed it in clean_files_input
-        # But FileField/Field cleaning might be tricky with multiple files if not standard
-        # Let's rely on self.files again to be safe, using the robust logic
-        
-        key = 'files_input'
-        if self.prefix:
-            key = f'{self.prefix}-{key}'
-        
-        if hasattr(self.files, 'getlist'):
-            files = self.files.getlist(key)
-        else:
-            files = self.files.get(key)
-            if files and not isinstance(files, list):
-                files = [files]
-        
-        if files:
-            for f in files:
-                # Skip if empty or not a file
-                if not hasattr(f, 'read'):
-                    continue
-                    
-                # Save file to media
-                # Ensure chapter number is safe for path
-                chapter_num = instance.chapter_number if instance.chapter_number else 'unknown'
-                path = default_storage.save(f'chapters/{chapter_num}/{f.name}', ContentFile(f.read()))
-                url = default_storage.url(path)
-                current_pages.append(url)
-        
+        # Files were stored by clean()
+        manifests = instance.page_variants
+        result = getattr(self, 'ingested', None)
+        if result is not None:
+            current_pages += result.urls
+            manifests = list(manifests or []) + result.variants
+            uploads = _uploads.get()
+            if uploads is not None:
+                uploads[result] = True
+
         instance.pages = current_pages
+        # Pasted URLs have no variants until build_page_variants picks them up
+        instance.page_variants = align_variants(current_pages, manifests)
         
         if commit:
             instance.save()
         return instance
 
+class DiscardUnsavedUploadsMixin:
+    """
+    Deletes the pages ChapterAdminForm uploaded while validating when the
+    submission does not go through: another form was invalid (the page is
+    shown again and the files re-uploaded) or the transaction rolled back.
+    """
+
+    def changeform_view(self, *args, **kwargs):
+        uploads = {}
+        token = _uploads.set(uploads)
+        try:
+            response = super().changeform_view(*args, **kwargs)
+        except BaseException:
+            for result in uploads:
+                result.discard()
+            raise
+        finally:
+            _uploads.reset(token)
+        for result, saved in uploads.items():
+            if not saved:
+                result.discard()
+        return response
+
 class ChapterInline(admin.StackedInline):
     model = Chapter
     form = ChapterAdminForm
     extra = 1
 
 @admin.register(Manga)
-class MangaAdmin(admin.ModelAdmin):
+class MangaAdmin(DiscardUnsavedUploadsMixin, admin.ModelAdmin):
     list_display = ('title', 'type', 'status', 'views', 'rating', 'created_at')
     search_fields = ('title',)
     list_filter = ('type', 'status', 'is_featured')
+    readonly_fields = (
+        'latest_chapter', 'chapter_count', 'last_update_at',
+        'rating', 'rating_sum', 'rating_count', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+        'trending_score', 'comment_count',
+    )
     inlines = [ChapterInline]
 
 @admin.register(Chapter)
-class ChapterAdmin(admin.ModelAdmin):
+class ChapterAdmin(DiscardUnsavedUploadsMixin, admin.ModelAdmin):
     form = ChapterAdminForm
     list_display = ('manga', 'chapter_number', 'released_at')
     list_filter = ('manga',)
@@ -0,0 +1,172 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+SCOPES = ('manga', 'chapter', 'genre')
+# Response headers that are replayed on a hit
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Vary', 'Link')
+
+
+class ResponseCache:
+    """
+    Rendered API responses keyed on path, normalized query parameters, format
+    and the generation counter of every scope the response depends on.
+
+    Writes bump a scope's generation, which makes every key built from the old
+    value unreachable; those entries then age out of the backend (LRU or TTL).
+    Generations live in the cache backend itself, so with a shared store
+    (Redis) an invalidation reaches every worker. Hit/miss counts are kept per
+    process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    @property
+    def backend(self):
+        return caches[getattr(settings, 'API_CACHE_ALIAS', 'api')]
+
+    # Generations
+
+    def generations(self, scopes):
+        keys = [f'gen:{scope}' for scope in scopes]
+        found = self.backend.get_many(keys)
+        for key in keys:
+            if key not in found:
+                # Never restart at a value used before the counter was evicted
+                self.backend.add(key, time.time_ns(), timeout=None)
+                found[key] = self.backend.get(key)
+        return [found[key] for key in keys]
+
+    @property
+    def shared(self):
+        """Whether every process sees the same entries and generations (Redis, not locmem)"""
+        return not isinstance(self.backend, (LocMemCache, DummyCache))
+
+    def shared_generations(self, scopes):
+        """
+        generations() when they can version a resource across processes, else
+        None: a per-process counter never sees writes made by other workers,
+        cron jobs or management commands
+        """
+        return self.generations(scopes) if self.shared else None
+
+    def bump(self, *scopes):
+        for scope in scopes:
+            try:
+                self.backend.incr(f'gen:{scope}')
+            except ValueError:
+                self.backend.add(f'gen:{scope}', time.time_ns(), timeout=None)
+
+    # Entries
+
+    def key(self, request, scopes):
+        params = sorted((name, sorted(request.query_params.getlist(name))) for name in request.query_params)
+        parts = [
+            request.build_absolute_uri(request.path), params, request.accepted_renderer.format,
+            list(zip(scopes, self.generations(scopes))),
+        ]
+        return 'response:' + hashlib.md5(repr(parts).encode()).hexdigest()
+
+    def get(self, key):
+        entry = self.backend.get(key)
+        self.record('hits' if entry is not None else 'misses')
+        return entry
+
+    def set(self, key, response):
+        entry = {
+            'content': response.content,
+            'headers': {name: response[name] for name in CACHED_HEADERS if name in response},
+        }
+        self.backend.set(key, entry, getattr(settings, 'API_CACHE_TIMEOUT', 60))
+        self.record('stores')
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self._stats.clear()
+
+    # Statistics
+
+    def record(self, event):
+        with self._lock:
+            self._stats[event] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = {event: self._stats[event] for event in ('hits', 'misses', 'stores')}
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else None
+        stats['backend'] = type(self.backend).__name__
+        return stats
+
+
+response_cache = ResponseCache()
+
+
+def invalidate(*scopes):
+    response_cache.bump(*scopes)
+    if transaction.get_connection().in_atomic_block:
+        # Again once committed, in case a concurrent read re-cached the old rows meanwhile
+        transaction.on_commit(lambda: response_cache.bump(*scopes))
+
+
+class CachedResponseMixin:
+    """
+    Serve anonymous `list` / `retrieve` GETs from the response cache. Other
+    read actions can opt in by returning `self.cached_response()` when set.
+
+    `cache_scopes` names the generations (see SCOPES) the responses depend on.
+    """
+    cache_scopes = ()
+
+    def cached_response(self):
+        """The cached response for this request if there is one; otherwise mark it to be stored"""
+        request = self.request
+        if request.method != 'GET' or request.user.is_authenticated or request.accepted_renderer.format == 'api':
+            return None
+
+        key = response_cache.key(request, self.cache_scopes)
+        entry = response_cache.get(key)
+        if entry is None:
+            self._cache_key = key
+            return None
+
+        headers = entry['headers']
+        last_modified = parse_http_date_safe(headers['Last-Modified']) if 'Last-Modified' in headers else None
+        response = get_conditional_response(request, etag=headers.get('ETag'), last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(entry['content'], content_type=headers.get('Content-Type'))
+        for name, value in headers.items():
+            response.headers.setdefault(name, value)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        cached = self.cached_response()
+        return cached if cached is not None else super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        cached = self.cached_response()
+        return cached if cached is not None else super().retrieve(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, '_cache_key', None)
+        if key and isinstance(response, Response) and response.status_code == 200:
+            response.render()
+            response_cache.set(key, response)
+            response['X-Cache'] = 'MISS'
+        return response
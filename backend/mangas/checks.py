@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+from django.core.cache.backends.locmem import LocMemCache
+
+from .cache import response_cache
+
+
+@register(Tags.caches)
+def check_api_cache_is_shared(app_configs, **kwargs):
+    # update_trending, build_page_variants and other commands run in their own
+    # process: their invalidations only reach the web workers through a shared cache
+    if settings.DEBUG or not isinstance(response_cache.backend, LocMemCache):
+        return []
+    return [Warning(
+        "The 'api' response cache is local to each process.",
+        hint=(
+            "Set REDIS_URL so invalidations from other workers, cron jobs and management "
+            f"commands reach every worker; until then cached responses lag by up to {settings.API_CACHE_TIMEOUT}s."
+        ),
+        id='mangas.W001',
+    )]
@@ -0,0 +1,65 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified validators for `list` and `retrieve`.
+
+    Viewsets describe the state of a resource with a cheap version query
+    (`get_list_version` / `get_object_version`) returning
+    `(parts, last_modified)`: the parts go into the ETag, last_modified is the
+    latest content change. A matching If-None-Match (or, without one, a recent
+    enough If-Modified-Since) gets a 304 before any object is loaded or
+    serialized. Counters such as views only move the ETag, so clients that
+    only send If-Modified-Since may see them a little stale.
+    """
+
+    def get_list_version(self, queryset):
+        return None
+
+    def get_object_version(self):
+        return None
+
+    def get_lookup_value(self):
+        return self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+
+    def not_modified(self, version):
+        """Remember the validators for the response; a 304 if the client's copy is current"""
+        if version is None:
+            return None
+        parts, last_modified = version
+        # The same resource renders differently per query string and format
+        key = '|'.join(str(part) for part in (self.request.get_full_path(), self.request.accepted_renderer.format, *parts))
+        etag = f'W/"{hashlib.md5(key.encode()).hexdigest()}"'
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        self._validators = etag, timestamp
+        return get_conditional_response(self.request, etag=etag, last_modified=timestamp)
+
+    def list(self, request, *args, **kwargs):
+        response = self.not_modified(self.get_list_version(self.filter_queryset(self.get_queryset())))
+        return response or super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        response = self.not_modified(self.get_object_version())
+        return response or super().retrieve(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, '_validators', None)
+        if validators and response.status_code in (200, 304):
+            etag, timestamp = validators
+            response.headers.setdefault('ETag', etag)
+            if timestamp is not None:
+                response.headers.setdefault('Last-Modified', http_date(timestamp))
+            # Cacheable, but always revalidated
+            response.headers.setdefault('Cache-Control', 'no-cache')
+            patch_vary_headers(response, ['Accept'])
+        return response
+
+
+def latest(*values):
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
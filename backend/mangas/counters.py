@@ -0,0 +1,142 @@
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicFlusher:
+    """
+    Calls flush() every <interval_setting> seconds from a daemon thread started
+    on first use, and once more at exit. An interval of 0 writes through on
+    every call instead; None leaves flushing entirely to the caller (tests).
+    Subclasses set self._lock.
+    """
+    interval_setting = None
+    interval_default = 10
+    thread_name = 'flush'
+
+    _flusher = None
+    _atexit_registered = False
+
+    def flush(self):
+        raise NotImplementedError
+
+    def _ensure_flusher(self):
+        interval = getattr(settings, self.interval_setting, self.interval_default)
+        if interval is None:
+            return
+        if interval <= 0:
+            # Buffers live in this process only, so nothing else could flush them
+            self.flush()
+            return
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(
+                target=self._run, args=(interval,), name=self.thread_name, daemon=True
+            )
+            self._flusher.start()
+            if not self._atexit_registered:
+                atexit.register(self.flush)
+                self._atexit_registered = True
+
+    def _run(self, interval):
+        from django.db import connection
+
+        while True:
+            time.sleep(interval)
+            self.flush()
+            connection.close_if_unusable_or_obsolete()
+
+
+class ViewCounter(PeriodicFlusher):
+    """
+    Write-behind buffer for manga page views.
+
+    Detail requests only bump an in-memory counter; a background thread
+    periodically folds the buffered counts into Manga.views and DailyView
+    with a handful of atomic F() updates. If the process dies we lose at most
+    one flush interval worth of views.
+    """
+    interval_setting = 'VIEW_COUNT_FLUSH_INTERVAL'
+    thread_name = 'view-counter-flush'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)  # (manga_id, date) -> views
+
+    def incr(self, manga_id, amount=1):
+        key = (manga_id, timezone.localdate())
+        with self._lock:
+            self._pending[key] += amount
+        self._ensure_flusher()
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+
+    def flush(self):
+        # Swap the buffer out so request threads never wait on the database
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+        if not pending:
+            return 0
+
+        try:
+            self._write(pending)
+        except Exception:
+            # Put the counts back so the next flush can retry them
+            logger.exception('Failed to flush %d buffered view counts', len(pending))
+            with self._lock:
+                for key, amount in pending.items():
+                    self._pending[key] += amount
+            return 0
+        return sum(pending.values())
+
+    def _write(self, pending):
+        from .models import Manga, DailyView
+
+        totals = defaultdict(int)
+        by_date = defaultdict(dict)
+        for (manga_id, date), amount in pending.items():
+            totals[manga_id] += amount
+            by_date[date][manga_id] = amount
+
+        with transaction.atomic():
+            # One UPDATE per distinct increment instead of one per manga
+            for amount, ids in _group_by_amount(totals).items():
+                Manga.objects.filter(pk__in=ids).update(views=F('views') + amount)
+
+            for date, counts in by_date.items():
+                # Make sure today's rows exist, then increment them in place.
+                # ignore_conflicts keeps concurrent flushers from clobbering each other.
+                DailyView.objects.bulk_create(
+                    [DailyView(manga_id=manga_id, date=date) for manga_id in counts],
+                    ignore_conflicts=True,
+                )
+                for amount, ids in _group_by_amount(counts).items():
+                    DailyView.objects.filter(manga_id__in=ids, date=date).update(views=F('views') + amount)
+
+
+def _group_by_amount(counts):
+    groups = defaultdict(list)
+    for manga_id, amount in counts.items():
+        groups[amount].append(manga_id)
+    return groups
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,233 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+
+FACETS = ('genre', 'type', 'status')
+
+
+def facet_key(value):
+    return ' '.join(str(value).split()).casefold()
+
+
+def intersect(a, b):
+    """Intersection of two sorted id lists, galloping through the longer one"""
+    if len(a) > len(b):
+        a, b = b, a
+    result, lo = [], 0
+    for item in a:
+        lo = bisect_left(b, item, lo)
+        if lo == len(b):
+            break
+        if b[lo] == item:
+            result.append(item)
+    return result
+
+
+def union(lists):
+    return sorted(set().union(*lists))
+
+
+def difference(a, b):
+    excluded = set(b)
+    return [item for item in a if item not in excluded]
+
+
+class FacetIndex:
+    """
+    Sorted posting lists of manga ids for every genre, type and status.
+
+    Boolean genre queries become list intersections/unions/differences, and
+    the counts for every facet value within a result set come from one pass
+    over the posting lists instead of a GROUP BY through the genre M2M table.
+    Kept current by the Manga/genre signals; other processes notice changes
+    through a fingerprint of the manga, manga-genre and genre tables and rebuild.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(list)  # (facet, key) -> sorted manga ids
+        self._labels = {}                    # (facet, key) -> display name
+        self._doc_terms = {}                 # manga id -> set of (facet, key)
+        self._all = []
+        self._built = False
+        self._state = None
+        self._last_sync = 0.0
+
+    # Documents
+
+    def add(self, manga_id, type_, status, genre_names):
+        terms = {}
+        for facet, values in (('type', [type_]), ('status', [status]), ('genre', genre_names)):
+            for value in values:
+                if value:
+                    terms[(facet, facet_key(value))] = value
+
+        with self._lock:
+            self._remove(manga_id)
+            for term, label in terms.items():
+                insort(self._postings[term], manga_id)
+                self._labels[term] = label
+            self._doc_terms[manga_id] = set(terms)
+            insort(self._all, manga_id)
+
+    def remove(self, manga_id):
+        with self._lock:
+            self._remove(manga_id)
+
+    def _remove(self, manga_id):
+        terms = self._doc_terms.pop(manga_id, None)
+        if terms is None:
+            return
+        self._discard(self._all, manga_id)
+        for term in terms:
+            postings = self._postings[term]
+            self._discard(postings, manga_id)
+            if not postings:
+                del self._postings[term]
+                self._labels.pop(term, None)
+
+    @staticmethod
+    def _discard(postings, manga_id):
+        i = bisect_left(postings, manga_id)
+        if i < len(postings) and postings[i] == manga_id:
+            del postings[i]
+
+    # Querying
+
+    def postings(self, facet, value):
+        return self._postings.get((facet, facet_key(value)), [])
+
+    def query(self, genres=(), genre_mode='and', exclude_genres=(), types=(), statuses=(), or_types=()):
+        """
+        Sorted ids of the mangas matching the boolean facet query. `or_types`
+        widens the genre match to mangas of those types (/genres/Manhwa).
+        """
+        with self._lock:
+            result = self._all
+            if genres:
+                lists = [self.postings('genre', g) for g in genres]
+                if genre_mode == 'or':
+                    result = union(lists)
+                else:
+                    for postings in sorted(lists, key=len):
+                        result = intersect(result, postings)
+                if or_types:
+                    result = union([result] + [self.postings('type', t) for t in or_types])
+            for facet, values in (('type', types), ('status', statuses)):
+                if values:
+                    result = intersect(result, union([self.postings(facet, v) for v in values]))
+            if exclude_genres:
+                result = difference(result, union([self.postings('genre', g) for g in exclude_genres]))
+            return list(result)
+
+    def counts(self, ids):
+        """{facet: {label: count}} for every facet value present in ids"""
+        selected = set(ids)
+        counts = {facet: {} for facet in FACETS}
+        with self._lock:
+            for (facet, key), postings in self._postings.items():
+                if len(selected) < len(postings):
+                    n = sum(1 for manga_id in selected if self._contains(postings, manga_id))
+                else:
+                    n = sum(1 for manga_id in postings if manga_id in selected)
+                if n:
+                    counts[facet][self._labels[(facet, key)]] = n
+        for facet in FACETS:
+            counts[facet] = dict(sorted(counts[facet].items(), key=lambda item: (-item[1], item[0])))
+        return counts
+
+    @staticmethod
+    def _contains(postings, manga_id):
+        i = bisect_left(postings, manga_id)
+        return i < len(postings) and postings[i] == manga_id
+
+    # Keeping in step with the database
+
+    def rebuild(self):
+        from .models import Manga
+
+        state = _database_state()
+        genres = defaultdict(list)
+        for manga_id, name in Manga.genres.through.objects.values_list('manga_id', 'genre__name'):
+            genres[manga_id].append(name)
+
+        fresh = FacetIndex()
+        for manga_id, type_, status in Manga.objects.order_by('pk').values_list('pk', 'type', 'status').iterator():
+            fresh.add(manga_id, type_, status, genres.get(manga_id, []))
+
+        with self._lock:
+            self._postings = fresh._postings
+            self._labels = fresh._labels
+            self._doc_terms = fresh._doc_terms
+            self._all = fresh._all
+            self._built = True
+            self._state = state
+
+    def index_manga(self, manga):
+        if self._built:
+            self.add(manga.pk, manga.type, manga.status, list(manga.genres.values_list('name', flat=True)))
+            self._state = _database_state()
+
+    def remove_manga(self, manga_id):
+        if self._built:
+            self.remove(manga_id)
+            # Our own writes are already applied; don't rebuild for them on the next sync
+            self._state = _database_state()
+
+    def invalidate(self):
+        with self._lock:
+            self._built = False
+
+    def sync(self, force=False):
+        interval = getattr(settings, 'FACET_INDEX_SYNC_INTERVAL', 5)
+        now = time.monotonic()
+        if self._built and not force and now - self._last_sync < interval:
+            return
+        self._last_sync = now
+
+        with self._lock:
+            if not self._built or _database_state() != self._state:
+                self.rebuild()
+
+
+def _database_state():
+    from .models import Manga
+    return Manga.catalogue_state()
+
+
+facet_index = FacetIndex()
+
+
+def genre_condition(genres=(), genre_mode='and', exclude_genres=(), or_types=()):
+    """
+    FacetIndex.query() for genres as a SQL condition on Manga (EXISTS against
+    the genre M2M table), for result sets too large to pass as a pk list
+    """
+    from .models import Manga
+
+    def tagged(names):
+        match = Q()
+        for name in names:
+            match |= Q(genre__name__iexact=' '.join(name.split()))
+        return Exists(Manga.genres.through.objects.filter(match, manga=OuterRef('pk')))
+
+    condition = Q()
+    if genres:
+        if genre_mode == 'or':
+            condition &= Q(tagged(genres))
+        else:
+            for name in genres:
+                condition &= Q(tagged([name]))
+        for type_ in or_types:
+            condition |= Q(type__iexact=' '.join(type_.split()))
+    if exclude_genres:
+        condition &= ~Q(tagged(exclude_genres))
+    return condition
+
+
+def split_param(value):
+    return [v for v in (part.strip() for part in (value or '').split(',')) if v]
@@ -0,0 +1,135 @@
+import hashlib
+import io
+import logging
+import os
+import urllib.request
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# The reader shows pages full width up to 768px (max-w-3xl)
+READER_SIZES = '(max-width: 768px) 100vw, 768px'
+# Hex digits of the source hash in variant names (see media.FINGERPRINTED)
+FINGERPRINT_LENGTH = 10
+
+
+def page_widths():
+    return sorted(getattr(settings, 'CHAPTER_PAGE_WIDTHS', [480, 800, 1200]))
+
+
+def _fingerprint(source):
+    digest = hashlib.sha1()
+    if hasattr(source, 'chunks'):
+        for chunk in source.chunks():
+            digest.update(chunk)
+    else:
+        for chunk in iter(lambda: source.read(64 * 1024), b''):
+            digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()[:FINGERPRINT_LENGTH]
+
+
+def build_variants(source, src_url, prefix):
+    """
+    Encode WebP renditions of one page at every configured width below its own,
+    plus one at full width, and store them under `prefix`.
+
+    File names carry a hash of the source bytes, so a variant URL never changes
+    content and can be cached forever. Returns the page manifest stored in
+    Chapter.page_variants, along with the storage paths written.
+    """
+    source.seek(0)
+    fingerprint = _fingerprint(source)
+    stem = os.path.splitext(os.path.basename(getattr(source, 'name', '') or 'page'))[0]
+    quality = getattr(settings, 'CHAPTER_PAGE_WEBP_QUALITY', 80)
+
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        width, height = image.size
+
+        variants, paths = [], []
+        for target in [w for w in page_widths() if w < width] + [width]:
+            resized = image if target == width else image.resize((target, round(height * target / width)), Image.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, 'WEBP', quality=quality, method=4)
+            path = default_storage.save(f'{prefix}/{stem}.{fingerprint}.w{target}.webp', ContentFile(buffer.getvalue()))
+            paths.append(path)
+            variants.append({
+                'url': default_storage.url(path),
+                'width': resized.width,
+                'height': resized.height,
+                'bytes': buffer.tell(),
+            })
+
+    return {'src': src_url, 'width': width, 'height': height, 'variants': variants}, paths
+
+
+def safe_build_variants(source, src_url, prefix):
+    """build_variants that degrades to a manifest without variants on bad input"""
+    try:
+        return build_variants(source, src_url, prefix)
+    except Exception:
+        logger.exception('Could not build variants for %s', src_url)
+        return {'src': src_url, 'variants': []}, []
+
+
+def align_variants(pages, manifests):
+    """One manifest per page URL, reusing existing ones and leaving gaps for pages without variants"""
+    by_src = {m['src']: m for m in manifests or [] if isinstance(m, dict) and m.get('src')}
+    return [by_src.get(url, {'src': url, 'variants': []}) for url in pages]
+
+
+def preload_links(pages, manifests, count, absolute=lambda url: url):
+    """`Link: rel=preload` values for the first `count` pages, offering the variants as a srcset"""
+    links = []
+    for manifest in align_variants(pages[:count], manifests):
+        link = f'<{absolute(manifest["src"])}>; rel=preload; as=image'
+        if manifest['variants']:
+            srcset = ', '.join(f"{absolute(v['url'])} {v['width']}w" for v in manifest['variants'])
+            link += f'; imagesrcset="{srcset}"; imagesizes="{READER_SIZES}"'
+        links.append(link)
+    return links
+
+
+def storage_name(url):
+    """Map a page URL back to its default_storage name, or None for external URLs"""
+    media_url = settings.MEDIA_URL
+    if url.startswith(media_url):
+        return url[len(media_url):]
+    return None
+
+
+def open_page(url):
+    """Readable file for a stored or external page URL"""
+    name = storage_name(url)
+    if name is not None:
+        return default_storage.open(name)
+    if url.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(url, timeout=30) as response:
+            page = io.BytesIO(response.read())
+        page.name = os.path.basename(url.split('?')[0])
+        return page
+    raise ValueError(f'Unsupported page URL: {url}')
+
+
+def build_chapter_variants(pages, manifests, prefix):
+    """
+    Manifests for every page of a chapter, building only the missing ones.
+
+    Touches storage but never the database, so it can run in a worker process.
+    """
+    result = []
+    for manifest in align_variants(pages, manifests):
+        if not manifest['variants']:
+            try:
+                with open_page(manifest['src']) as page:
+                    manifest, _ = safe_build_variants(page, manifest['src'], prefix)
+            except Exception:
+                logger.exception('Could not open page %s', manifest['src'])
+        result.append(manifest)
+    return result
@@ -0,0 +1,97 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .images import safe_build_variants
+
+logger = logging.getLogger(__name__)
+
+
+class IngestError(Exception):
+    def __init__(self, failed):
+        self.failed = failed
+        super().__init__(f"{len(failed)} page(s) failed to upload: {', '.join(name for name, _ in failed)}")
+
+
+class IngestResult:
+    def __init__(self, paths, urls, variants, failed):
+        self.paths = paths        # storage paths of everything written (pages and variants)
+        self.urls = urls          # public URLs of the stored pages, in upload order
+        self.variants = variants  # page manifests (see images.build_variants), aligned with urls
+        self.failed = failed      # [(file name, error message)] for pages that never made it
+
+    def discard(self):
+        """Remove every stored page, e.g. when the chapter row could not be saved"""
+        for path in self.paths:
+            try:
+                default_storage.delete(path)
+            except Exception:
+                logger.exception('Could not remove orphaned page %s', path)
+
+
+def _store(upload, path, retries, backoff, variants_prefix):
+    stored, url = _store_original(upload, path, retries, backoff)
+    if not variants_prefix:
+        return stored, url, None, []
+    manifest, variant_paths = safe_build_variants(upload, url, variants_prefix)
+    return stored, url, manifest, variant_paths
+
+
+def _store_original(upload, path, retries, backoff):
+    for attempt in range(retries + 1):
+        try:
+            # Rewind so a retry re-sends the whole file
+            if hasattr(upload, 'seek'):
+                upload.seek(0)
+            # Storage backends read File objects chunk by chunk, so the page is
+            # streamed from the upload (temp file or memory) rather than read() whole.
+            stored = default_storage.save(path, upload)
+            return stored, default_storage.url(stored)
+        except Exception:
+            if attempt == retries:
+                raise
+            logger.warning('Retrying upload of %s (attempt %d)', path, attempt + 2, exc_info=True)
+            time.sleep(backoff * 2 ** attempt)
+
+
+def ingest_pages(files, prefix, allow_partial=False, variants=True):
+    """
+    Upload chapter pages to default_storage through a bounded worker pool.
+
+    Results keep the order the files were given in. With `variants`, WebP
+    renditions of each page are produced under `<prefix>/variants` by the same
+    worker that stored it. Each page is retried with
+    exponential backoff; if pages still fail, the ones already stored are
+    removed and IngestError is raised, unless allow_partial is set, in which
+    case the successful pages are returned along with the failures.
+    """
+    files = [f for f in files if hasattr(f, 'read')]
+    workers = max(1, getattr(settings, 'CHAPTER_UPLOAD_WORKERS', 4))
+    retries = getattr(settings, 'CHAPTER_UPLOAD_RETRIES', 2)
+    backoff = getattr(settings, 'CHAPTER_UPLOAD_BACKOFF', 0.5)
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(files) or 1)) as pool:
+        variants_prefix = f'{prefix}/variants' if variants else None
+        futures = [pool.submit(_store, f, f'{prefix}/{f.name}', retries, backoff, variants_prefix) for f in files]
+
+    paths, urls, manifests, failed = [], [], [], []
+    for upload, future in zip(files, futures):
+        try:
+            path, url, manifest, variant_paths = future.result()
+        except Exception as exc:
+            logger.exception('Upload of %s failed', upload.name)
+            failed.append((upload.name, str(exc)))
+            continue
+        paths += [path] + variant_paths
+        urls.append(url)
+        if manifest is not None:
+            manifests.append(manifest)
+
+    result = IngestResult(paths, urls, manifests, failed)
+    if failed and not allow_partial:
+        result.discard()
+        raise IngestError(failed)
+    return result
@@ -0,0 +1,55 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+from mangas.models import Manga, Chapter, Comment, Bookmark, ReadingHistory
+from mangas.projections import (
+    MangaProjection, MangaDetailProjection, ChapterListProjection, ChapterDetailProjection,
+    CommentProjection, BookmarkProjection, ReadingHistoryProjection,
+)
+from mangas.serializers import LATEST_CHAPTERS
+
+
+class Command(BaseCommand):
+    help = "Per-row cost of the read paths: ModelSerializer over instances against the .values() projections."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100, help="Rows per run")
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        limit, repeat = options['limit'], options['repeat']
+        latest_chapters = Chapter.objects.only(*Chapter.LIST_FIELDS)[:LATEST_CHAPTERS]
+        # Each serializer gets the querysets the views used before the projections
+        cases = [
+            ('manga list', MangaProjection, Manga.objects.prefetch_related(
+                'genres', Prefetch('chapters', queryset=latest_chapters, to_attr='latest_chapters'))),
+            ('manga detail', MangaDetailProjection, Manga.objects.prefetch_related(
+                'genres', Prefetch('chapters', queryset=Chapter.objects.only(*Chapter.LIST_FIELDS), to_attr='listed_chapters'))),
+            ('chapter list', ChapterListProjection, Chapter.objects.only(*Chapter.LIST_FIELDS)),
+            ('chapter detail', ChapterDetailProjection, Chapter.objects.all()),
+            ('comments', CommentProjection, Comment.objects.all()),
+            ('bookmarks', BookmarkProjection, Bookmark.objects.all()),
+            ('history', ReadingHistoryProjection, ReadingHistory.objects.all()),
+        ]
+
+        self.stdout.write(f"up to {limit} rows per run, {repeat} runs each (queries included)")
+        self.stdout.write(f"{'endpoint':<16}{'rows':>6}{'serializer µs/row':>20}{'projection µs/row':>20}{'speedup':>9}")
+        for name, projection_class, queryset in cases:
+            queryset = queryset.order_by('-pk')[:limit]
+            rows = queryset.count()
+            if not rows:
+                self.stdout.write(f"{name:<16}{0:>6}{'-':>20}{'-':>20}{'-':>9}")
+                continue
+
+            def serialize():
+                # .all() so every run queries, like the projection does
+                return projection_class.serializer_class(list(queryset.all()), many=True).data
+
+            def project():
+                projection = projection_class()
+                return projection.many(projection.values(queryset))
+
+            before = timeit.timeit(serialize, number=repeat) / repeat / rows
+            after = timeit.timeit(project, number=repeat) / repeat / rows
+            self.stdout.write(f"{name:<16}{rows:>6}{before * 1e6:>20.1f}{after * 1e6:>20.1f}{before / after:>8.1f}x")
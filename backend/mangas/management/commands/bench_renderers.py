@@ -0,0 +1,45 @@
+import io
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from mangas import renderers
+from mangas.models import Manga, Chapter
+from mangas.serializers import LATEST_CHAPTERS, MangaSerializer
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark the API renderers and parsers on a page of MangaSerializer output."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100, help="Mangas per payload (existing rows are repeated if needed)")
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        latest_chapters = Chapter.objects.only(*Chapter.LIST_FIELDS)[:LATEST_CHAPTERS]
+        mangas = list(
+            Manga.objects.prefetch_related('genres', Prefetch('chapters', queryset=latest_chapters, to_attr='latest_chapters'))
+            .order_by('-last_update_at', '-id')[:options['count']]
+        )
+        if not mangas:
+            raise CommandError("Needs at least one manga to serialize")
+        rows = MangaSerializer(mangas, many=True).data
+        payload = {'count': options['count'], 'next': None, 'previous': None,
+                   'results': [rows[i % len(rows)] for i in range(options['count'])]}
+
+        candidates = [('json (stdlib)', JSONRenderer(), JSONParser())]
+        if renderers.orjson is not None:
+            candidates.append(('json (orjson)', renderers.FastJSONRenderer(), renderers.FastJSONParser()))
+        if renderers.msgpack is not None:
+            candidates.append(('msgpack', renderers.MessagePackRenderer(), renderers.MessagePackParser()))
+
+        repeat = options['repeat']
+        self.stdout.write(f"{len(payload['results'])} mangas per payload, {repeat} runs each")
+        self.stdout.write(f"{'format':<16}{'bytes':>10}{'render µs':>12}{'parse µs':>12}")
+        for name, renderer, parser in candidates:
+            body = renderer.render(payload)
+            render = timeit.timeit(lambda: renderer.render(payload), number=repeat) / repeat
+            parse = timeit.timeit(lambda: parser.parse(io.BytesIO(body), parser_context={}), number=repeat) / repeat
+            self.stdout.write(f"{name:<16}{len(body):>10}{render * 1e6:>12.1f}{parse * 1e6:>12.1f}")
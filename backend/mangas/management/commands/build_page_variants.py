@@ -0,0 +1,63 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+from mangas.cache import invalidate
+from mangas.images import build_chapter_variants
+from mangas.models import Chapter
+
+
+def _setup_worker():
+    # Needed where workers are spawned rather than forked
+    django.setup()
+
+
+def _build(chapter_id, manga_id, chapter_number, pages, manifests):
+    return chapter_id, build_chapter_variants(pages, manifests, f'chapters/{manga_id}/{chapter_number}/variants')
+
+
+class Command(BaseCommand):
+    help = "Build the responsive WebP variants of chapter pages that do not have them yet, in parallel across CPU cores."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--manga', type=int, default=None, help="Only chapters of this manga")
+        parser.add_argument('--force', action='store_true', help="Rebuild variants that already exist")
+
+    def handle(self, *args, **options):
+        chapters = Chapter.objects.order_by('pk').values_list('pk', 'manga_id', 'chapter_number', 'pages', 'page_variants')
+        if options['manga']:
+            chapters = chapters.filter(manga_id=options['manga'])
+
+        todo = []
+        for chapter_id, manga_id, chapter_number, pages, manifests in chapters.iterator():
+            if options['force']:
+                manifests = []
+            built = {m.get('src') for m in manifests or [] if isinstance(m, dict) and m.get('variants')}
+            if pages and not all(url in built for url in pages):
+                todo.append((chapter_id, manga_id, chapter_number, pages, manifests))
+
+        if not todo:
+            self.stdout.write(self.style.SUCCESS("All chapter pages already have variants"))
+            return
+
+        updated = 0
+        if options['workers'] <= 1:
+            for chapter in todo:
+                chapter_id, manifests = _build(*chapter)
+                updated += Chapter.objects.filter(pk=chapter_id).update(page_variants=manifests, updated_at=timezone.now())
+        else:
+            # Workers only read and write storage; the results are saved from here.
+            # Connections must not be shared with forked children.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_setup_worker) as pool:
+                futures = [pool.submit(_build, *chapter) for chapter in todo]
+                for future in as_completed(futures):
+                    chapter_id, manifests = future.result()
+                    updated += Chapter.objects.filter(pk=chapter_id).update(page_variants=manifests, updated_at=timezone.now())
+
+        invalidate('chapter')
+        self.stdout.write(self.style.SUCCESS(f"Built page variants for {updated} chapters"))
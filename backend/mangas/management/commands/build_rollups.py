@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from mangas import rollups
+
+
+class Command(BaseCommand):
+    help = "Roll DailyView up into day/week/month analytics buckets and compact old raw rows. Run from cron every few minutes."
+
+    def handle(self, *args, **options):
+        rollups.build_rollups()
+        self.stdout.write(self.style.SUCCESS("Analytics rollups are up to date"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from mangas.models import Manga
+
+
+class Command(BaseCommand):
+    help = "Recompute every manga's rating totals, histogram and average from the Rating table."
+
+    def handle(self, *args, **options):
+        rated = Manga.reconcile_ratings()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled ratings ({rated} rated mangas)"))
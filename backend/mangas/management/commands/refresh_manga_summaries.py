@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from mangas.models import Manga
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized chapter summary (latest chapter, chapter count, last update) of every manga."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(Manga.objects.order_by('pk').values_list('pk', flat=True))
+        updated = 0
+        for start in range(0, len(ids), batch_size):
+            updated += Manga.refresh_chapter_summary(ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {updated} manga summaries"))
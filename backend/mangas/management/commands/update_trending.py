@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from mangas.trending import update_trending_scores
+
+
+class Command(BaseCommand):
+    help = "Recompute the time-decayed trending score of every manga. Run from cron (e.g. every 15 minutes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--half-life', type=float, default=None, help="Half-life in days (defaults to TRENDING_HALF_LIFE_DAYS)")
+
+    def handle(self, *args, **options):
+        trending = update_trending_scores(half_life_days=options['half_life'])
+        self.stdout.write(self.style.SUCCESS(f"Updated trending scores ({trending} trending mangas)"))
@@ -0,0 +1,138 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from email.utils import formatdate
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+
+from .images import FINGERPRINT_LENGTH
+
+CHUNK_SIZE = 64 * 1024
+# Content-addressed variant names exactly as images.build_variants writes them,
+# `page.3f9a0c1b2d.w800.webp` (plus the suffix storage adds on a name clash).
+# Anything else, such as an upload named `cover.deadbeef.png`, can be replaced.
+FINGERPRINTED = re.compile(rf'\.[0-9a-f]{{{FINGERPRINT_LENGTH}}}\.w\d+(?:_[A-Za-z0-9]{{7}})?\.webp$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def cache_control(path):
+    if FINGERPRINTED.search(os.path.basename(path)):
+        return IMMUTABLE
+    return f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)}"
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single `bytes=` range, None to serve the whole
+    file (no header, or several ranges), or False if it cannot be satisfied.
+    """
+    if not header or ',' in header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start > end:
+            return False
+    else:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if not length:
+            return False
+        start, end = max(size - length, 0), size - 1
+    if start >= size:
+        return False
+    return start, end
+
+
+def _read(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT with strong validators and byte ranges.
+
+    With MEDIA_OFFLOAD set to 'x-accel' (nginx) or 'x-sendfile' (Apache,
+    lighttpd), only the headers are produced here and the proxy sends the
+    bytes, ranges included.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    size = stat.st_size
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{size:x}')
+    headers = {
+        'ETag': etag,
+        'Last-Modified': formatdate(stat.st_mtime, usegmt=True),
+        'Cache-Control': cache_control(path),
+        'Accept-Ranges': 'bytes',
+    }
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is not None:
+        for name, value in headers.items():
+            response.headers.setdefault(name, value)
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    offload = getattr(settings, 'MEDIA_OFFLOAD', '')
+    if offload:
+        response = HttpResponse(content_type=content_type, headers=headers)
+        if offload == 'x-accel':
+            prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+            response['X-Accel-Redirect'] = prefix + quote(path.lstrip('/'))
+        else:
+            response['X-Sendfile'] = full_path
+        return response
+
+    # A Range only applies if If-Range (when given) still matches
+    if_range = request.headers.get('If-Range')
+    byte_range = None
+    if if_range is None or if_range == etag:
+        byte_range = parse_range(request.headers.get('Range'), size)
+    if byte_range is False:
+        return HttpResponse(status=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+
+    start, end = byte_range or (0, size - 1)
+    length = max(end - start + 1, 0)
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type, headers=headers)
+    else:
+        response = StreamingHttpResponse(_read(full_path, start, length), content_type=content_type, headers=headers)
+    response['Content-Length'] = str(length)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mangas", "0013_comment_user_rating"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="dailyview",
+            name="date",
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_chapter_summary(apps, schema_editor):
+    Manga = apps.get_model("mangas", "Manga")
+    Chapter = apps.get_model("mangas", "Chapter")
+    chapters = Chapter.objects.filter(manga=models.OuterRef("pk"))
+    latest = chapters.order_by("-released_at", "-id")
+    counts = (
+        chapters.order_by()
+        .values("manga")
+        .annotate(total=models.Count("id"))
+        .values("total")
+    )
+    Manga.objects.update(
+        latest_chapter=models.Subquery(latest.values("id")[:1]),
+        chapter_count=Coalesce(models.Subquery(counts), 0),
+        last_update_at=Coalesce(
+            models.Subquery(latest.values("released_at")[:1]), models.F("created_at")
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mangas", "0014_dailyview_date_default"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="manga",
+            name="chapter_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="manga",
+            name="last_update_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="manga",
+            name="latest_chapter",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="mangas.chapter",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chapter",
+            index=models.Index(
+                fields=["manga", "-released_at"], name="chapter_manga_released_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="manga",
+            index=models.Index(
+                fields=["last_update_at", "id"], name="manga_last_update_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_chapter_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mangas", "0015_manga_chapter_summary"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="manga",
+            index=models.Index(fields=["views", "id"], name="manga_views_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="readinghistory",
+            index=models.Index(
+                fields=["user", "last_read_at", "id"], name="history_user_read_idx"
+            ),
+        ),
+    ]
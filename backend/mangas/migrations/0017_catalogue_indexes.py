@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:01
+
+from django.db import migrations, models
+
+# Frozen copies of models.MANGA_TYPES / MANGA_STATUSES
+KNOWN_LABELS = {
+    "type": ("Manhwa", "Manhua", "Manga"),
+    "status": ("Ongoing", "Completed", "Hiatus"),
+}
+
+
+def normalize_labels(apps, schema_editor):
+    Manga = apps.get_model("mangas", "Manga")
+    for field, known in KNOWN_LABELS.items():
+        # Spellings grouped ignoring case and spacing; a known label wins, else the most used one
+        groups = {}
+        for row in (
+            Manga.objects.order_by().values(field).annotate(n=models.Count("id"))
+        ):
+            value = row[field]
+            if value:
+                groups.setdefault(" ".join(value.split()).casefold(), []).append(
+                    (row["n"], value)
+                )
+        for key, spellings in groups.items():
+            canonical = next(
+                (label for label in known if label.casefold() == key), None
+            )
+            canonical = canonical or " ".join(max(spellings)[1].split())
+            for _, value in spellings:
+                if value != canonical:
+                    Manga.objects.filter(**{field: value}).update(**{field: canonical})
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mangas", "0016_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="manga",
+            index=models.Index(fields=["rating", "id"], name="manga_rating_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="manga",
+            index=models.Index(fields=["created_at", "id"], name="manga_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="manga",
+            index=models.Index(fields=["title", "id"], name="manga_title_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="manga",
+            index=models.Index(
+                fields=["type", "last_update_at", "id"], name="manga_type_update_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="manga",
+            index=models.Index(
+                fields=["type", "views", "id"], name="manga_type_views_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="manga",
+            index=models.Index(
+                fields=["status", "last_update_at", "id"],
+                name="manga_status_update_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="manga",
+            index=models.Index(
+                fields=["status", "views", "id"], name="manga_status_views_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="manga",
+            index=models.Index(
+                fields=["is_featured", "created_at", "id"], name="manga_featured_idx"
+            ),
+        ),
+        migrations.RunPython(normalize_labels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:03
+
+from django.db import migrations, models
+
+
+def backfill_rating_totals(apps, schema_editor):
+    Manga = apps.get_model("mangas", "Manga")
+    Rating = apps.get_model("mangas", "Rating")
+    rows = (
+        Rating.objects.order_by()
+        .values("manga")
+        .annotate(
+            rating_sum=models.Sum("score"),
+            rating_count=models.Count("id"),
+            **{
+                f"rating_{score}": models.Count("id", filter=models.Q(score=score))
+                for score in range(1, 6)
+            },
+        )
+    )
+    for row in rows:
+        Manga.objects.filter(pk=row.pop("manga")).update(**row)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mangas", "0017_catalogue_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="manga",
+            name="rating_1",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="manga",
+            name="rating_2",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="manga",
+            name="rating_3",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="manga",
+            name="rating_4",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="manga",
+            name="rating_5",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="manga",
+            name="rating_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="manga",
+            name="rating_sum",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mangas", "0018_manga_rating_totals"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SiteRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("day", "Day"), ("week", "Week"), ("month", "Month")],
+                        max_length=5,
+                    ),
+                ),
+                ("period_start", models.DateField()),
+                ("views", models.BigIntegerField(default=0)),
+                ("total_views", models.BigIntegerField(default=0)),
+                ("total_mangas", models.IntegerField(default=0)),
+                ("total_chapters", models.IntegerField(default=0)),
+                ("built_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "unique_together": {("period", "period_start")},
+            },
+        ),
+        migrations.CreateModel(
+            name="ViewRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("day", "Day"), ("week", "Week"), ("month", "Month")],
+                        max_length=5,
+                    ),
+                ),
+                ("period_start", models.DateField()),
+                ("views", models.BigIntegerField(default=0)),
+                (
+                    "manga",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="view_rollups",
+                        to="mangas.manga",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["period", "period_start", "manga"],
+                        name="rollup_period_idx",
+                    )
+                ],
+                "unique_together": {("period", "manga", "period_start")},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mangas", "0019_analytics_rollups"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="manga",
+            name="trending_score",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="manga",
+            index=models.Index(
+                fields=["trending_score", "id"], name="manga_trending_idx"
+            ),
+        ),
+    ]
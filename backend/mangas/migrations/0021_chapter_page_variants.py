@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mangas", "0020_manga_trending_score"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chapter",
+            name="page_variants",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
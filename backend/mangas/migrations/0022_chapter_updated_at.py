@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    Chapter = apps.get_model("mangas", "Chapter")
+    Chapter.objects.update(updated_at=models.F("released_at"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mangas", "0021_chapter_page_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chapter",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
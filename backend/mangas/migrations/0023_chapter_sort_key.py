@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:18
+
+import re
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# Frozen copy of mangas.models.parse_sort_key as of this migration, so later
+# changes to the parser do not change what the backfill does
+CHAPTER_MARKER_RE = re.compile(
+    r"\b(?:ch(?:apter)?|ep(?:isode)?)(?![a-z])\.?\s*#?\s*(\d+(?:[.,]\d+)?)",
+    re.IGNORECASE,
+)
+NUMBER_RE = re.compile(r"(\d+(?:[.,]\d+)?)")
+SORT_KEY_MAX = Decimal("999999999.999")
+
+
+def parse_sort_key(chapter_number):
+    text = str(chapter_number or "")
+    match = CHAPTER_MARKER_RE.search(text) or NUMBER_RE.search(text)
+    if not match:
+        return Decimal("0")
+    value = Decimal(match.group(1).replace(",", ".")).quantize(Decimal("0.001"))
+    return min(value, SORT_KEY_MAX)
+
+
+def backfill_sort_key(apps, schema_editor):
+    Chapter = apps.get_model("mangas", "Chapter")
+    Manga = apps.get_model("mangas", "Manga")
+    batch = []
+    for chapter in Chapter.objects.only("id", "chapter_number").iterator():
+        chapter.sort_key = parse_sort_key(chapter.chapter_number)
+        batch.append(chapter)
+        if len(batch) == 500:
+            Chapter.objects.bulk_update(batch, ["sort_key"])
+            batch = []
+    Chapter.objects.bulk_update(batch, ["sort_key"])
+
+    # The latest chapter is now the highest numbered one
+    latest = Chapter.objects.filter(manga=models.OuterRef("pk")).order_by(
+        "-sort_key", "-id"
+    )
+    Manga.objects.update(latest_chapter=models.Subquery(latest.values("id")[:1]))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mangas", "0022_chapter_updated_at"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="chapter",
+            options={"ordering": ["-sort_key", "-id"]},
+        ),
+        migrations.AddField(
+            model_name="chapter",
+            name="sort_key",
+            field=models.DecimalField(
+                decimal_places=3, default=0, editable=False, max_digits=12
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chapter",
+            index=models.Index(
+                fields=["manga", "sort_key", "id"], name="chapter_manga_sort_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_sort_key, migrations.RunPython.noop),
+    ]
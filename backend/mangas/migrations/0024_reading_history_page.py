@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mangas", "0023_chapter_sort_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="readinghistory",
+            name="page",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="readinghistory",
+            name="last_read_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:41
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_counts(apps, schema_editor):
+    Comment = apps.get_model("mangas", "Comment")
+    Manga = apps.get_model("mangas", "Manga")
+    Chapter = apps.get_model("mangas", "Chapter")
+    for model, field in ((Manga, "manga"), (Chapter, "chapter")):
+        counts = (
+            Comment.objects.filter(**{field: models.OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=models.Count("id"))
+            .values("total")
+        )
+        model.objects.update(comment_count=Coalesce(models.Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("mangas", "0024_reading_history_page"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chapter",
+            name="comment_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="manga",
+            name="comment_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["manga", "created_at", "id"], name="comment_manga_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["chapter", "created_at", "id"],
+                name="comment_chapter_created_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_comment_counts, migrations.RunPython.noop),
+    ]
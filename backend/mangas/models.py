@@ -1,4 +1,49 @@
-from django.db import models
+import hashlib
+import re
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models.functions import Cast, Coalesce, Round
+from django.utils import timezone
+
+RATING_SCORES = range(1, 6)
+
+# The labels the site offers; others entered through the admin keep their own spelling
+MANGA_TYPES = ('Manhwa', 'Manhua', 'Manga')
+MANGA_STATUSES = ('Ongoing', 'Completed', 'Hiatus')
+
+def normalize_label(value, known=()):
+    """
+    Canonical spelling for type/status so lookups can be exact: spacing collapsed
+    and, ignoring case, the spelling of a known label ("  ongoing " -> "Ongoing")
+    """
+    if not value:
+        return value
+    value = ' '.join(value.split())
+    key = value.casefold()
+    return next((label for label in known if label.casefold() == key), value)
+
+def label_lookup(field, value, known):
+    """Filter on a type/status as clients spell it: exact (indexed) for known labels"""
+    label = normalize_label(value, known)
+    if label in known:
+        return models.Q(**{field: label})
+    return models.Q(**{f'{field}__iexact': label})
+
+CHAPTER_MARKER_RE = re.compile(r'\b(?:ch(?:apter)?|ep(?:isode)?)(?![a-z])\.?\s*#?\s*(\d+(?:[.,]\d+)?)', re.IGNORECASE)
+NUMBER_RE = re.compile(r'(\d+(?:[.,]\d+)?)')
+SORT_KEY_MAX = Decimal('999999999.999')
+
+def parse_sort_key(chapter_number):
+    """
+    Numeric position of a free-text chapter number: "10.5" -> 10.5, "Chapter 12" -> 12,
+    "Vol. 2 Ch. 15" -> 15. Labels without a number ("Prologue") sort as 0.
+    """
+    text = str(chapter_number or '')
+    match = CHAPTER_MARKER_RE.search(text) or NUMBER_RE.search(text)
+    if not match:
+        return Decimal('0')
+    value = Decimal(match.group(1).replace(',', '.')).quantize(Decimal('0.001'))
+    return min(value, SORT_KEY_MAX)
 
 class Genre(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -6,6 +51,14 @@ class Genre(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def fingerprint(cls):
+        """Hash of every genre's id and name: moves on creates, deletes and renames (the table is small)"""
+        digest = hashlib.md5()
+        for pk, name in cls.objects.order_by('pk').values_list('pk', 'name'):
+            digest.update(f'{pk}:{name}\0'.encode())
+        return digest.hexdigest()
+
 class Manga(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -25,12 +78,185 @@ class Manga(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Chapter summary, kept in sync by the Chapter signals (see refresh_chapter_summary)
+    latest_chapter = models.ForeignKey('Chapter', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    chapter_count = models.IntegerField(default=0)
+    last_update_at = models.DateTimeField(default=timezone.now)
+
+    # Running rating totals, updated atomically from the Rating signals.
+    # rating is derived from them; rating_1..rating_5 count votes per score.
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    rating_1 = models.IntegerField(default=0)
+    rating_2 = models.IntegerField(default=0)
+    rating_3 = models.IntegerField(default=0)
+    rating_4 = models.IntegerField(default=0)
+    rating_5 = models.IntegerField(default=0)
+
+    # Time-decayed popularity, recomputed in batch by trending.update_trending_scores
+    trending_score = models.FloatField(default=0)
+
+    # Kept in step by the Comment signals (see Comment.apply_count_change)
+    comment_count = models.IntegerField(default=0)
+
+    class Meta:
+        # Backs the orderings/filters declared on MangaViewSet
+        indexes = [
+            models.Index(fields=['last_update_at', 'id'], name='manga_last_update_idx'),
+            models.Index(fields=['views', 'id'], name='manga_views_idx'),
+            models.Index(fields=['rating', 'id'], name='manga_rating_idx'),
+            models.Index(fields=['created_at', 'id'], name='manga_created_idx'),
+            models.Index(fields=['title', 'id'], name='manga_title_idx'),
+            models.Index(fields=['type', 'last_update_at', 'id'], name='manga_type_update_idx'),
+            models.Index(fields=['type', 'views', 'id'], name='manga_type_views_idx'),
+            models.Index(fields=['status', 'last_update_at', 'id'], name='manga_status_update_idx'),
+            models.Index(fields=['status', 'views', 'id'], name='manga_status_views_idx'),
+            models.Index(fields=['is_featured', 'created_at', 'id'], name='manga_featured_idx'),
+            models.Index(fields=['trending_score', 'id'], name='manga_trending_idx'),
+        ]
+
+    # Columns kept current outside save(): view counter flushes, the Chapter,
+    # Rating and Comment signals, and update_trending. A save() of a loaded
+    # manga leaves them out unless they were changed on the instance, so it
+    # can't write back the stale values it read.
+    MAINTAINED_FIELDS = (
+        'views', 'latest_chapter', 'chapter_count', 'last_update_at',
+        'rating', 'rating_sum', 'rating_count', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+        'trending_score', 'comment_count',
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_maintained()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using, fields, **kwargs)
+        # Also runs when a deferred field is first read
+        self._remember_maintained(fields)
+
+    def _remember_maintained(self, fields=None):
+        loaded = getattr(self, '_loaded_maintained', {})
+        for name in self.MAINTAINED_FIELDS:
+            attname = self._meta.get_field(name).attname
+            if attname in self.__dict__ and (fields is None or name in fields or attname in fields):
+                loaded[attname] = self.__dict__[attname]
+        self._loaded_maintained = loaded
+
     def save(self, *args, **kwargs):
+        self.type = self._canonical_label('type', MANGA_TYPES)
+        self.status = self._canonical_label('status', MANGA_STATUSES)
         if self.cover_image_file:
             self.cover_image = self.cover_image_file.url
         if self.banner_image_file:
             self.banner_image = self.banner_image_file.url
+        loaded = getattr(self, '_loaded_maintained', None)
+        if loaded and not args and kwargs.get('update_fields') is None and not kwargs.get('force_insert') and not self._state.adding:
+            unchanged = {attname for attname, value in loaded.items() if getattr(self, attname) == value}
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in unchanged and field.attname in self.__dict__
+            ]
         super().save(*args, **kwargs)
+        self._remember_maintained()
+
+    def _canonical_label(self, field, known):
+        value = normalize_label(getattr(self, field), known)
+        if value and value not in known:
+            # Other labels take the spelling already stored ("bl" -> "BL")
+            in_use = Manga.objects.filter(**{f'{field}__iexact': value}).exclude(pk=self.pk).values_list(field, flat=True).first()
+            value = in_use or value
+        return value
+
+    @classmethod
+    def refresh_chapter_summary(cls, manga_ids):
+        """
+        Recompute latest_chapter, chapter_count and last_update_at for the given
+        mangas in a single UPDATE. Mangas without chapters fall back to created_at.
+        """
+        chapters = Chapter.objects.filter(manga=models.OuterRef('pk'))
+        # The latest chapter is the highest numbered one; a re-upload of an old
+        # chapter still counts as an update
+        latest = chapters.order_by('-sort_key', '-id')
+        newest = chapters.order_by('-released_at', '-id')
+        counts = chapters.order_by().values('manga').annotate(total=models.Count('id')).values('total')
+        return cls.objects.filter(pk__in=manga_ids).update(
+            latest_chapter=models.Subquery(latest.values('id')[:1]),
+            chapter_count=Coalesce(models.Subquery(counts), 0),
+            last_update_at=Coalesce(models.Subquery(newest.values('released_at')[:1]), models.F('created_at')),
+        )
+
+    @staticmethod
+    def average_rating():
+        """SQL expression deriving rating from rating_sum / rating_count"""
+        average = Round(Cast(models.F('rating_sum'), models.FloatField()) / models.F('rating_count'), 1)
+        return models.Case(
+            models.When(rating_count__gt=0, then=average),
+            default=models.Value(Decimal('0.0')),
+            output_field=models.DecimalField(max_digits=3, decimal_places=1),
+        )
+
+    @classmethod
+    def apply_rating_change(cls, manga_id, added=None, removed=None):
+        """
+        Fold one vote into the running totals: added is the new score, removed
+        the score it replaces (or None for a new vote / deletion).
+        """
+        if added == removed:
+            return
+        updates = {}
+        sum_delta = (added or 0) - (removed or 0)
+        count_delta = (added is not None) - (removed is not None)
+        if sum_delta:
+            updates['rating_sum'] = models.F('rating_sum') + sum_delta
+        if count_delta:
+            updates['rating_count'] = models.F('rating_count') + count_delta
+        if added is not None:
+            updates[f'rating_{added}'] = models.F(f'rating_{added}') + 1
+        if removed is not None:
+            updates[f'rating_{removed}'] = models.F(f'rating_{removed}') - 1
+
+        # Two statements because MySQL and Postgres disagree on whether later
+        # SET clauses see earlier ones; the first UPDATE holds the row lock.
+        with transaction.atomic():
+            cls.objects.filter(pk=manga_id).update(**updates)
+            cls.objects.filter(pk=manga_id).update(rating=cls.average_rating())
+
+    @classmethod
+    def reconcile_ratings(cls):
+        """Recompute every manga's rating totals from the Rating table"""
+        totals = {
+            row.pop('manga'): row
+            for row in Rating.objects.order_by().values('manga').annotate(
+                rating_sum=models.Sum('score'),
+                rating_count=models.Count('id'),
+                **{f'rating_{score}': models.Count('id', filter=models.Q(score=score)) for score in RATING_SCORES},
+            )
+        }
+        fields = ['rating_sum', 'rating_count'] + [f'rating_{score}' for score in RATING_SCORES]
+        with transaction.atomic():
+            cls.objects.update(**{field: 0 for field in fields})
+            mangas = list(cls.objects.filter(pk__in=totals).only('pk'))
+            for manga in mangas:
+                for field, value in totals[manga.pk].items():
+                    setattr(manga, field, value)
+            cls.objects.bulk_update(mangas, fields, batch_size=500)
+            cls.objects.update(rating=cls.average_rating())
+        return len(mangas)
+
+    @classmethod
+    def catalogue_state(cls):
+        """
+        Cheap fingerprint of the manga, manga-genre and genre tables, compared by
+        the in-process indexes (search.py, facets.py) to notice other processes' writes
+        """
+        state = cls.objects.aggregate(count=models.Count('id'), latest=models.Max('updated_at'))
+        # Tagging changes the link table without touching updated_at
+        state.update(cls.genres.through.objects.aggregate(links=models.Count('id'), last_link=models.Max('id')))
+        # Renames change the labels without touching either table above
+        state['genres'] = Genre.fingerprint()
+        return state
 
     def __str__(self):
         return self.title
@@ -38,11 +264,54 @@ class Manga(models.Model):
 class Chapter(models.Model):
     manga = models.ForeignKey(Manga, on_delete=models.CASCADE, related_name='chapters')
     chapter_number = models.CharField(max_length=50)
+    # parse_sort_key(chapter_number), kept in step on save
+    sort_key = models.DecimalField(max_digits=12, decimal_places=3, default=0, editable=False)
     released_at = models.DateTimeField(auto_now_add=True)
+    # Indexed so the latest chapter change (a conditional GET validator) is one index lookup
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     pages = models.JSONField(default=list, blank=True)
+    # One manifest per page: {'src', 'width', 'height', 'variants': [{'url', 'width', 'height', 'bytes'}]}
+    page_variants = models.JSONField(default=list, blank=True)
+    # Kept in step by the Comment signals
+    comment_count = models.IntegerField(default=0)
 
     class Meta:
-        ordering = ['-released_at']
+        ordering = ['-sort_key', '-id']
+        indexes = [
+            models.Index(fields=['manga', '-released_at'], name='chapter_manga_released_idx'),
+            models.Index(fields=['manga', 'sort_key', 'id'], name='chapter_manga_sort_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.sort_key = parse_sort_key(self.chapter_number)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'chapter_number' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'sort_key'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the original manga so moving a chapter refreshes both summaries
+        instance._loaded_manga_id = instance.__dict__.get('manga_id')
+        return instance
+
+    # Reading order within a manga (the last field breaks ties)
+    READING_ORDER = ('sort_key', 'id')
+    # Columns needed to list chapters; the pages/page_variants JSON stays behind
+    LIST_FIELDS = ('id', 'manga', 'chapter_number', 'released_at', 'sort_key')
+
+    def neighbours(self, forward=True):
+        """
+        Chapters of the same manga after (or before) this one in reading order,
+        nearest first. `.first()` on it is a single seek on chapter_manga_sort_idx.
+        """
+        op = 'gt' if forward else 'lt'
+        key, tiebreak = self.READING_ORDER
+        value = getattr(self, key)
+        after = models.Q(**{f'{key}__{op}': value}) | models.Q(**{key: value, f'{tiebreak}__{op}': getattr(self, tiebreak)})
+        ordering = self.READING_ORDER if forward else [f'-{field}' for field in self.READING_ORDER]
+        return Chapter.objects.filter(after, manga_id=self.manga_id).order_by(*ordering)
 
     def __str__(self):
         return f"{self.manga.title} - {self.chapter_number}"
@@ -57,6 +326,27 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        # Cursor pages of a manga's or a chapter's thread (see CommentPagination)
+        indexes = [
+            models.Index(fields=['manga', 'created_at', 'id'], name='comment_manga_created_idx'),
+            models.Index(fields=['chapter', 'created_at', 'id'], name='comment_chapter_created_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Moving a comment shifts the counts of both threads
+        instance._loaded_manga_id = instance.__dict__.get('manga_id')
+        instance._loaded_chapter_id = instance.__dict__.get('chapter_id')
+        return instance
+
+    @staticmethod
+    def apply_count_change(manga_id, chapter_id, delta):
+        """Move Manga.comment_count and Chapter.comment_count by delta with atomic F() updates"""
+        if manga_id is not None:
+            Manga.objects.filter(pk=manga_id).update(comment_count=models.F('comment_count') + delta)
+        if chapter_id is not None:
+            Chapter.objects.filter(pk=chapter_id).update(comment_count=models.F('comment_count') + delta)
 
     def __str__(self):
         return f"Comment by {self.name} on {self.manga.title}"
@@ -64,27 +354,27 @@ class Comment(models.Model):
 class Rating(models.Model):
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='ratings')
     manga = models.ForeignKey(Manga, on_delete=models.CASCADE, related_name='ratings')
-    score = models.IntegerField(choices=[(i, i) for i in range(1, 6)]) # 1-5 scale
+    score = models.IntegerField(choices=[(i, i) for i in RATING_SCORES]) # 1-5 scale
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('user', 'manga')
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update Manga average rating
-        ratings = Rating.objects.filter(manga=self.manga)
-        avg_rating = ratings.aggregate(models.Avg('score'))['score__avg']
-        self.manga.rating = round(avg_rating, 1)
-        self.manga.save()
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The manga's running totals need the score being replaced
+        instance._loaded_score = instance.__dict__.get('score')
+        instance._loaded_manga_id = instance.__dict__.get('manga_id')
+        return instance
 
     def __str__(self):
         return f"{self.user.username} - {self.manga.title} - {self.score}"
 
 class DailyView(models.Model):
     manga = models.ForeignKey(Manga, on_delete=models.CASCADE, related_name='daily_views')
-    date = models.DateField(auto_now_add=True)
+    date = models.DateField(default=timezone.localdate)
     views = models.IntegerField(default=0)
 
     class Meta:
@@ -93,6 +383,40 @@ class DailyView(models.Model):
     def __str__(self):
         return f"{self.manga.title} - {self.date} - {self.views}"
 
+class SiteRollup(models.Model):
+    """Site-wide views per day/week/month, plus catalogue totals as of the last build"""
+    PERIODS = [('day', 'Day'), ('week', 'Week'), ('month', 'Month')]
+
+    period = models.CharField(max_length=5, choices=PERIODS)
+    period_start = models.DateField()
+    views = models.BigIntegerField(default=0)
+    total_views = models.BigIntegerField(default=0)
+    total_mangas = models.IntegerField(default=0)
+    total_chapters = models.IntegerField(default=0)
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('period', 'period_start')
+
+    def __str__(self):
+        return f"{self.period} {self.period_start} - {self.views}"
+
+class ViewRollup(models.Model):
+    """Per-manga views per day/week/month, built from DailyView by rollups.build_rollups"""
+    manga = models.ForeignKey(Manga, on_delete=models.CASCADE, related_name='view_rollups')
+    period = models.CharField(max_length=5, choices=SiteRollup.PERIODS)
+    period_start = models.DateField()
+    views = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('period', 'manga', 'period_start')
+        indexes = [
+            models.Index(fields=['period', 'period_start', 'manga'], name='rollup_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.manga.title} - {self.period} {self.period_start} - {self.views}"
+
 class Bookmark(models.Model):
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='bookmarks')
     manga = models.ForeignKey(Manga, on_delete=models.CASCADE, related_name='bookmarked_by')
@@ -108,11 +432,17 @@ class ReadingHistory(models.Model):
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='reading_history')
     manga = models.ForeignKey(Manga, on_delete=models.CASCADE)
     chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE)
-    last_read_at = models.DateTimeField(auto_now=True)
+    # Page index within the chapter the reader got to
+    page = models.PositiveIntegerField(default=0)
+    # When the progress was recorded; set explicitly so late events can't overwrite newer ones (see progress.py)
+    last_read_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['-last_read_at']
         unique_together = ('user', 'manga')  # Keep one entry per manga per user (the latest chapter)
+        indexes = [
+            models.Index(fields=['user', 'last_read_at', 'id'], name='history_user_read_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.manga.title} - {self.chapter.chapter_number}"
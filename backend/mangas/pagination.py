@@ -0,0 +1,167 @@
+import base64
+import datetime
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """
+    LimitOffsetPagination with an opt-in keyset (cursor) mode.
+
+    Without a `cursor` parameter nothing changes. Passing `?cursor=` switches
+    to keyset paging: the queryset ordering (plus the primary key as a tie
+    breaker) is used as a seek key, so every page is a `WHERE (key, id) < (...)`
+    range scan on the matching index no matter how deep it is, and rows that
+    move between requests never cause duplicates or gaps.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    # Subclasses can make keyset paging the only mode
+    keyset_by_default = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.keyset_by_default or self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request) or self.default_limit or 20
+        self.ordering = self.get_ordering(queryset)
+        self.model = queryset.model
+        queryset = queryset.order_by(*[('-' if desc else '') + name for name, desc in self.ordering])
+
+        reverse, position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position, reverse))
+        if reverse:
+            queryset = queryset.reverse()
+
+        results = list(queryset[:self.limit + 1])
+        has_more = len(results) > self.limit
+        results = results[:self.limit]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.first_position = self.position_of(results[0]) if results else position
+        self.last_position = self.position_of(results[-1]) if results else position
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_cursor_link()),
+            ('previous', self.get_previous_cursor_link()),
+            ('results', data),
+        ]))
+
+    # Ordering
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering or [])
+        keys = []
+        for item in ordering:
+            if not isinstance(item, str) or '__' in item or item == '?':
+                raise ValidationError({self.cursor_query_param: 'Cursor pagination is not available for this ordering.'})
+            desc = item.startswith('-')
+            name = item.lstrip('-')
+            name = 'pk' if name == 'id' else name
+            if name != 'pk':
+                try:
+                    field = queryset.model._meta.get_field(name)
+                except FieldDoesNotExist:
+                    raise ValidationError({self.cursor_query_param: f'Cannot paginate on "{name}".'})
+                if field.null:
+                    raise ValidationError({self.cursor_query_param: f'Cannot paginate on nullable "{name}".'})
+            keys.append((name, desc))
+            if name == 'pk':
+                break
+
+        if not keys or keys[-1][0] != 'pk':
+            # The primary key makes every position unique
+            desc = keys[-1][1] if keys else True
+            keys.append(('pk', desc))
+        return keys
+
+    def seek_filter(self, position, reverse=False):
+        """(a, b, pk) > (x, y, z) spelled out as an OR of prefix matches"""
+        condition = Q()
+        for i, (name, desc) in enumerate(reversed(self.ordering)):
+            index = len(self.ordering) - 1 - i
+            lookup = 'lt' if desc != reverse else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[index]})
+            condition = step if i == 0 else step | (Q(**{name: position[index]}) & condition)
+        # Repeat the bound on the leading key alone so the planner can range scan it
+        name, desc = self.ordering[0]
+        lead = 'lte' if desc != reverse else 'gte'
+        return Q(**{f'{name}__{lead}': position[0]}) & condition
+
+    def position_of(self, obj):
+        if isinstance(obj, dict):
+            # A .values() row (see projections.py)
+            return [obj[self.model._meta.pk.name if name == 'pk' else name] for name, _ in self.ordering]
+        return [self._field(name).value_from_object(obj) if name != 'pk' else obj.pk for name, _ in self.ordering]
+
+    def _field(self, name):
+        return self.model._meta.pk if name == 'pk' else self.model._meta.get_field(name)
+
+    # Cursor encoding
+
+    def encode_cursor(self, position, reverse):
+        # Full isoformat(): DjangoJSONEncoder rounds to milliseconds, which
+        # would skip or repeat rows sharing a millisecond with the boundary
+        position = [value.isoformat() if isinstance(value, (datetime.datetime, datetime.time)) else value for value in position]
+        payload = json.dumps({'r': int(reverse), 'p': position}, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            values = payload['p']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [self._field(name).to_python(value) for (name, _), value in zip(self.ordering, values)]
+            return bool(payload.get('r')), position
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_cursor_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last_position, False))
+
+    def get_previous_cursor_link(self):
+        if not self.has_previous:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.first_position, True))
+
+
+class CommentPagination(KeysetPagination):
+    """Always keyset: comment threads are read newest first a page at a time, never counted"""
+    keyset_by_default = True
+    max_limit = 100
+
+
+class ChapterListPagination(KeysetPagination):
+    """Always keyset: long chapter lists are walked page by page, never counted"""
+    keyset_by_default = True
+    default_limit = 100
+    max_limit = 500
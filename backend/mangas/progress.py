@@ -0,0 +1,174 @@
+import datetime
+import logging
+import threading
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .counters import PeriodicFlusher
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressBuffer(PeriodicFlusher):
+    """
+    Write-behind buffer for reading progress (chapter, and page within it).
+
+    Only the latest event per (user, manga) is kept, so a reader paging
+    through a chapter costs one write per flush interval rather than one per
+    page. A flush applies everything pending in a single transaction, and an
+    event older than the stored progress never replaces it (last write wins,
+    by event time), so workers flushing in any order agree on the result.
+
+    The buffer belongs to one process. Reads flush the caller's entries in the
+    worker serving them, but progress recorded by another worker only shows
+    once that worker flushes: with several workers, history and the bookmark
+    updates feed are eventually consistent, at most one flush interval behind.
+    An interval of 0 writes every event through instead.
+    """
+    interval_setting = 'READING_PROGRESS_FLUSH_INTERVAL'
+    interval_default = 5
+    thread_name = 'reading-progress-flush'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}  # (user_id, manga_id) -> (read_at, chapter_id, page)
+
+    def record(self, user_id, manga_id, chapter_id, page=0, read_at=None):
+        # Client clocks can run ahead; nothing is read in the future
+        now = timezone.now()
+        read_at = min(read_at, now) if read_at else now
+        with self._lock:
+            self._merge({(user_id, manga_id): (read_at, chapter_id, page)})
+        self._ensure_flusher()
+
+    def _merge(self, entries):
+        for key, entry in entries.items():
+            current = self._pending.get(key)
+            # Ties go to the later call
+            if current is None or entry[0] >= current[0]:
+                self._pending[key] = entry
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+
+    def flush(self, user_id=None):
+        """Write pending progress (only that user's with user_id); returns the number of entries"""
+        with self._lock:
+            if user_id is None:
+                pending, self._pending = self._pending, {}
+            else:
+                pending = {key: self._pending.pop(key) for key in list(self._pending) if key[0] == user_id}
+        if not pending:
+            return 0
+
+        try:
+            apply_progress(pending)
+        except Exception:
+            logger.exception('Failed to flush %d buffered reading progress entries', len(pending))
+            with self._lock:
+                self._merge(pending)
+            return 0
+        return len(pending)
+
+
+def parse_event(event):
+    """
+    (chapter_id, manga_id or None, page, read_at or None) from one progress event
+    {'chapter', 'manga'?, 'page'?, 'read_at'?}; read_at is ISO 8601 or epoch
+    milliseconds. Raises ValueError with a message for the client.
+    """
+    if not isinstance(event, dict):
+        raise ValueError('each event must be an object')
+    try:
+        chapter_id = int(event['chapter'])
+        manga_id = int(event['manga']) if event.get('manga') not in (None, '') else None
+        page = int(event.get('page') or 0)
+    except KeyError:
+        raise ValueError('chapter is required')
+    except (TypeError, ValueError):
+        raise ValueError('chapter, manga and page must be integers')
+    if page < 0:
+        raise ValueError('page must not be negative')
+
+    read_at = event.get('read_at')
+    if read_at in (None, ''):
+        return chapter_id, manga_id, page, None
+    if isinstance(read_at, (int, float)) and not isinstance(read_at, bool):
+        try:
+            read_at = datetime.datetime.fromtimestamp(read_at / 1000, tz=datetime.timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            raise ValueError('read_at is out of range')
+    else:
+        try:
+            parsed = parse_datetime(str(read_at))
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValueError('read_at must be an ISO 8601 datetime or epoch milliseconds')
+        read_at = parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+    return chapter_id, manga_id, page, read_at
+
+
+def apply_progress(entries):
+    """
+    Upsert {(user_id, manga_id): (read_at, chapter_id, page)} into ReadingHistory
+    in one transaction and a fixed number of queries. Stored rows only move
+    forward in time; entries for chapters deleted meanwhile are dropped.
+    """
+    from .models import Chapter, ReadingHistory
+
+    chapters = {chapter_id for _, chapter_id, _ in entries.values()}
+    existing_chapters = set(Chapter.objects.filter(pk__in=chapters).values_list('pk', flat=True))
+    entries = {key: entry for key, entry in entries.items() if entry[1] in existing_chapters}
+    if not entries:
+        return 0
+
+    fields = ['chapter', 'page', 'last_read_at']
+
+    def locked(keys):
+        rows = ReadingHistory.objects.select_for_update().filter(
+            user_id__in={user_id for user_id, _ in keys},
+            manga_id__in={manga_id for _, manga_id in keys},
+        ).only('user', 'manga', *fields)
+        return {(row.user_id, row.manga_id): row for row in rows}
+
+    def move_forward(rows):
+        """The rows an entry replaces: only by a later (or equally late) read"""
+        changed = []
+        for key, row in rows.items():
+            read_at, chapter_id, page = entries[key]
+            current = (row.chapter_id, row.page, row.last_read_at)
+            if read_at >= row.last_read_at and current != (chapter_id, page, read_at):
+                row.chapter_id, row.page, row.last_read_at = chapter_id, page, read_at
+                changed.append(row)
+        return changed
+
+    with transaction.atomic():
+        # The filter is a cross product of users and mangas; keep the pairs asked for
+        stored = {key: row for key, row in locked(entries).items() if key in entries}
+        changed = move_forward(stored)
+
+        missing = [key for key in entries if key not in stored]
+        if missing:
+            ReadingHistory.objects.bulk_create([
+                ReadingHistory(user_id=user_id, manga_id=manga_id, chapter_id=chapter_id, page=page, last_read_at=read_at)
+                for (user_id, manga_id), (read_at, chapter_id, page) in ((key, entries[key]) for key in missing)
+            ], ignore_conflicts=True)
+            # Another worker may have inserted some of these rows since the select
+            # (an upsert with a conflict target is not available on MySQL); those
+            # only move forward too, and the rows inserted here already match
+            raced = {key: row for key, row in locked(missing).items() if key in entries and key not in stored}
+            changed += move_forward(raced)
+
+        ReadingHistory.objects.bulk_update(changed, fields)
+    return len(changed) + len(missing)
+
+
+progress_buffer = ProgressBuffer()
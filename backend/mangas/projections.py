@@ -0,0 +1,282 @@
+from collections import defaultdict
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from rest_framework import relations, serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import empty
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+from .facets import split_param
+from .models import Manga, Chapter
+from .serializers import (
+    LATEST_CHAPTERS, MangaSerializer, MangaDetailSerializer, ChapterSerializer, ChapterListSerializer,
+    ChapterDetailSerializer, CommentSerializer, BookmarkSerializer, ReadingHistorySerializer,
+)
+
+# Serializer fields whose to_representation() gives back the database value unchanged
+PASSTHROUGH = (
+    serializers.CharField, serializers.IntegerField, serializers.FloatField, serializers.BooleanField,
+    serializers.ReadOnlyField,
+)
+# A field the serializer leaves out of its output (SkipField)
+SKIP = object()
+
+
+class Projection:
+    """
+    Read-only counterpart of a ModelSerializer: the same output, built from
+    `.values()` rows instead of model instances.
+
+    The columns are worked out once from `serializer_class`. Fields with no
+    column of their own (SerializerMethodField, many-to-many) are filled by a
+    `get_<field>(row)` method, and `prepare(rows)` can load what those need for
+    the whole page in one query.
+
+    `fields` narrows the output to a subset of the serializer's fields; only
+    their columns are selected.
+    """
+    serializer_class = None
+
+    def __init__(self, context=None, fields=None):
+        self.context = context or {}
+        request = self.context.get('request')
+        self.plan = []
+        for name, path, kind, guards, missing in self.columns():
+            if fields is not None and name not in fields:
+                continue
+            if path is None:
+                convert = getattr(self, f'get_{name}')
+            elif kind == 'file':
+                convert = self.file_url(path, request)
+            else:
+                convert = kind
+            self.plan.append((name, path, convert, guards, missing))
+        self.fields = {name for name, *_ in self.plan}
+
+    @classmethod
+    def field_names(cls):
+        return [name for name, *_ in cls.columns()]
+
+    @classmethod
+    def columns(cls):
+        if '_columns' not in cls.__dict__:
+            cls._columns = cls.build_columns()
+        return cls._columns
+
+    @classmethod
+    def build_columns(cls):
+        serializer = cls.serializer_class()
+        model = serializer.Meta.model
+        columns = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, (serializers.SerializerMethodField, relations.ManyRelatedField)):
+                if not hasattr(cls, f'get_{name}'):
+                    raise ImproperlyConfigured(f'{cls.__name__} needs a get_{name}(row) method for "{name}".')
+                columns.append((name, None, None, (), SKIP))
+                continue
+            if field.source == '*' or isinstance(field, serializers.BaseSerializer):
+                raise ImproperlyConfigured(f'{cls.__name__} cannot project "{name}" from a column.')
+
+            # A null relation on the way (comment.user.username for a guest)
+            # makes the serializer fall back to the field's default, or skip it
+            guards, target = [], model
+            for i, attr in enumerate(field.source_attrs[:-1]):
+                relation = target._meta.get_field(attr)
+                if relation.null:
+                    guards.append('__'.join(field.source_attrs[:i + 1]))
+                target = relation.related_model
+            if field.default is not empty:
+                missing = field.get_default()
+            elif field.allow_null:
+                missing = None
+            else:
+                missing = SKIP
+
+            columns.append((name, '__'.join(field.source_attrs), cls.converter(field), tuple(guards), missing))
+        return columns
+
+    @staticmethod
+    def converter(field):
+        """None when the value passes through, 'file' for storage URLs, else to_representation"""
+        if isinstance(field, serializers.FileField):
+            return 'file'
+        if isinstance(field, PASSTHROUGH) and not isinstance(field, serializers.ChoiceField):
+            return None
+        if isinstance(field, serializers.JSONField) and not field.binary:
+            return None
+        if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+            return None
+        return field.to_representation
+
+    def file_url(self, path, request):
+        model_field = self.serializer_class.Meta.model._meta.get_field(path)
+
+        def convert(name):
+            if not name:
+                return None
+            url = model_field.storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+        return convert
+
+    def values(self, queryset, *extra):
+        """The queryset as rows with every column the output (and its ordering) needs"""
+        pk = queryset.model._meta.pk.name
+        names = dict.fromkeys((pk, *extra))
+        for _, path, _, guards, _ in self.plan:
+            if path is not None:
+                names[path] = None
+            names.update(dict.fromkeys(guards))
+        # Keyset pagination reads its position from the ordering columns
+        for item in queryset.query.order_by or queryset.model._meta.ordering:
+            if isinstance(item, str) and item != '?':
+                name = item.lstrip('-')
+                names[pk if name == 'pk' else name] = None
+        return queryset.values(*names)
+
+    def prepare(self, rows):
+        pass
+
+    def to_representation(self, row):
+        data = {}
+        for name, path, convert, guards, missing in self.plan:
+            if path is None:
+                data[name] = convert(row)
+                continue
+            if guards and any(row[guard] is None for guard in guards):
+                if missing is not SKIP:
+                    data[name] = missing
+                continue
+            value = row[path]
+            data[name] = value if convert is None or value is None else convert(value)
+        return data
+
+    def many(self, rows):
+        rows = list(rows)
+        self.prepare(rows)
+        return [self.to_representation(row) for row in rows]
+
+    def one(self, row):
+        return self.many([row])[0]
+
+
+class ChapterProjection(Projection):
+    serializer_class = ChapterSerializer
+
+
+class ChapterListProjection(Projection):
+    serializer_class = ChapterListSerializer
+
+
+class ChapterDetailProjection(Projection):
+    serializer_class = ChapterDetailSerializer
+
+
+class MangaProjection(Projection):
+    serializer_class = MangaSerializer
+    # Chapters embedded per manga (None for all of them)
+    chapter_limit = LATEST_CHAPTERS
+
+    def prepare(self, rows):
+        ids = [row['id'] for row in rows]
+        self.genre_names = defaultdict(list)
+        self.manga_chapters = defaultdict(list)
+        if not ids:
+            return
+
+        if 'genres' in self.fields:
+            links = Manga.genres.through.objects.filter(manga_id__in=ids).order_by('genre_id')
+            for manga_id, name in links.values_list('manga_id', 'genre__name'):
+                self.genre_names[manga_id].append(name)
+
+        if 'chapters' not in self.fields:
+            return
+        chapters = Chapter.objects.filter(manga_id__in=ids)
+        limit = self.context.get('chapter_limit', self.chapter_limit)
+        if limit is not None:
+            # The first `limit` chapters of every manga in one windowed query
+            rank = Window(RowNumber(), partition_by=F('manga_id'), order_by=[F('sort_key').desc(), F('id').desc()])
+            chapters = chapters.annotate(rank=rank).filter(rank__lte=limit)
+        nested = ChapterProjection(self.context)
+        for row in nested.values(chapters, 'manga'):
+            self.manga_chapters[row['manga']].append(nested.to_representation(row))
+
+    def get_genres(self, row):
+        return self.genre_names.get(row['id'], [])
+
+    def get_chapters(self, row):
+        return self.manga_chapters.get(row['id'], [])
+
+
+class MangaDetailProjection(MangaProjection):
+    serializer_class = MangaDetailSerializer
+    chapter_limit = None
+
+
+class CommentProjection(Projection):
+    serializer_class = CommentSerializer
+
+    def get_user_avatar(self, row):
+        return None
+
+
+class BookmarkProjection(Projection):
+    serializer_class = BookmarkSerializer
+
+
+class ReadingHistoryProjection(Projection):
+    serializer_class = ReadingHistorySerializer
+
+
+class ProjectedReadMixin:
+    """
+    Answer `list` and `retrieve` from `projection_class` (plain dicts built
+    from `.values()`) instead of the serializer. Writes, and the responses to
+    them, still go through the serializer.
+
+    `?fields=a,b` keeps only the named fields and `?omit=c` drops some, which
+    also drops their columns (and related lookups) from the queries.
+    """
+    projection_class = None
+
+    def get_projection(self, projection_class=None, **context):
+        projection_class = projection_class or self.projection_class
+        return projection_class({**self.get_serializer_context(), **context}, fields=self.get_sparse_fields(projection_class))
+
+    def get_sparse_fields(self, projection_class):
+        """The fields asked for with ?fields= / ?omit=, None for all of them"""
+        params = self.request.query_params
+        if 'fields' not in params and 'omit' not in params:
+            return None
+        available = projection_class.field_names()
+        requested = {param: split_param(params.get(param)) for param in ('fields', 'omit')}
+        for param, names in requested.items():
+            unknown = [name for name in names if name not in available]
+            if unknown:
+                raise ValidationError({param: f'Unknown field(s): {", ".join(unknown)}. Choose from: {", ".join(available)}.'})
+        fields = requested['fields'] if 'fields' in params else available
+        return {name for name in fields if name not in requested['omit']}
+
+    def get_object_row(self, projection):
+        """get_object() for a projection: the row, 404 if missing; object permissions see the row"""
+        queryset = projection.values(self.filter_queryset(self.get_queryset()))
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(self.request, row)
+        return row
+
+    def list(self, request, *args, **kwargs):
+        projection = self.get_projection()
+        queryset = projection.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(projection.many(page))
+        return Response(projection.many(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        projection = self.get_projection()
+        return Response(projection.one(self.get_object_row(projection)))
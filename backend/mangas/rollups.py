@@ -0,0 +1,137 @@
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import Manga, Chapter, DailyView, SiteRollup, ViewRollup
+
+RANGE_RE = re.compile(r'^(\d+)([dwm])$')
+# unit -> (rollup period, largest accepted count)
+RANGE_UNITS = {'d': ('day', 366), 'w': ('week', 104), 'm': ('month', 120)}
+TRUNCATE = {'week': TruncWeek, 'month': TruncMonth}
+
+
+def period_start(period, day):
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def bucket_starts(period, count, today):
+    """Start dates of the last `count` buckets, oldest first, ending with the current one"""
+    current = period_start(period, today)
+    starts = []
+    for _ in range(count):
+        starts.append(current)
+        if period == 'day':
+            current -= timedelta(days=1)
+        elif period == 'week':
+            current -= timedelta(weeks=1)
+        else:
+            current = period_start('month', current - timedelta(days=1))
+    return starts[::-1]
+
+
+def parse_range(value):
+    """'90d' / '12w' / '12m' -> (period, count); None if invalid"""
+    match = RANGE_RE.match(value or '')
+    if not match:
+        return None
+    count, (period, limit) = int(match.group(1)), RANGE_UNITS[match.group(2)]
+    if not 1 <= count <= limit:
+        return None
+    return period, count
+
+
+def _upsert(model, objs, unique_fields, update_fields):
+    if not objs:
+        return
+    # MySQL upserts on any unique key and refuses an explicit conflict target
+    if not connection.features.supports_update_conflicts_with_target:
+        unique_fields = None
+    model.objects.bulk_create(
+        objs, batch_size=500, update_conflicts=True,
+        unique_fields=unique_fields, update_fields=update_fields,
+    )
+
+
+def build_rollups(today=None):
+    """
+    Incrementally roll DailyView up into day/week/month buckets.
+
+    Only days from the last built day onwards are recomputed (the day before is
+    included so late view-counter flushes are not lost), then the week and month
+    buckets containing them are re-summed from the day buckets. Every write is
+    an idempotent upsert, so running it twice or concurrently is harmless.
+    """
+    today = today or timezone.localdate()
+    last_built = SiteRollup.objects.filter(period='day').aggregate(last=Max('period_start'))['last']
+    if last_built is None:
+        since = DailyView.objects.aggregate(first=Min('date'))['first'] or today
+    else:
+        since = min(last_built, today) - timedelta(days=1)
+
+    with transaction.atomic():
+        per_manga = DailyView.objects.filter(date__gte=since, date__lte=today).values_list('manga_id', 'date', 'views')
+        _upsert(
+            ViewRollup,
+            [ViewRollup(manga_id=m, period='day', period_start=d, views=v) for m, d, v in per_manga],
+            ['period', 'manga', 'period_start'], ['views'],
+        )
+
+        for period, trunc in TRUNCATE.items():
+            rows = (
+                ViewRollup.objects.filter(period='day', period_start__gte=period_start(period, since))
+                .annotate(bucket=trunc('period_start')).values('manga', 'bucket')
+                .annotate(total=Sum('views')).values_list('manga', 'bucket', 'total')
+            )
+            _upsert(
+                ViewRollup,
+                [ViewRollup(manga_id=m, period=period, period_start=b, views=v) for m, b, v in rows],
+                ['period', 'manga', 'period_start'], ['views'],
+            )
+
+        # Site-wide buckets are sums of the per-manga ones
+        site = []
+        for period in ('day', 'week', 'month'):
+            rows = (
+                ViewRollup.objects.filter(period=period, period_start__gte=period_start(period, since))
+                .values('period_start').annotate(total=Sum('views')).values_list('period_start', 'total')
+            )
+            site += [SiteRollup(period=period, period_start=start, views=total) for start, total in rows]
+        _upsert(SiteRollup, site, ['period', 'period_start'], ['views', 'built_at'])
+
+        # Catalogue totals are snapshotted here so the dashboard never counts rows
+        totals = Manga.objects.aggregate(total_views=Sum('views'))
+        SiteRollup.objects.update_or_create(
+            period='day', period_start=today,
+            defaults={
+                'total_views': totals['total_views'] or 0,
+                'total_mangas': Manga.objects.count(),
+                'total_chapters': Chapter.objects.count(),
+            },
+        )
+
+    compact(today)
+
+
+def compact(today=None):
+    """Drop raw DailyView rows and per-manga day buckets that have been rolled up"""
+    today = today or timezone.localdate()
+    raw_days = max(getattr(settings, 'ANALYTICS_RAW_RETENTION_DAYS', 90), 2)
+    day_rollup_days = getattr(settings, 'ANALYTICS_DAY_ROLLUP_RETENTION_DAYS', 400)
+    deleted, _ = DailyView.objects.filter(date__lt=today - timedelta(days=raw_days)).delete()
+    ViewRollup.objects.filter(period='day', period_start__lt=today - timedelta(days=day_rollup_days)).delete()
+    return deleted
+
+
+def is_stale(latest, today):
+    """True if the scheduled build_rollups job has not run recently (the dashboard never rebuilds inline)"""
+    max_age = getattr(settings, 'ANALYTICS_ROLLUP_MAX_AGE', 300)
+    return latest is None or latest.period_start < today or timezone.now() - latest.built_at > timedelta(seconds=max_age)
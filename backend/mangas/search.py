@@ -0,0 +1,353 @@
+import math
+import os
+import pickle
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Case, When, IntegerField
+from rest_framework.filters import BaseFilterBackend
+
+# Relative weight of each indexed field in the BM25 term frequencies
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'author': 1.5,
+    'artist': 1.5,
+    'genres': 1.5,
+    'description': 1.0,
+}
+
+# How much a partial / fuzzy match is worth compared to an exact term
+PREFIX_WEIGHT = 0.9
+SUBSTRING_WEIGHT = 0.7
+FUZZY_WEIGHT = 0.6
+MAX_EXPANSIONS = 10
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Lowercase, accent-folded word tokens"""
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _TOKEN_RE.findall(text)
+
+
+def trigrams(term):
+    padded = f'${term}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Damerau-Levenshtein (optimal string alignment) distance, capped at limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+class SearchIndex:
+    """
+    In-process inverted index over the manga catalogue with BM25 ranking.
+
+    Every term keeps a posting list of doc id -> weighted term frequency, and
+    a trigram index over the vocabulary resolves partial words and typos to
+    real terms at query time. The index is updated incrementally from the
+    Manga signals; other worker processes catch up through sync(), which
+    compares a cheap (count, max updated_at, genre names) fingerprint with the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self._built = False
+        self._state = None
+        self._snapshot_mtime = None
+        self._last_sync = 0.0
+
+    def _reset(self):
+        self._postings = defaultdict(dict)  # term -> {doc_id: weighted tf}
+        self._doc_terms = {}                 # doc_id -> set of terms
+        self._doc_len = {}                   # doc_id -> weighted length
+        self._total_len = 0.0
+        self._grams = defaultdict(set)       # trigram -> terms
+
+    # Documents
+
+    @staticmethod
+    def document_for(manga, genre_names=None):
+        if genre_names is None:
+            genre_names = [g.name for g in manga.genres.all()]
+        return {
+            'title': manga.title,
+            'author': manga.author,
+            'artist': manga.artist,
+            'genres': ' '.join(genre_names),
+            'description': manga.description,
+        }
+
+    def add(self, doc_id, document):
+        freqs = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(document.get(field)):
+                freqs[token] += weight
+
+        with self._lock:
+            self._remove(doc_id)
+            for term, tf in freqs.items():
+                if term not in self._postings:
+                    for gram in trigrams(term):
+                        self._grams[gram].add(term)
+                self._postings[term][doc_id] = tf
+            self._doc_terms[doc_id] = set(freqs)
+            self._doc_len[doc_id] = sum(freqs.values())
+            self._total_len += self._doc_len[doc_id]
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self._total_len -= self._doc_len.pop(doc_id)
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                for gram in trigrams(term):
+                    self._grams[gram].discard(term)
+                    if not self._grams[gram]:
+                        del self._grams[gram]
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    # Querying
+
+    def _expand(self, token):
+        """Vocabulary terms a query token can stand for, with a match weight"""
+        expansions = {}
+        if token in self._postings:
+            expansions[token] = 1.0
+
+        # Only terms sharing a trigram with the token are worth comparing
+        shared = set()
+        for gram in trigrams(token):
+            shared.update(self._grams.get(gram, ()))
+
+        candidates = []
+        for term in shared:
+            if term == token:
+                continue
+            if term.startswith(token):
+                weight = PREFIX_WEIGHT
+            elif len(token) >= 3 and token in term:
+                weight = SUBSTRING_WEIGHT
+            elif len(token) >= 4:
+                max_edits = 1 if len(token) < 7 else 2
+                edits = edit_distance(token, term, max_edits)
+                if edits > max_edits:
+                    continue
+                weight = FUZZY_WEIGHT * (1 - edits / len(token))
+            else:
+                continue
+            candidates.append((weight, term))
+
+        candidates.sort(reverse=True)
+        for weight, term in candidates[:MAX_EXPANSIONS]:
+            expansions[term] = weight
+        return expansions
+
+    def search(self, query, limit=None):
+        """Return doc ids matching every query token, best BM25 score first"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        with self._lock:
+            n_docs = len(self._doc_terms)
+            if not n_docs:
+                return []
+            avg_len = self._total_len / n_docs or 1.0
+
+            scores = None
+            for token in tokens:
+                token_scores = {}
+                for term, weight in self._expand(token).items():
+                    postings = self._postings[term]
+                    idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for doc_id, tf in postings.items():
+                        norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * self._doc_len[doc_id] / avg_len)
+                        score = weight * idf * tf * (BM25_K1 + 1) / norm
+                        if score > token_scores.get(doc_id, 0.0):
+                            token_scores[doc_id] = score
+
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {
+                        doc_id: score + token_scores[doc_id]
+                        for doc_id, score in scores.items()
+                        if doc_id in token_scores
+                    }
+                if not scores:
+                    return []
+
+        ranked = sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))
+        return ranked[:limit] if limit else ranked
+
+    # Keeping in step with the database
+
+    def rebuild(self):
+        from .models import Manga
+
+        # Taken first so writes racing the build are picked up by the next sync
+        state = _database_state()
+        fresh = SearchIndex()
+        queryset = Manga.objects.only(*[f for f in FIELD_WEIGHTS if f != 'genres']).prefetch_related('genres')
+        for manga in queryset.iterator(chunk_size=500):
+            fresh.add(manga.pk, self.document_for(manga))
+
+        with self._lock:
+            self._postings = fresh._postings
+            self._doc_terms = fresh._doc_terms
+            self._doc_len = fresh._doc_len
+            self._total_len = fresh._total_len
+            self._grams = fresh._grams
+            self._built = True
+            self._state = state
+
+    def index_manga(self, manga):
+        if self._built:
+            self.add(manga.pk, self.document_for(manga))
+
+    def remove_manga(self, manga_id):
+        if self._built:
+            self.remove(manga_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._built = False
+
+    def sync(self, force=False):
+        """Build on first use, then pick up writes made by other processes"""
+        interval = getattr(settings, 'SEARCH_INDEX_SYNC_INTERVAL', 5)
+        now = time.monotonic()
+        if self._built and not force and now - self._last_sync < interval:
+            return
+        self._last_sync = now
+
+        with self._lock:
+            if not self._load_snapshot() and not self._built:
+                self.rebuild()
+                return
+            state = _database_state()
+            if self._state and any(state[key] != self._state.get(key) for key in ('genres', 'links', 'last_link')):
+                # A renamed genre changes the terms of every manga in it, and
+                # tagging elsewhere leaves no updated_at to catch up from
+                self.rebuild()
+            elif state != self._state:
+                self._catch_up(state)
+
+    def _catch_up(self, state):
+        from .models import Manga
+
+        changed = Manga.objects.prefetch_related('genres')
+        if self._state and self._state['latest']:
+            changed = changed.filter(updated_at__gte=self._state['latest'])
+        for manga in changed:
+            self.add(manga.pk, self.document_for(manga))
+
+        if len(self._doc_terms) != state['count']:
+            existing = set(Manga.objects.values_list('pk', flat=True))
+            for doc_id in set(self._doc_terms) - existing:
+                self._remove(doc_id)
+        self._state = state
+
+    # Snapshots written by the rebuild_search_index command
+
+    def save_snapshot(self, path):
+        with self._lock:
+            data = {
+                'postings': dict(self._postings),
+                'doc_terms': self._doc_terms,
+                'doc_len': self._doc_len,
+                'state': self._state,
+            }
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'wb') as fh:
+                pickle.dump(data, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+
+    def _load_snapshot(self):
+        path = getattr(settings, 'SEARCH_INDEX_PATH', None)
+        if not path or not os.path.exists(path):
+            return False
+        mtime = os.path.getmtime(path)
+        if mtime == self._snapshot_mtime:
+            return False
+
+        with open(path, 'rb') as fh:
+            data = pickle.load(fh)
+        self._reset()
+        self._postings.update(data['postings'])
+        self._doc_terms = data['doc_terms']
+        self._doc_len = data['doc_len']
+        self._total_len = sum(self._doc_len.values())
+        for term in self._postings:
+            for gram in trigrams(term):
+                self._grams[gram].add(term)
+        self._state = data['state']
+        self._built = True
+        self._snapshot_mtime = mtime
+        return True
+
+
+def _database_state():
+    from .models import Manga
+    return Manga.catalogue_state()
+
+
+search_index = SearchIndex()
+
+
+class IndexedSearchFilter(BaseFilterBackend):
+    """
+    Drop-in replacement for SearchFilter backed by the in-process index.
+    Results come back in relevance order unless ?ordering= is given.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+
+        search_index.sync()
+        limit = getattr(settings, 'SEARCH_MAX_RESULTS', 500)
+        ids = search_index.search(query, limit=limit)
+        queryset = queryset.filter(pk__in=ids)
+        if ids and not request.query_params.get('ordering'):
+            rank = Case(*[When(pk=pk, then=i) for i, pk in enumerate(ids)], output_field=IntegerField())
+            queryset = queryset.order_by(rank)
+        return queryset
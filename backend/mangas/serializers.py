@@ -2,6 +2,16 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import Manga, Chapter, Comment, Genre, Bookmark, ReadingHistory, Rating
 
+# Number of chapters shown on manga cards
+LATEST_CHAPTERS = 2
+
+# Maintained from Chapter/Rating writes and batch jobs, never set through the API
+MANGA_SUMMARY_FIELDS = [
+    'latest_chapter', 'chapter_count', 'last_update_at',
+    'rating', 'rating_sum', 'rating_count', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+    'trending_score', 'comment_count',
+]
+
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
@@ -33,8 +43,8 @@ class ReadingHistorySerializer(serializers.ModelSerializer):
     
     class Meta:
         model = ReadingHistory
-        fields = ['id', 'manga', 'manga_title', 'manga_cover', 'chapter', 'chapter_number', 'last_read_at']
-        read_only_fields = ['user']
+        fields = ['id', 'manga', 'manga_title', 'manga_cover', 'chapter', 'chapter_number', 'page', 'last_read_at']
+        read_only_fields = ['user', 'last_read_at']
 
 class GenreSerializer(serializers.ModelSerializer):
     class Meta:
@@ -46,10 +56,23 @@ class ChapterSerializer(serializers.ModelSerializer):
         model = Chapter
         fields = ['id', 'chapter_number', 'released_at']
 
+class ChapterListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Chapter
+        fields = ['id', 'chapter_number', 'released_at', 'manga']
+
+# Positional rows for long chapter lists (see MangaViewSet.chapters)
+CHAPTER_ROW_FIELDS = ['id', 'chapter_number', 'released_at']
+
+def chapter_rows(chapters):
+    released_at = serializers.DateTimeField()
+    return [[c.id, c.chapter_number, released_at.to_representation(c.released_at)] for c in chapters]
+
 class ChapterDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Chapter
-        fields = ['id', 'chapter_number', 'released_at', 'pages', 'manga']
+        fields = ['id', 'chapter_number', 'released_at', 'pages', 'page_variants', 'manga', 'comment_count']
+        read_only_fields = ['page_variants', 'comment_count']
 
 class CommentSerializer(serializers.ModelSerializer):
     user_username = serializers.ReadOnlyField(source='user.username')
@@ -81,13 +104,17 @@ class MangaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Manga
         fields = '__all__'
+        read_only_fields = MANGA_SUMMARY_FIELDS
 
     def get_chapters(self, obj):
-        chapters = obj.chapters.all()[:2]
+        # Set by a prefetch when serializing many mangas (reads are served by MangaProjection)
+        chapters = getattr(obj, 'latest_chapters', None)
+        if chapters is None:
+            chapters = obj.chapters.only(*Chapter.LIST_FIELDS)[:LATEST_CHAPTERS]
         return ChapterSerializer(chapters, many=True).data
 
 class MangaDetailSerializer(serializers.ModelSerializer):
-    chapters = ChapterSerializer(many=True, read_only=True)
+    chapters = serializers.SerializerMethodField()
     genres = serializers.SlugRelatedField(
         many=True,
         slug_field='name',
@@ -97,3 +124,11 @@ class MangaDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Manga
         fields = '__all__'
+        read_only_fields = MANGA_SUMMARY_FIELDS
+
+    def get_chapters(self, obj):
+        # Set by a prefetch when limited to the first N (reads are served by MangaDetailProjection)
+        chapters = getattr(obj, 'listed_chapters', None)
+        if chapters is None:
+            chapters = obj.chapters.only(*Chapter.LIST_FIELDS)
+        return ChapterSerializer(chapters, many=True).data
@@ -0,0 +1,108 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import Manga, Chapter, Comment, Genre, Rating
+from .search import search_index
+from .facets import facet_index
+from .cache import invalidate
+
+
+@receiver(post_save, sender=Chapter)
+def chapter_saved(sender, instance, **kwargs):
+    manga_ids = {instance.manga_id}
+    previous = getattr(instance, '_loaded_manga_id', None)
+    if previous is not None:
+        manga_ids.add(previous)
+    instance._loaded_manga_id = instance.manga_id
+    Manga.refresh_chapter_summary(manga_ids)
+    invalidate('chapter')
+
+
+@receiver(post_delete, sender=Chapter)
+def chapter_deleted(sender, instance, **kwargs):
+    Manga.refresh_chapter_summary([instance.manga_id])
+    invalidate('chapter')
+
+
+@receiver(post_save, sender=Manga)
+def manga_saved(sender, instance, **kwargs):
+    search_index.index_manga(instance)
+    facet_index.index_manga(instance)
+    invalidate('manga')
+
+
+@receiver(post_delete, sender=Manga)
+def manga_deleted(sender, instance, **kwargs):
+    search_index.remove_manga(instance.pk)
+    facet_index.remove_manga(instance.pk)
+    invalidate('manga')
+
+
+@receiver(m2m_changed, sender=Manga.genres.through)
+def manga_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    invalidate('manga')
+    if reverse:
+        # genre.manga_set.add(...): instance is the Genre
+        mangas = Manga.objects.filter(pk__in=pk_set) if pk_set else Manga.objects.none()
+        if action == 'post_clear':
+            # pk_set is not provided for clear(); fall back to a rebuild
+            search_index.invalidate()
+            facet_index.invalidate()
+        for manga in mangas:
+            search_index.index_manga(manga)
+            facet_index.index_manga(manga)
+    else:
+        search_index.index_manga(instance)
+        facet_index.index_manga(instance)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def genre_changed(sender, created=False, **kwargs):
+    invalidate('genre')
+    if created:
+        return
+    # Renames and deletes touch every manga in the genre; rebuild lazily
+    search_index.invalidate()
+    facet_index.invalidate()
+
+
+@receiver(post_save, sender=Rating)
+def rating_saved(sender, instance, created, **kwargs):
+    score = int(instance.score)
+    previous_score = None if created else getattr(instance, '_loaded_score', None)
+    previous_manga = getattr(instance, '_loaded_manga_id', None)
+    if previous_manga is not None and previous_manga != instance.manga_id:
+        Manga.apply_rating_change(previous_manga, removed=previous_score)
+        previous_score = None
+    Manga.apply_rating_change(instance.manga_id, added=score, removed=previous_score)
+    instance._loaded_score, instance._loaded_manga_id = score, instance.manga_id
+    invalidate('manga')
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, **kwargs):
+    Manga.apply_rating_change(instance.manga_id, removed=getattr(instance, '_loaded_score', int(instance.score)))
+    invalidate('manga')
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    previous = (getattr(instance, '_loaded_manga_id', None), getattr(instance, '_loaded_chapter_id', None))
+    current = (instance.manga_id, instance.chapter_id)
+    if created:
+        Comment.apply_count_change(*current, 1)
+    elif previous != current and previous[0] is not None:
+        Comment.apply_count_change(*previous, -1)
+        Comment.apply_count_change(*current, 1)
+    else:
+        return
+    instance._loaded_manga_id, instance._loaded_chapter_id = current
+    invalidate('manga', 'chapter')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    Comment.apply_count_change(instance.manga_id, instance.chapter_id, -1)
+    invalidate('manga', 'chapter')
@@ -1,11 +1,48 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
+from decimal import Decimal
+from io import BytesIO, StringIO
+from PIL import Image
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APIClient
+from django.utils.datastructures import MultiValueDict
+from rest_framework.test import APIClient, APIRequestFactory
 from rest_framework import status
-from .models import Manga, Chapter
+from rest_framework.renderers import JSONRenderer
+from .models import parse_sort_key, Manga, Chapter, Comment, DailyView, Genre, Rating, Bookmark, ReadingHistory
+from .serializers import MangaSerializer
+from django.contrib import admin
+from .admin import ChapterAdminForm
+from .counters import view_counter
+from .progress import apply_progress, progress_buffer
+from .search import search_index
+from .facets import facet_index
+from .cache import response_cache
+from .projections import (
+    MangaProjection, MangaDetailProjection, ChapterListProjection, ChapterDetailProjection,
+    CommentProjection, BookmarkProjection, ReadingHistoryProjection,
+)
+from . import checks, media, renderers, rollups, trending
+from .renderers import FastJSONRenderer
+from .views import MangaViewSet
 from django.utils import timezone
 
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=None)
 class MangaApiTests(TestCase):
+    def tearDown(self):
+        view_counter.clear()
+
     def setUp(self):
         self.client = APIClient()
         self.manga = Manga.objects.create(
@@ -46,3 +83,1519 @@ class MangaApiTests(TestCase):
         # Check pages
         self.assertEqual(len(response.data['pages']), 2)
         self.assertEqual(response.data['pages'][0], "/media/chapters/1/page1.jpg")
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=None)
+class ViewCounterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manga = Manga.objects.create(title="Counted")
+        self.other = Manga.objects.create(title="Other")
+        view_counter.clear()
+
+    def tearDown(self):
+        view_counter.clear()
+
+    def test_retrieve_does_not_write(self):
+        """Detail GETs only buffer the view"""
+        updated_at = self.manga.updated_at
+        with self.assertNumQueries(4):  # validators, manga, genres, chapters
+            self.client.get(f'/api/mangas/{self.manga.id}/')
+        self.manga.refresh_from_db()
+        self.assertEqual(self.manga.views, 0)
+        self.assertEqual(self.manga.updated_at, updated_at)
+        self.assertFalse(DailyView.objects.exists())
+
+    def test_flush_applies_buffered_views(self):
+        """Flushing folds buffered views into Manga.views and DailyView"""
+        for _ in range(3):
+            self.client.get(f'/api/mangas/{self.manga.id}/')
+        self.client.get(f'/api/mangas/{self.other.id}/')
+
+        self.assertEqual(view_counter.flush(), 4)
+        self.manga.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.manga.views, 3)
+        self.assertEqual(self.other.views, 1)
+        today = timezone.localdate()
+        self.assertEqual(DailyView.objects.get(manga=self.manga, date=today).views, 3)
+
+        # A second flush adds to the existing rows
+        view_counter.incr(self.manga.id, 2)
+        view_counter.flush()
+        self.manga.refresh_from_db()
+        self.assertEqual(self.manga.views, 5)
+        self.assertEqual(DailyView.objects.get(manga=self.manga, date=today).views, 5)
+        self.assertEqual(view_counter.flush(), 0)
+
+    @override_settings(VIEW_COUNT_FLUSH_INTERVAL=0)
+    def test_zero_interval_writes_through(self):
+        self.client.get(f'/api/mangas/{self.manga.id}/')
+        self.assertEqual(view_counter.pending(), {})
+        self.assertEqual(Manga.objects.get(pk=self.manga.pk).views, 1)
+
+
+class MangaListQueryBudgetTests(TestCase):
+    """The list endpoint must cost the same number of queries whatever the page size"""
+    # count + page + genres + latest chapters (the validators come from the cache)
+    QUERY_BUDGET = 4
+
+    def setUp(self):
+        self.client = APIClient()
+        action, romance = Genre.objects.create(name="Action"), Genre.objects.create(name="Romance")
+        for i in range(25):
+            manga = Manga.objects.create(title=f"Manga {i}")
+            manga.genres.set([action, romance] if i % 2 else [action])
+            for n in range(i % 4):
+                Chapter.objects.create(manga=manga, chapter_number=str(n + 1))
+
+    def test_query_budget_independent_of_page_size(self):
+        for limit in (1, 5, 20, 25):
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(self.QUERY_BUDGET):
+                    response = self.client.get(f'/api/mangas/?limit={limit}')
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_prefetched_output_matches_serializer(self):
+        response = self.client.get('/api/mangas/?limit=25')
+        expected = MangaSerializer(Manga.objects.all(), many=True).data
+        self.assertEqual(response.data['results'], expected)
+        self.assertTrue(any(len(m['chapters']) == 2 for m in expected))
+
+
+class ChapterSummaryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manga = Manga.objects.create(title="Summary")
+
+    def test_summary_follows_chapter_writes(self):
+        self.assertEqual(self.manga.chapter_count, 0)
+        first = Chapter.objects.create(manga=self.manga, chapter_number="1")
+        second = Chapter.objects.create(manga=self.manga, chapter_number="2")
+        self.manga.refresh_from_db()
+        self.assertEqual(self.manga.chapter_count, 2)
+        self.assertEqual(self.manga.latest_chapter_id, second.id)
+        self.assertEqual(self.manga.last_update_at, second.released_at)
+
+        second.delete()
+        self.manga.refresh_from_db()
+        self.assertEqual(self.manga.chapter_count, 1)
+        self.assertEqual(self.manga.latest_chapter_id, first.id)
+
+        # Bulk deletes go through the same signals
+        Chapter.objects.filter(manga=self.manga).delete()
+        self.manga.refresh_from_db()
+        self.assertEqual(self.manga.chapter_count, 0)
+        self.assertIsNone(self.manga.latest_chapter_id)
+        self.assertEqual(self.manga.last_update_at, self.manga.created_at)
+
+    def test_moving_chapter_refreshes_both_mangas(self):
+        other = Manga.objects.create(title="Other")
+        chapter = Chapter.objects.create(manga=self.manga, chapter_number="1")
+        chapter = Chapter.objects.get(pk=chapter.pk)
+        chapter.manga = other
+        chapter.save()
+        self.manga.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.manga.chapter_count, 0)
+        self.assertEqual(other.chapter_count, 1)
+
+    def test_ordering_last_update(self):
+        stale = Manga.objects.create(title="Stale")
+        Chapter.objects.create(manga=stale, chapter_number="1")
+        Chapter.objects.create(manga=self.manga, chapter_number="1")
+        response = self.client.get('/api/mangas/?ordering=last_update')
+        titles = [m['title'] for m in response.data['results']]
+        self.assertEqual(titles[:2], ["Summary", "Stale"])
+
+
+@override_settings(SEARCH_INDEX_PATH=None, SEARCH_INDEX_SYNC_INTERVAL=0)
+class SearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        search_index.invalidate()
+        fantasy = Genre.objects.create(name="Fantasy")
+        self.solo = Manga.objects.create(title="Solo Leveling", author="Chugong", description="Hunters and dungeons")
+        self.solo.genres.add(fantasy)
+        self.tower = Manga.objects.create(title="Tower of God", description="A boy climbs the tower, leveling up")
+        self.other = Manga.objects.create(title="Slice of Life", description="Nothing happens")
+
+    def search(self, query):
+        response = self.client.get('/api/mangas/', {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [m['id'] for m in response.data['results']]
+
+    def test_ranked_by_relevance(self):
+        # A title hit outranks a description hit
+        self.assertEqual(self.search("leveling"), [self.solo.id, self.tower.id])
+
+    def test_partial_and_typo_matches(self):
+        self.assertEqual(self.search("solo lev"), [self.solo.id])
+        self.assertEqual(self.search("chugnog")[:1], [self.solo.id])
+        self.assertEqual(self.search("fantasy"), [self.solo.id])
+        self.assertEqual(self.search("zzzz"), [])
+
+    def test_index_follows_writes(self):
+        self.search("tower")  # build the index
+        self.tower.title = "Tower of Dragons"
+        self.tower.save()
+        self.other.delete()
+        self.assertEqual(self.search("dragons"), [self.tower.id])
+        self.assertEqual(self.search("slice"), [])
+
+        # Writes made behind the index's back are caught up by sync()
+        Manga.objects.filter(pk=self.solo.pk).update(title="Solo Ascension", updated_at=timezone.now())
+        self.assertEqual(self.search("ascension"), [self.solo.id])
+
+    def test_genre_renamed_elsewhere_is_picked_up(self):
+        self.search("fantasy")  # build the index
+        # Another process renames the genre; no signal reaches this index
+        Genre.objects.filter(name="Fantasy").update(name="Isekai")
+        response_cache.clear()
+        search_index.sync(force=True)
+        self.assertEqual(self.search("isekai"), [self.solo.id])
+        self.assertEqual(self.search("fantasy"), [])
+
+    def test_genre_tagged_elsewhere_is_picked_up(self):
+        self.search("tower")  # build the index
+        # Another process tags a manga; updated_at does not move
+        Manga.genres.through.objects.create(manga=self.tower, genre=Genre.objects.get(name="Fantasy"))
+        response_cache.clear()
+        search_index.sync(force=True)
+        self.assertEqual(sorted(self.search("fantasy")), sorted([self.solo.id, self.tower.id]))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        # Several mangas share a view count so the id tie breaker matters
+        for i in range(7):
+            Manga.objects.create(title=f"Manga {i}", views=i // 2)
+
+    def walk(self, url):
+        seen, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen += [m['id'] for m in response.data['results']]
+            url, pages = response.data['next'], pages + 1
+        return seen, pages
+
+    def test_cursor_walk_matches_ordering(self):
+        seen, pages = self.walk('/api/mangas/?ordering=-views&limit=3&cursor=')
+        expected = list(Manga.objects.order_by('-views', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 3)
+
+    def test_rows_moving_between_pages_are_not_repeated(self):
+        first = self.client.get('/api/mangas/?ordering=-views&limit=3&cursor=')
+        shown = [m['id'] for m in first.data['results']]
+        # Something from the first page becomes less popular
+        Manga.objects.filter(pk=shown[0]).update(views=-1)
+        rest, _ = self.walk(first.data['next'])
+        self.assertFalse(set(shown) & set(rest[:-1]))
+
+    def test_previous_link(self):
+        first = self.client.get('/api/mangas/?limit=3&cursor=')
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_offset_mode_unchanged_and_bad_cursor(self):
+        response = self.client.get('/api/mangas/?limit=3&offset=3')
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(self.client.get('/api/mangas/?cursor=nonsense').status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get('/api/mangas/?cursor=&ordering=genres__name')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CatalogueOrderingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.a = Manga.objects.create(title="A", type="  manhwa ", status="ONGOING", views=5)
+        self.b = Manga.objects.create(title="B", type="Manhua", status="completed", views=9)
+        self.c = Manga.objects.create(title="C", type="MANHWA", status="Ongoing", views=7)
+
+    def ids(self, query):
+        response = self.client.get(f'/api/mangas/?{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [m['id'] for m in response.data['results']]
+
+    def test_labels_normalized_on_write(self):
+        self.a.refresh_from_db()
+        self.assertEqual((self.a.type, self.a.status), ("Manhwa", "Ongoing"))
+
+        # Labels the site doesn't offer keep their first spelling, acronyms included
+        bl = Manga.objects.create(title="D", type="  BL ")
+        self.assertEqual(Manga.objects.create(title="E", type="bl").type, "BL")
+        bl.type = "Boys  Love"
+        bl.save()
+        self.assertEqual(Manga.objects.get(pk=bl.pk).type, "Boys Love")
+        self.assertEqual(self.ids('type=boys love'), [bl.id])
+
+    def test_filters_are_case_insensitive_for_clients(self):
+        self.assertEqual(self.ids('type=manhwa&ordering=-views'), [self.c.id, self.a.id])
+        self.assertEqual(self.ids('status=COMPLETED'), [self.b.id])
+
+    def test_unsupported_ordering_rejected(self):
+        response = self.client.get('/api/mangas/?ordering=description')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.ids('ordering=title'), [self.a.id, self.b.id, self.c.id])
+
+    def test_declared_orderings_are_indexed(self):
+        indexes = [[f.lstrip('-') for f in index.fields] for index in Manga._meta.indexes]
+
+        def columns(ordering):
+            return [f.lstrip('-') for f in MangaViewSet.ORDERINGS[ordering]]
+
+        for ordering in MangaViewSet.ORDERINGS:
+            with self.subTest(ordering=ordering):
+                self.assertIn(columns(ordering), indexes)
+
+
+@override_settings(FACET_INDEX_SYNC_INTERVAL=0)
+class FacetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        facet_index.invalidate()
+        action, fantasy, horror = (Genre.objects.create(name=n) for n in ("Action", "Fantasy", "Horror"))
+        self.a = Manga.objects.create(title="A", type="Manhwa", status="Ongoing")
+        self.a.genres.set([action, fantasy])
+        self.b = Manga.objects.create(title="B", type="Manga", status="Completed")
+        self.b.genres.set([action, horror])
+        self.c = Manga.objects.create(title="C", type="Manhwa", status="Completed")
+        self.c.genres.set([fantasy])
+
+    def ids(self, query):
+        response = self.client.get(f'/api/mangas/?ordering=title&{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [m['id'] for m in response.data['results']]
+
+    def test_boolean_genre_filters(self):
+        self.assertEqual(self.ids('genre=action'), [self.a.id, self.b.id])
+        self.assertEqual(self.ids('genre=Action,Fantasy'), [self.a.id])
+        self.assertEqual(self.ids('genre=Horror,Fantasy&genre_mode=or'), [self.a.id, self.b.id, self.c.id])
+        self.assertEqual(self.ids('genre=Fantasy&exclude_genre=Action'), [self.c.id])
+        self.assertEqual(self.ids('exclude_genre=Fantasy&type=manga'), [self.b.id])
+        self.assertEqual(self.ids('genre=Horror&or_type=manhwa'), [self.a.id, self.b.id, self.c.id])
+        self.assertEqual(self.ids('genre=Horror&or_type=manhwa&exclude_genre=Action'), [self.c.id])
+
+    def test_large_matches_fall_back_to_sql(self):
+        queries = ['genre=action', 'genre=Action,Fantasy', 'genre=Horror,Fantasy&genre_mode=or',
+                   'genre=Fantasy&exclude_genre=Action', 'exclude_genre=Fantasy&type=manga',
+                   'genre=Horror&or_type=manhwa&exclude_genre=Action']
+        expected = [self.ids(query) for query in queries]
+        response_cache.clear()
+        with override_settings(FACET_FILTER_MAX_IDS=0), CaptureQueriesContext(connection) as captured:
+            self.assertEqual([self.ids(query) for query in queries], expected)
+        sql = ' '.join(q['sql'] for q in captured.captured_queries)
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('"mangas_manga"."id" IN', sql)
+
+    def test_facet_counts(self):
+        response = self.client.get('/api/mangas/facets/?genre=Fantasy')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['facets']['genre'], {"Fantasy": 2, "Action": 1})
+        self.assertEqual(response.data['facets']['type'], {"Manhwa": 2})
+        self.assertEqual(response.data['facets']['status'], {"Completed": 1, "Ongoing": 1})
+
+        # A genre page that also takes in its type counts over the combined set
+        response = self.client.get('/api/mangas/facets/?genre=Horror&or_type=Manhwa')
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['facets']['type'], {"Manhwa": 2, "Manga": 1})
+
+    def test_index_follows_writes(self):
+        self.client.get('/api/mangas/facets/')  # build the index
+        # Writes already applied here don't cost a rebuild on the next sync
+        with mock.patch.object(facet_index, 'rebuild', wraps=facet_index.rebuild) as rebuild:
+            self.c.genres.add(Genre.objects.get(name="Horror"))
+            self.b.delete()
+            self.assertEqual(self.ids('genre=horror'), [self.c.id])
+            self.assertEqual(self.client.get('/api/mangas/facets/?type=Manga').data['count'], 0)
+        rebuild.assert_not_called()
+
+    def test_genre_renamed_elsewhere_is_picked_up(self):
+        self.client.get('/api/mangas/facets/')  # build the index
+        Genre.objects.filter(name="Horror").update(name="Thriller")
+        response_cache.clear()
+        facet_index.sync(force=True)
+        self.assertEqual(self.ids('genre=thriller'), [self.b.id])
+        self.assertEqual(self.ids('genre=horror'), [])
+
+
+class MaintainedColumnTests(TestCase):
+    def test_saves_leave_maintained_columns_alone(self):
+        manga = Manga.objects.create(title="Loaded")
+        # Counter flushes, votes and comments land after the instance was read
+        Manga.objects.filter(pk=manga.pk).update(views=40, rating_sum=9, rating_count=2, rating=Decimal('4.5'), comment_count=3, trending_score=1.5)
+
+        manga.title = "Edited"
+        with CaptureQueriesContext(connection) as captured:
+            manga.save()
+        self.assertNotIn('views', captured.captured_queries[-1]['sql'])
+        manga.refresh_from_db()
+        self.assertEqual(manga.title, "Edited")
+        self.assertEqual((manga.views, manga.rating_count, manga.rating, manga.comment_count, manga.trending_score), (40, 2, Decimal('4.5'), 3, 1.5))
+
+        # Values set on the instance are still saved
+        manga.views = 7
+        manga.save()
+        self.assertEqual(Manga.objects.get(pk=manga.pk).views, 7)
+
+        # A deferred column read later counts as loaded, not as set
+        deferred = Manga.objects.only('title').get(pk=manga.pk)
+        self.assertEqual(deferred.views, 7)
+        Manga.objects.filter(pk=manga.pk).update(views=8)
+        deferred.save()
+        self.assertEqual(Manga.objects.get(pk=manga.pk).views, 8)
+
+
+class RatingAggregationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manga = Manga.objects.create(title="Rated")
+        self.users = [User.objects.create_user(f"user{i}", password="pw") for i in range(3)]
+
+    def rate(self, user, score):
+        self.client.force_authenticate(user)
+        return self.client.post('/api/ratings/', {'manga': self.manga.id, 'score': score})
+
+    def test_running_totals(self):
+        self.rate(self.users[0], 5)
+        self.rate(self.users[1], 4)
+        self.rate(self.users[2], 2)
+        self.manga.refresh_from_db()
+        self.assertEqual((self.manga.rating_sum, self.manga.rating_count), (11, 3))
+        self.assertEqual(self.manga.rating, Decimal('3.7'))
+
+        # Changing a vote moves it between histogram buckets
+        self.rate(self.users[2], 5)
+        self.manga.refresh_from_db()
+        self.assertEqual((self.manga.rating_2, self.manga.rating_5), (0, 2))
+        self.assertEqual(self.manga.rating, Decimal('4.7'))
+
+        Rating.objects.filter(user=self.users[0]).delete()
+        self.manga.refresh_from_db()
+        self.assertEqual((self.manga.rating_sum, self.manga.rating_count), (9, 2))
+        self.assertEqual(self.manga.rating, Decimal('4.5'))
+
+        Rating.objects.all().delete()
+        self.manga.refresh_from_db()
+        self.assertEqual(self.manga.rating, Decimal('0.0'))
+
+    def test_invalid_score_rejected(self):
+        self.assertEqual(self.rate(self.users[0], 9).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rating_is_read_only(self):
+        self.rate(self.users[0], 4)
+        self.client.force_authenticate(User.objects.create_superuser("editor", password="pw"))
+        response = self.client.patch(f'/api/mangas/{self.manga.id}/', {'title': "Renamed", 'rating': '1.0'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.manga.refresh_from_db()
+        self.assertEqual((self.manga.title, self.manga.rating), ("Renamed", Decimal('4.0')))
+        self.assertIn('rating', admin.site._registry[Manga].readonly_fields)
+
+    def test_reconcile(self):
+        self.rate(self.users[0], 3)
+        self.rate(self.users[1], 4)
+        Manga.objects.update(rating_sum=0, rating_count=0, rating_3=7, rating=0)
+        call_command('reconcile_ratings', stdout=StringIO())
+        self.manga.refresh_from_db()
+        self.assertEqual((self.manga.rating_sum, self.manga.rating_count, self.manga.rating_3), (7, 2, 1))
+        self.assertEqual(self.manga.rating, Decimal('3.5'))
+
+
+class AnalyticsRollupTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.today = timezone.localdate()
+        self.hot = Manga.objects.create(title="Hot", views=100)
+        self.old = Manga.objects.create(title="Old", views=500)
+        Chapter.objects.create(manga=self.hot, chapter_number="1")
+        for days_ago, manga, views in [(0, self.hot, 10), (1, self.hot, 5), (40, self.old, 50), (200, self.old, 7)]:
+            DailyView.objects.create(manga=manga, date=self.today - timedelta(days=days_ago), views=views)
+
+    def test_dashboard_never_builds(self):
+        response = self.client.get('/api/analytics/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['total_views'], response.data['built_at'], response.data['stale']), (0, None, True))
+        self.assertEqual(DailyView.objects.count(), 4)
+
+        rollups.build_rollups()
+        DailyView.objects.filter(manga=self.hot, date=self.today).update(views=12)
+        with override_settings(ANALYTICS_ROLLUP_MAX_AGE=0):
+            response = self.client.get('/api/analytics/')
+        # The stale build is served as is
+        self.assertTrue(response.data['stale'])
+        self.assertEqual(response.data['chart_data'][-1]['views'], 10)
+
+    def test_dashboard_reads_rollups(self):
+        rollups.build_rollups()
+        response = self.client.get('/api/analytics/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['stale'])
+        self.assertEqual(response.data['total_views'], 600)
+        self.assertEqual((response.data['total_mangas'], response.data['total_chapters']), (2, 1))
+        self.assertEqual(len(response.data['chart_data']), 7)
+        self.assertEqual(response.data['chart_data'][-1]['views'], 10)
+        self.assertEqual([m['title'] for m in response.data['top_mangas']], ["Hot"])
+
+        # Once built, a dashboard load is three reads and never touches DailyView
+        with self.assertNumQueries(3):
+            self.client.get('/api/analytics/?range=12m')
+
+    def test_ranges(self):
+        rollups.build_rollups()
+        response = self.client.get('/api/analytics/?range=90d')
+        self.assertEqual(len(response.data['chart_data']), 90)
+        self.assertEqual(sum(b['views'] for b in response.data['chart_data']), 65)
+        self.assertEqual(response.data['top_mangas'][0]['title'], "Old")
+
+        response = self.client.get('/api/analytics/?range=12m')
+        self.assertEqual(sum(b['views'] for b in response.data['chart_data']), 72)
+        self.assertEqual(self.client.get('/api/analytics/?range=forever').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_incremental_build_and_compaction(self):
+        call_command('build_rollups', stdout=StringIO())
+        # Raw rows past the retention window are gone, their rollups are not
+        self.assertFalse(DailyView.objects.filter(date__lt=self.today - timedelta(days=90)).exists())
+        DailyView.objects.filter(manga=self.hot, date=self.today).update(views=12)
+        rollups.build_rollups()
+        response = self.client.get('/api/analytics/?range=12m')
+        self.assertEqual(sum(b['views'] for b in response.data['chart_data']), 74)
+
+
+@override_settings(TRENDING_HALF_LIFE_DAYS=3, TRENDING_CHAPTER_WEIGHT=50)
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        today = timezone.localdate()
+        # An all-time hit with no recent activity and a newer title people read this week
+        self.classic = Manga.objects.create(title="Classic", views=10000)
+        self.rising = Manga.objects.create(title="Rising", views=300)
+        DailyView.objects.create(manga=self.classic, date=today - timedelta(days=20), views=1000)
+        DailyView.objects.create(manga=self.rising, date=today, views=80)
+        DailyView.objects.create(manga=self.rising, date=today - timedelta(days=3), views=100)
+
+    def test_scores_decay(self):
+        call_command('update_trending', stdout=StringIO())
+        self.rising.refresh_from_db()
+        self.classic.refresh_from_db()
+        # Three days is one half-life
+        self.assertAlmostEqual(self.rising.trending_score, 80 + 100 * 0.5, places=3)
+        self.assertAlmostEqual(self.classic.trending_score, 1000 * 0.5 ** (20 / 3), places=3)
+
+        response = self.client.get('/api/mangas/?ordering=trending')
+        self.assertEqual([m['title'] for m in response.data['results']], ["Rising", "Classic"])
+
+    def test_half_life_and_chapter_boost(self):
+        Chapter.objects.create(manga=self.classic, chapter_number="99")
+        trending.update_trending_scores(half_life_days=30)
+        self.classic.refresh_from_db()
+        self.assertAlmostEqual(self.classic.trending_score, 1000 * 0.5 ** (20 / 30) + 50, places=1)
+
+
+@override_settings(CHAPTER_UPLOAD_BACKOFF=0, CHAPTER_UPLOAD_RETRIES=1)
+def page_image(name, width=40, height=60):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+class ChapterIngestTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manga = Manga.objects.create(title="Uploads")
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+
+    def upload(self, count, **extra):
+        files = [page_image(f"page{i:02}.jpg", 40 + i) for i in range(count)]
+        data = {'manga': self.manga.id, 'chapter_number': "7", 'files_input': files, **extra}
+        return self.client.post('/api/chapters/', data, format='multipart')
+
+    def test_pages_stored_in_order_with_one_insert(self):
+        # manga lookup, insert and chapter summary refresh (plus the savepoint pair)
+        with self.assertNumQueries(5):
+            response = self.upload(6)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        pages = Chapter.objects.get().pages
+        self.assertEqual([p.rsplit('/', 1)[1] for p in pages], [f"page{i:02}.jpg" for i in range(6)])
+        self.assertEqual(pages, response.data['pages'])
+
+    def test_transient_failures_are_retried(self):
+        real_save = default_storage.save
+        attempts = []
+
+        def flaky(path, content, *args, **kwargs):
+            attempts.append(path)
+            if attempts.count(path) == 1 and path.endswith("page01.jpg"):
+                raise OSError("storage hiccup")
+            return real_save(path, content, *args, **kwargs)
+
+        with mock.patch.object(default_storage, 'save', side_effect=flaky), self.assertLogs('mangas.ingest', 'WARNING'):
+            response = self.upload(3)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(Chapter.objects.get().pages), 3)
+
+    def test_failed_pages_fail_the_chapter_as_a_unit(self):
+        real_save = default_storage.save
+
+        def broken(path, content, *args, **kwargs):
+            if path.endswith("page01.jpg"):
+                raise OSError("storage down")
+            return real_save(path, content, *args, **kwargs)
+
+        with mock.patch.object(default_storage, 'save', side_effect=broken), self.assertLogs('mangas.ingest'):
+            response = self.upload(3)
+            self.assertEqual(response.status_code, 502)
+            self.assertFalse(Chapter.objects.exists())
+            stored = [f for _, _, names in os.walk(os.path.join(self.media.name, 'chapters')) for f in names]
+            self.assertEqual(stored, [])
+
+            response = self.upload(3, allow_partial='true')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['failed_pages'], ["page01.jpg"])
+        self.assertEqual(len(Chapter.objects.get().pages), 2)
+
+    def test_all_pages_failing_creates_nothing_even_when_partial(self):
+        with mock.patch.object(default_storage, 'save', side_effect=OSError("storage down")), self.assertLogs('mangas.ingest'):
+            response = self.upload(2, allow_partial='true')
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(response.data['failed_pages'], ["page00.jpg", "page01.jpg"])
+        self.assertFalse(Chapter.objects.exists())
+
+    def test_admin_form_reports_failed_uploads(self):
+        files = MultiValueDict({'files_input': [page_image("page00.jpg", 40)]})
+        form = ChapterAdminForm({'manga': self.manga.id, 'chapter_number': "7"}, files)
+        with mock.patch.object(default_storage, 'save', side_effect=OSError("storage down")), self.assertLogs('mangas.ingest'):
+            self.assertFalse(form.is_valid())
+        self.assertIn("page00.jpg", form.errors['files_input'][0])
+
+        form = ChapterAdminForm({'manga': self.manga.id, 'chapter_number': "7"}, files)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(len(form.save().pages), 1)
+
+    def test_admin_discards_uploads_of_rejected_submissions(self):
+        admin_user = User.objects.create_superuser(username="admin", password="pw")
+        self.client.force_login(admin_user)
+
+        def submit(title):
+            return self.client.post(reverse('admin:mangas_manga_add'), {
+                'title': title, 'type': "Manga", 'status': "Ongoing", 'author': "A", 'artist': "A",
+                'released_year': 2020, 'views': 0,
+                'chapters-TOTAL_FORMS': 1, 'chapters-INITIAL_FORMS': 0,
+                'chapters-0-chapter_number': "1", 'chapters-0-files_input': [page_image("page00.jpg")],
+            }, format='multipart')
+
+        def stored():
+            return [f for _, _, names in os.walk(os.path.join(self.media.name, 'chapters')) for f in names]
+
+        # The chapter form is valid and uploads its page, but the manga form is not
+        response = submit("")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['errors'])
+        self.assertEqual(stored(), [])
+
+        self.assertEqual(submit("Admin upload").status_code, 302)
+        chapter = Chapter.objects.get(manga__title="Admin upload")
+        self.assertEqual(len(chapter.pages), 1)
+        self.assertEqual(len(stored()), 2)
+
+        # Saved, then rolled back
+        with mock.patch.object(Chapter, 'save', side_effect=RuntimeError("database down")), self.assertRaises(RuntimeError):
+            self.client.post(reverse('admin:mangas_chapter_add'), {
+                'manga': self.manga.id, 'chapter_number': "2", 'files_input': [page_image("page01.jpg")],
+            }, format='multipart')
+        self.assertEqual(len(stored()), 2)
+
+
+@override_settings(CHAPTER_PAGE_WIDTHS=[100, 200])
+class PageVariantTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manga = Manga.objects.create(title="Variants")
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+
+    def test_upload_builds_webp_variants(self):
+        files = [page_image("p1.jpg", 300, 600), page_image("p2.png", 150, 150)]
+        response = self.client.post('/api/chapters/', {'manga': self.manga.id, 'chapter_number': "1", 'files_input': files}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        chapter = Chapter.objects.get()
+        first, second = chapter.page_variants
+        self.assertEqual([first['src'], second['src']], chapter.pages)
+        self.assertEqual([v['width'] for v in first['variants']], [100, 200, 300])
+        self.assertEqual([v['height'] for v in first['variants']], [200, 400, 600])
+        self.assertEqual([v['width'] for v in second['variants']], [100, 150])
+        for variant in first['variants'] + second['variants']:
+            self.assertTrue(variant['url'].endswith('.webp'))
+            with default_storage.open(variant['url'][len('/media/'):]) as f:
+                self.assertEqual(Image.open(f).format, 'WEBP')
+        self.assertEqual(response.data['page_variants'], chapter.page_variants)
+
+    def test_unreadable_page_is_kept_without_variants(self):
+        files = [SimpleUploadedFile("broken.jpg", b"not an image", content_type="image/jpeg")]
+        with self.assertLogs('mangas.images', 'ERROR'):
+            response = self.client.post('/api/chapters/', {'manga': self.manga.id, 'chapter_number': "1", 'files_input': files}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        chapter = Chapter.objects.get()
+        self.assertEqual(len(chapter.pages), 1)
+        self.assertEqual(chapter.page_variants, [{'src': chapter.pages[0], 'variants': []}])
+
+    def test_backfill_command(self):
+        path = default_storage.save('chapters/old/p1.jpg', page_image("p1.jpg", 250, 100))
+        url = default_storage.url(path)
+        done = Chapter.objects.create(manga=self.manga, chapter_number="1", pages=[url], page_variants=[{'src': url, 'variants': [{'url': 'x'}]}])
+        todo = Chapter.objects.create(manga=self.manga, chapter_number="2", pages=[url])
+
+        out = StringIO()
+        call_command('build_page_variants', workers=1, stdout=out)
+        self.assertIn("1 chapters", out.getvalue())
+        todo.refresh_from_db()
+        self.assertEqual([v['width'] for v in todo.page_variants[0]['variants']], [100, 200, 250])
+        done.refresh_from_db()
+        self.assertEqual(done.page_variants[0]['variants'], [{'url': 'x'}])
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        os.makedirs(os.path.join(self.media.name, 'chapters'))
+        self.body = bytes(range(256)) * 4
+        for name in ('page.jpg', 'page.3f9a0c1b2d.w800.webp'):
+            with open(os.path.join(self.media.name, 'chapters', name), 'wb') as f:
+                f.write(self.body)
+
+    def content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_response_with_validators(self):
+        response = self.client.get('/media/chapters/page.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.content(response), self.body)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Content-Length'], str(len(self.body)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        self.assertFalse(response['ETag'].startswith('W/'))
+
+        response = self.client.get('/media/chapters/page.jpg', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_fingerprinted_files_are_immutable(self):
+        response = self.client.get('/media/chapters/page.3f9a0c1b2d.w800.webp')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        # Only the variant naming scheme; replaceable uploads keep the short lifetime
+        for name in ('cover.deadbeef.png', 'page.12345678.jpg', 'page.3f9a0c1b2d.w800.jpg'):
+            self.assertEqual(media.cache_control(f'chapters/{name}'), 'public, max-age=3600')
+        self.assertEqual(media.cache_control('chapters/variants/p.3f9a0c1b2d.w480_AbC1234.webp'), 'public, max-age=31536000, immutable')
+
+    def test_byte_ranges(self):
+        response = self.client.get('/media/chapters/page.jpg', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.body)}')
+        self.assertEqual(self.content(response), self.body[10:20])
+
+        response = self.client.get('/media/chapters/page.jpg', HTTP_RANGE='bytes=-5')
+        self.assertEqual(self.content(response), self.body[-5:])
+
+        response = self.client.get('/media/chapters/page.jpg', HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.body)}')
+
+        # A stale If-Range means the whole, current file
+        response = self.client.get('/media/chapters/page.jpg', HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_and_traversal(self):
+        self.assertEqual(self.client.get('/media/chapters/nope.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/media/chapters').status_code, 404)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+
+    def test_offload_to_proxy(self):
+        with override_settings(MEDIA_OFFLOAD='x-accel'):
+            response = self.client.get('/media/chapters/page.jpg')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/chapters/page.jpg')
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+
+        with override_settings(MEDIA_OFFLOAD='x-sendfile'):
+            response = self.client.get('/media/chapters/page.jpg')
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media.name, 'chapters', 'page.jpg'))
+
+
+# Without the response cache, so every request reaches the validator checks
+NO_RESPONSE_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'api': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=None, CACHES=NO_RESPONSE_CACHE)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manga = Manga.objects.create(title="Cached")
+        self.chapter = Chapter.objects.create(manga=self.manga, chapter_number="1", pages=["/media/a.jpg"])
+        view_counter.clear()
+
+    def tearDown(self):
+        view_counter.clear()
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_manga_detail_answers_304_without_loading_the_manga(self):
+        url = f'/api/mangas/{self.manga.id}/'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(1):
+            response = self.revalidate(url, first)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+        # Revalidated reads still count as views
+        self.assertEqual(view_counter.pending()[(self.manga.id, timezone.localdate())], 2)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_manga_validators_follow_chapters_comments_and_counters(self):
+        url = f'/api/mangas/{self.manga.id}/'
+        for change in (
+            lambda: Chapter.objects.create(manga=self.manga, chapter_number="2"),
+            lambda: Chapter.objects.filter(pk=self.chapter.pk).update(updated_at=timezone.now() + timedelta(seconds=5)),
+            lambda: Comment.objects.create(manga=self.manga, content="Nice"),
+            lambda: Manga.objects.filter(pk=self.manga.pk).update(views=10),
+            lambda: self.manga.save(),
+        ):
+            before = self.client.get(url)
+            change()
+            self.assertEqual(self.revalidate(url, before).status_code, 200)
+
+    def shared_cache(self):
+        """A file cache stands in for Redis: one store every process sees"""
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        self.enterContext(override_settings(CACHES={
+            **NO_RESPONSE_CACHE, 'api': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location.name},
+        }))
+
+    def test_manga_list(self):
+        url = '/api/mangas/?ordering=last_update'
+        # Per-process generations cannot version a list other workers write to
+        self.assertNotIn('ETag', self.client.get(url))
+
+        self.shared_cache()
+        first = self.client.get(url)
+        self.assertEqual(self.revalidate(url, first).status_code, 304)
+        # Other query strings are other representations; counter orderings are never versioned
+        self.assertNotEqual(self.client.get('/api/mangas/?ordering=title')['ETag'], first['ETag'])
+        self.assertNotIn('ETag', self.client.get('/api/mangas/?ordering=-views'))
+
+        # Counter flushes keep the ETag; writes move it
+        Manga.objects.filter(pk=self.manga.pk).update(views=F('views') + 5)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+        Chapter.objects.create(manga=self.manga, chapter_number="2")
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+    def test_chapter_detail_and_list(self):
+        url = f'/api/chapters/{self.chapter.id}/'
+        first = self.client.get(url)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+        self.chapter.pages.append("/media/b.jpg")
+        self.chapter.save()
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+        self.shared_cache()
+        first = self.client.get('/api/chapters/')
+        self.assertEqual(self.revalidate('/api/chapters/', first).status_code, 304)
+        self.chapter.delete()
+        self.assertEqual(self.revalidate('/api/chapters/', first).status_code, 200)
+
+    def test_missing_objects_are_still_404(self):
+        self.assertEqual(self.client.get('/api/mangas/999/').status_code, 404)
+        self.assertEqual(self.client.get('/api/chapters/abc/').status_code, 404)
+
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=None)
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.genre = Genre.objects.create(name="Action")
+        self.manga = Manga.objects.create(title="Cached")
+        self.manga.genres.set([self.genre])
+        self.chapter = Chapter.objects.create(manga=self.manga, chapter_number="1")
+        response_cache.clear()
+        view_counter.clear()
+
+    def tearDown(self):
+        response_cache.clear()
+        view_counter.clear()
+
+    def test_anonymous_reads_are_cached_per_normalized_query(self):
+        response = self.client.get('/api/mangas/?type=Manhwa&ordering=views')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/mangas/?ordering=views&type=Manhwa')
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(self.client.get('/api/mangas/?ordering=-views&type=Manhwa')['X-Cache'], 'MISS')
+        self.assertEqual(response_cache.stats()['hits'], 1)
+
+    def test_writes_invalidate_dependent_scopes(self):
+        urls = ['/api/mangas/', f'/api/mangas/{self.manga.id}/', '/api/genres/', f'/api/chapters/{self.chapter.id}/']
+        for url in urls:
+            self.client.get(url)
+
+        Chapter.objects.create(manga=self.manga, chapter_number="2")
+        self.assertEqual([self.client.get(url)['X-Cache'] for url in urls], ['MISS', 'MISS', 'HIT', 'MISS'])
+
+        Genre.objects.create(name="Drama")
+        self.assertEqual([self.client.get(url)['X-Cache'] for url in urls], ['MISS', 'MISS', 'MISS', 'HIT'])
+
+        self.manga.genres.add(Genre.objects.get(name="Drama"))
+        self.assertEqual([self.client.get(url)['X-Cache'] for url in urls], ['MISS', 'MISS', 'HIT', 'HIT'])
+        self.assertIn("Drama", self.client.get(f'/api/mangas/{self.manga.id}/').json()['genres'])
+
+    def test_cached_detail_still_counts_views(self):
+        url = f'/api/mangas/{self.manga.id}/'
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        self.assertEqual(view_counter.pending()[(self.manga.id, timezone.localdate())], 2)
+
+    def test_authenticated_and_unsuccessful_requests_are_not_cached(self):
+        user = User.objects.create_user(username="reader", password="pw")
+        self.client.force_authenticate(user)
+        self.assertNotIn('X-Cache', self.client.get('/api/mangas/'))
+        self.client.force_authenticate(None)
+        self.client.get('/api/mangas/999/')
+        self.assertEqual(self.client.get('/api/mangas/999/').status_code, 404)
+        self.assertEqual(response_cache.stats()['stores'], 0)
+
+    def test_stats_endpoint_is_admin_only(self):
+        self.client.get('/api/genres/')
+        self.assertEqual(self.client.get('/api/cache-stats/').status_code, 401)
+        admin = User.objects.create_superuser(username="admin", password="pw")
+        self.client.force_authenticate(admin)
+        stats = self.client.get('/api/cache-stats/').data
+        self.assertEqual((stats['misses'], stats['stores'], stats['backend']), (1, 1, 'LocMemCache'))
+
+    def test_process_local_cache_is_flagged_outside_debug(self):
+        self.assertEqual([e.id for e in checks.check_api_cache_is_shared(None)], ['mangas.W001'])
+        with override_settings(DEBUG=True):
+            self.assertEqual(checks.check_api_cache_is_shared(None), [])
+        with tempfile.TemporaryDirectory() as location, override_settings(CACHES={
+            **settings.CACHES, 'api': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+        }):
+            self.assertEqual(checks.check_api_cache_is_shared(None), [])
+
+
+class ChapterReaderTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manga = Manga.objects.create(title="Reader")
+        self.other = Manga.objects.create(title="Other")
+        self.chapters = [
+            Chapter.objects.create(manga=self.manga, chapter_number=str(n), pages=[f"/media/c{n}/{p}.jpg" for p in range(5)])
+            for n in range(1, 4)
+        ]
+        Chapter.objects.create(manga=self.other, chapter_number="9")
+        response_cache.clear()
+
+    def tearDown(self):
+        response_cache.clear()
+
+    def test_neighbours_are_single_queries(self):
+        first, middle, last = self.chapters
+        with self.assertNumQueries(1):
+            self.assertEqual(middle.neighbours().first(), last)
+        with self.assertNumQueries(1):
+            self.assertEqual(middle.neighbours(forward=False).first(), first)
+        self.assertIsNone(last.neighbours().first())
+        self.assertIsNone(first.neighbours(forward=False).first())
+
+        # Same release time: the id breaks the tie
+        Chapter.objects.filter(manga=self.manga).update(released_at=timezone.now())
+        first.refresh_from_db()
+        self.assertEqual(first.neighbours().first(), middle)
+
+    def test_reader_bundle(self):
+        first, middle, last = self.chapters
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/chapters/reader/?manga={self.manga.id}&number=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['chapter']['id'], middle.id)
+        self.assertEqual(response.data['prev'], {'id': first.id, 'chapter_number': "1", 'released_at': response.data['prev']['released_at']})
+        self.assertEqual(response.data['next']['id'], last.id)
+        self.assertEqual(response.data['next']['pages'], last.pages)
+
+        links = response['Link'].split(', ')
+        self.assertEqual(len(links), 3)
+        self.assertEqual(links[0], '<http://testserver/media/c2/0.jpg>; rel=preload; as=image')
+
+        response = self.client.get(f'/api/chapters/reader/?id={last.id}')
+        self.assertEqual((response.data['prev']['id'], response.data['next']), (middle.id, None))
+
+    def test_preload_offers_variants(self):
+        chapter = self.chapters[0]
+        chapter.page_variants = [{'src': chapter.pages[0], 'variants': [{'url': '/media/v/0.w480.webp', 'width': 480}]}]
+        chapter.save()
+        response = self.client.get(f'/api/chapters/reader/?id={chapter.id}')
+        self.assertIn('imagesrcset="http://testserver/media/v/0.w480.webp 480w"', response['Link'].split(', <')[0])
+
+    def test_lookup_errors(self):
+        self.assertEqual(self.client.get('/api/chapters/reader/').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/chapters/reader/?manga={self.manga.id}&number=42').status_code, 404)
+        self.assertEqual(self.client.get('/api/chapters/reader/?id=abc').status_code, 404)
+
+
+class ChapterSortKeyTests(TestCase):
+    def setUp(self):
+        self.manga = Manga.objects.create(title="Numbered")
+
+    def test_parse_sort_key(self):
+        cases = {
+            "9": "9", "10": "10", "10.5": "10.5", "10,5": "10.5", "Chapter 12": "12",
+            "Ch.7": "7", "Vol. 2 Ch. 15": "15", "Episode 3": "3", "Prologue": "0", "": "0",
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(parse_sort_key(text), Decimal(expected))
+
+    def test_chapters_are_ordered_and_navigated_by_number(self):
+        # Uploaded out of order, with a re-upload of an old chapter last
+        numbers = ["10", "9", "10.5", "Chapter 11", "2"]
+        chapters = {n: Chapter.objects.create(manga=self.manga, chapter_number=n) for n in numbers}
+        self.assertEqual(
+            [c.chapter_number for c in self.manga.chapters.all()],
+            ["Chapter 11", "10.5", "10", "9", "2"],
+        )
+        self.assertEqual(chapters["10"].neighbours().first(), chapters["10.5"])
+        self.assertEqual(chapters["10"].neighbours(forward=False).first(), chapters["9"])
+
+        self.manga.refresh_from_db()
+        self.assertEqual(self.manga.latest_chapter, chapters["Chapter 11"])
+        self.assertEqual(self.manga.last_update_at, chapters["2"].released_at)
+
+    def test_sort_key_follows_renames(self):
+        chapter = Chapter.objects.create(manga=self.manga, chapter_number="1")
+        chapter.chapter_number = "4.5"
+        chapter.save(update_fields=['chapter_number'])
+        chapter.refresh_from_db()
+        self.assertEqual(chapter.sort_key, Decimal("4.5"))
+
+
+class ChapterListTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manga = Manga.objects.create(title="Long runner")
+        for n in range(1, 8):
+            Chapter.objects.create(manga=self.manga, chapter_number=str(n), pages=[f"/media/{n}/{p}.jpg" for p in range(40)])
+        response_cache.clear()
+
+    def tearDown(self):
+        response_cache.clear()
+
+    def walk(self, url):
+        numbers = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['fields'], ['id', 'chapter_number', 'released_at'])
+            numbers += [row[1] for row in response.data['results']]
+            url = response.data['next']
+        return numbers
+
+    def test_cursor_paginated_compact_rows(self):
+        self.assertEqual(self.walk(f'/api/mangas/{self.manga.id}/chapters/?limit=3'), ["7", "6", "5", "4", "3", "2", "1"])
+        self.assertEqual(self.walk(f'/api/mangas/{self.manga.id}/chapters/?limit=3&order=asc'), ["1", "2", "3", "4", "5", "6", "7"])
+        self.assertEqual(self.client.get('/api/mangas/999/chapters/').status_code, 404)
+
+    def test_pages_are_never_loaded_for_lists(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f'/api/mangas/{self.manga.id}/chapters/')
+            self.client.get(f'/api/mangas/{self.manga.id}/')
+            self.client.get('/api/mangas/')
+            self.client.get('/api/chapters/')
+        chapter_reads = [q['sql'] for q in queries.captured_queries if 'FROM "mangas_chapter"' in q['sql'] and q['sql'].startswith('SELECT "mangas_chapter"')]
+        self.assertTrue(chapter_reads)
+        for sql in chapter_reads:
+            self.assertNotIn('"pages"', sql)
+
+    def test_detail_can_inline_only_the_first_chapters(self):
+        response = self.client.get(f'/api/mangas/{self.manga.id}/?chapters=2')
+        self.assertEqual([c['chapter_number'] for c in response.data['chapters']], ["7", "6"])
+        self.assertEqual(response.data['chapter_count'], 7)
+        self.assertEqual(len(self.client.get(f'/api/mangas/{self.manga.id}/').data['chapters']), 7)
+        self.assertEqual(self.client.get(f'/api/mangas/{self.manga.id}/?chapters=-1').status_code, 400)
+
+
+class RendererTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manga = Manga.objects.create(title="Rendered", description="Ünïcode — ok")
+        self.manga.genres.set([Genre.objects.create(name="Action")])
+        Chapter.objects.create(manga=self.manga, chapter_number="1")
+        response_cache.clear()
+
+    def tearDown(self):
+        response_cache.clear()
+
+    def test_fast_json_matches_drf_json(self):
+        payload = {'results': MangaSerializer(Manga.objects.all(), many=True).data, 'next': None}
+        self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+
+    def test_native_types(self):
+        body = FastJSONRenderer().render({
+            'price': Decimal('1.5'), 'at': datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc),
+            1: 'int key', 'ids': Manga.objects.values_list('id', flat=True),
+        })
+        self.assertEqual(json.loads(body), {'price': 1.5, 'at': '2024-01-02T03:04:05Z', '1': 'int key', 'ids': [self.manga.id]})
+
+    def test_api_uses_fast_renderer_and_parser(self):
+        response = self.client.get('/api/genres/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()['results'][0]['name'], "Action")
+
+        response = self.client.post('/api/register/', b'{"username": "a", "password"', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.json()['detail'])
+
+    @skipUnless(renderers.msgpack, "msgpack is not installed")
+    def test_msgpack_by_accept_header(self):
+        response = self.client.get(f'/api/mangas/{self.manga.id}/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        data = renderers.msgpack.unpackb(response.content)
+        self.assertEqual(data['title'], "Rendered")
+        self.assertEqual(data, self.client.get(f'/api/mangas/{self.manga.id}/').json())
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('bench_renderers', count=5, repeat=2, stdout=out)
+        self.assertIn('json (stdlib)', out.getvalue())
+        self.assertIn('json (orjson)', out.getvalue())
+
+
+class ProjectionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader", password="password")
+        # Created out of alphabetical order
+        romance, action = Genre.objects.create(name="Romance"), Genre.objects.create(name="Action")
+        self.manga = Manga.objects.create(title="Projected", rating=Decimal('4.5'), cover_image_file="covers/p.png")
+        self.manga.genres.set([romance, action])
+        self.other = Manga.objects.create(title="Bare")
+        self.chapters = [Chapter.objects.create(manga=self.manga, chapter_number=n, pages=["/p/1.png"]) for n in ("1", "10.5", "2")]
+        Comment.objects.create(manga=self.manga, chapter=self.chapters[0], user=self.user, name="reader", content="Nice")
+        Comment.objects.create(manga=self.manga, content="Guest says hi")
+        Bookmark.objects.create(user=self.user, manga=self.manga)
+        ReadingHistory.objects.create(user=self.user, manga=self.manga, chapter=self.chapters[1])
+        self.request = APIRequestFactory().get('/api/')
+        response_cache.clear()
+
+    def tearDown(self):
+        response_cache.clear()
+        view_counter.clear()
+
+    def assertProjects(self, projection_class, queryset, **context):
+        """The projection renders exactly what its serializer renders for the same rows"""
+        context = {'request': self.request, **context}
+        projection = projection_class(context)
+        expected = projection_class.serializer_class(queryset, many=True, context=context).data
+        self.assertEqual(JSONRenderer().render(projection.many(projection.values(queryset))), JSONRenderer().render(expected))
+
+    def test_projections_match_serializers(self):
+        cases = [
+            (MangaProjection, Manga.objects.all()),
+            (MangaDetailProjection, Manga.objects.all()),
+            (ChapterListProjection, Chapter.objects.all()),
+            (ChapterDetailProjection, Chapter.objects.all()),
+            (CommentProjection, Comment.objects.all()),
+            (BookmarkProjection, Bookmark.objects.all()),
+            (ReadingHistoryProjection, ReadingHistory.objects.all()),
+        ]
+        for projection_class, queryset in cases:
+            with self.subTest(projection_class.__name__):
+                self.assertProjects(projection_class, queryset)
+
+    def test_guest_comment_has_no_username(self):
+        row = next(c for c in CommentProjection().many(CommentProjection().values(Comment.objects.all())) if c['user'] is None)
+        self.assertNotIn('user_username', row)
+
+    def test_api_reads(self):
+        context = {'request': self.request}
+        response = self.client.get('/api/mangas/?ordering=title')
+        self.assertEqual(
+            response.json()['results'],
+            json.loads(JSONRenderer().render(MangaSerializer(Manga.objects.order_by('title', 'id'), many=True, context=context).data)),
+        )
+        card = response.json()['results'][1]
+        self.assertEqual(card['genres'], ["Romance", "Action"])
+        self.assertEqual([c['chapter_number'] for c in card['chapters']], ["10.5", "2"])
+        self.assertEqual(card['cover_image_file'], 'http://testserver/media/covers/p.png')
+
+        response = self.client.get(f'/api/mangas/{self.manga.id}/?chapters=1')
+        self.assertEqual([c['chapter_number'] for c in response.json()['chapters']], ["10.5"])
+        self.assertEqual(response.json()['rating'], '4.5')
+        self.assertEqual(self.client.get('/api/mangas/999999/').status_code, 404)
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/history/?cursor=')
+        self.assertEqual(response.json()['results'][0]['chapter_number'], "10.5")
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('bench_projections', limit=5, repeat=1, stdout=out)
+        self.assertIn('manga list', out.getvalue())
+        self.assertIn('history', out.getvalue())
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manga = Manga.objects.create(title="Sparse", description="Long synopsis " * 50)
+        self.manga.genres.set([Genre.objects.create(name="Action")])
+        self.chapter = Chapter.objects.create(manga=self.manga, chapter_number="1", pages=["/p/1.png"])
+        Comment.objects.create(manga=self.manga, content="Hi")
+        response_cache.clear()
+
+    def tearDown(self):
+        response_cache.clear()
+        view_counter.clear()
+
+    def test_fields_narrow_payload_and_sql(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/mangas/?fields=id,title,chapters')
+        self.assertEqual(response.status_code, 200)
+        card = response.json()['results'][0]
+        self.assertEqual(set(card), {'id', 'title', 'chapters'})
+        self.assertEqual(card['chapters'][0]['chapter_number'], "1")
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('"description"', sql)
+        # Genres were not asked for, so they are not looked up
+        self.assertNotIn('mangas_manga_genres', sql)
+
+    def test_omit(self):
+        response = self.client.get(f'/api/mangas/{self.manga.id}/?omit=description,chapters,genres')
+        data = response.json()
+        self.assertEqual(data['title'], "Sparse")
+        self.assertNotIn('description', data)
+        self.assertNotIn('chapters', data)
+
+        data = self.client.get('/api/mangas/?fields=title,description&omit=description').json()['results'][0]
+        self.assertEqual(data, {'title': "Sparse"})
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/api/mangas/?fields=title,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['fields'])
+        self.assertEqual(self.client.get('/api/comments/?omit=nope').status_code, 400)
+
+    def test_chapter_and_comment_fields(self):
+        data = self.client.get(f'/api/chapters/{self.chapter.id}/?fields=id,chapter_number').json()
+        self.assertEqual(data, {'id': self.chapter.id, 'chapter_number': "1"})
+        data = self.client.get('/api/comments/?fields=content').json()['results']
+        self.assertEqual(data, [{'content': "Hi"}])
+
+    def test_cursor_pagination_keeps_working(self):
+        Manga.objects.create(title="Second")
+        first = self.client.get('/api/mangas/?fields=title&ordering=title&limit=1&cursor=').json()
+        self.assertEqual(first['results'], [{'title': "Second"}])
+        self.assertEqual(self.client.get(first['next']).json()['results'], [{'title': "Sparse"}])
+
+
+class MangaBatchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="batcher", password="password")
+        self.mangas = [Manga.objects.create(title=f"Batch {i}") for i in range(3)]
+        self.chapter = Chapter.objects.create(manga=self.mangas[1], chapter_number="4")
+        self.bookmark = Bookmark.objects.create(user=self.user, manga=self.mangas[0])
+        Rating.objects.create(user=self.user, manga=self.mangas[1], score=4)
+        ReadingHistory.objects.create(user=self.user, manga=self.mangas[1], chapter=self.chapter)
+        # Someone else's state never leaks in
+        other = User.objects.create_user(username="other", password="password")
+        Bookmark.objects.create(user=other, manga=self.mangas[1])
+
+    def ids(self, *mangas):
+        return ','.join(str(m.id) for m in mangas)
+
+    def test_anonymous_records_in_request_order(self):
+        first, second, third = self.mangas
+        response = self.client.get(f'/api/mangas/batch/?ids={self.ids(third, first)},999999')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([m['title'] for m in data['results']], ["Batch 2", "Batch 0"])
+        self.assertEqual(data['missing'], [999999])
+        self.assertNotIn('user', data['results'][0])
+        self.assertNotIn('description', data['results'][0])
+
+    def test_user_state(self):
+        self.client.force_authenticate(self.user)
+        first, second, third = self.mangas
+        results = self.client.get(f'/api/mangas/batch/?ids={self.ids(first, second, third)}').json()['results']
+        self.assertEqual(results[0]['user'], {'bookmark': self.bookmark.id, 'rating': None, 'last_read': None})
+        self.assertEqual(results[1]['user']['bookmark'], None)
+        self.assertEqual(results[1]['user']['rating'], 4)
+        self.assertEqual(results[1]['user']['last_read']['chapter'], self.chapter.id)
+        self.assertEqual(results[1]['user']['last_read']['chapter_number'], "4")
+        self.assertEqual(results[2]['user'], {'bookmark': None, 'rating': None, 'last_read': None})
+
+    def test_query_count_does_not_grow_with_ids(self):
+        self.client.force_authenticate(self.user)
+        extra = [Manga.objects.create(title=f"More {i}") for i in range(20)]
+        counts = []
+        for mangas in (self.mangas[:1], self.mangas + extra):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(f'/api/mangas/batch/?ids={self.ids(*mangas)}&fields=id,title,genres,chapters')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_invalid_ids(self):
+        self.assertEqual(self.client.get('/api/mangas/batch/').status_code, 400)
+        self.assertEqual(self.client.get('/api/mangas/batch/?ids=1,abc').status_code, 400)
+        with override_settings(MANGA_BATCH_MAX_IDS=2):
+            self.assertEqual(self.client.get('/api/mangas/batch/?ids=1,2,3').status_code, 400)
+        self.assertEqual(self.client.get('/api/mangas/batch/?ids=1&fields=nope').status_code, 400)
+
+
+@override_settings(READING_PROGRESS_FLUSH_INTERVAL=None)
+class ReadingProgressTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="progress", password="password")
+        self.client.force_authenticate(self.user)
+        self.manga = Manga.objects.create(title="Progress")
+        self.other = Manga.objects.create(title="Elsewhere")
+        self.ch1 = Chapter.objects.create(manga=self.manga, chapter_number="1")
+        self.ch2 = Chapter.objects.create(manga=self.manga, chapter_number="2")
+        self.elsewhere = Chapter.objects.create(manga=self.other, chapter_number="1")
+
+    def tearDown(self):
+        progress_buffer.clear()
+
+    def test_updates_coalesce_into_one_write(self):
+        for page in range(10):
+            response = self.client.post('/api/history/update_history/', {'manga': self.manga.id, 'chapter': self.ch1.id, 'page': page})
+            self.assertEqual(response.status_code, 202)
+        self.assertFalse(ReadingHistory.objects.exists())
+        self.assertEqual(len(progress_buffer.pending()), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(progress_buffer.flush(), 1)
+        history = ReadingHistory.objects.get()
+        self.assertEqual((history.chapter_id, history.page), (self.ch1.id, 9))
+        # Chapter check, select for update, insert and the re-check, inside one transaction
+        self.assertLessEqual(len([q for q in queries.captured_queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]), 4)
+
+    def test_created_rows_respect_rows_inserted_meanwhile(self):
+        now = timezone.now()
+        real_bulk_create = ReadingHistory.objects.bulk_create
+
+        def racing_bulk_create(objs, **kwargs):
+            # Another worker inserts a newer row for the first manga first
+            ReadingHistory.objects.create(user=self.user, manga=self.manga, chapter=self.ch2, page=5, last_read_at=now)
+            return real_bulk_create(objs, **kwargs)
+
+        entries = {
+            (self.user.id, self.manga.id): (now - timedelta(minutes=1), self.ch1.id, 1),
+            (self.user.id, self.other.id): (now, self.elsewhere.id, 3),
+        }
+        with mock.patch.object(ReadingHistory.objects, 'bulk_create', side_effect=racing_bulk_create):
+            apply_progress(entries)
+        stored = {row.manga_id: (row.chapter_id, row.page) for row in ReadingHistory.objects.all()}
+        self.assertEqual(stored, {self.manga.id: (self.ch2.id, 5), self.other.id: (self.elsewhere.id, 3)})
+
+        # An older row inserted meanwhile is moved forward
+        ReadingHistory.objects.all().delete()
+        entries = {(self.user.id, self.manga.id): (now + timedelta(seconds=1), self.ch1.id, 2)}
+        with mock.patch.object(ReadingHistory.objects, 'bulk_create', side_effect=racing_bulk_create):
+            apply_progress(entries)
+        self.assertEqual(ReadingHistory.objects.values_list('chapter', 'page').get(), (self.ch1.id, 2))
+
+    @override_settings(READING_PROGRESS_FLUSH_INTERVAL=0)
+    def test_zero_interval_writes_through(self):
+        self.client.post('/api/history/update_history/', {'manga': self.manga.id, 'chapter': self.ch2.id, 'page': 3})
+        self.assertEqual(progress_buffer.pending(), {})
+        self.assertEqual(ReadingHistory.objects.get().page, 3)
+
+    def test_sync_last_write_wins(self):
+        now = timezone.now()
+        events = [
+            {'chapter': self.ch2.id, 'page': 4, 'read_at': (now - timedelta(minutes=1)).isoformat()},
+            {'chapter': self.ch1.id, 'page': 7, 'read_at': (now - timedelta(minutes=5)).isoformat()},
+            {'chapter': self.elsewhere.id, 'manga': self.other.id, 'page': 2, 'read_at': int(now.timestamp() * 1000)},
+            {'chapter': self.elsewhere.id, 'manga': self.manga.id},
+            {'chapter': 999999},
+            {'page': 1},
+        ]
+        response = self.client.post('/api/history/sync/', {'events': events}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['accepted'], 3)
+        self.assertEqual([item['index'] for item in response.data['rejected']], [3, 4, 5])
+
+        results = self.client.get('/api/history/').json()['results']
+        progress = {row['manga']: (row['chapter'], row['page']) for row in results}
+        self.assertEqual(progress, {self.manga.id: (self.ch2.id, 4), self.other.id: (self.elsewhere.id, 2)})
+
+        # An event older than the stored progress (another device, say) is ignored
+        old = {'chapter': self.ch1.id, 'page': 1, 'read_at': (now - timedelta(hours=1)).isoformat()}
+        self.client.post('/api/history/sync/', {'events': [old]}, format='json')
+        progress_buffer.flush()
+        self.assertEqual(ReadingHistory.objects.get(manga=self.manga).chapter_id, self.ch2.id)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.post('/api/history/sync/', {'events': 'nope'}, format='json').status_code, 400)
+        with override_settings(READING_PROGRESS_SYNC_MAX_EVENTS=1):
+            events = [{'chapter': self.ch1.id}] * 2
+            self.assertEqual(self.client.post('/api/history/sync/', {'events': events}, format='json').status_code, 400)
+        response = self.client.post('/api/history/update_history/', {'manga': self.other.id, 'chapter': self.ch1.id})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/history/update_history/', {'manga': self.manga.id, 'chapter': self.ch1.id, 'page': -1})
+        self.assertEqual(response.status_code, 400)
+
+    def test_deleted_chapter_is_dropped(self):
+        progress_buffer.record(self.user.id, self.manga.id, self.ch1.id, 3)
+        self.ch1.delete()
+        progress_buffer.flush()
+        self.assertFalse(ReadingHistory.objects.exists())
+        self.assertEqual(progress_buffer.pending(), {})
+
+
+class BookmarkUpdatesTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="follower", password="password")
+        self.client.force_authenticate(self.user)
+        self.read = Manga.objects.create(title="Caught up")
+        self.behind = Manga.objects.create(title="Behind")
+        self.unopened = Manga.objects.create(title="Unopened")
+        chapters = {m: [Chapter.objects.create(manga=m, chapter_number=str(n)) for n in (1, 2, 3)] for m in (self.read, self.behind)}
+        for manga in (self.read, self.behind, self.unopened):
+            Bookmark.objects.create(user=self.user, manga=manga)
+        ReadingHistory.objects.create(user=self.user, manga=self.read, chapter=chapters[self.read][2])
+        ReadingHistory.objects.create(user=self.user, manga=self.behind, chapter=chapters[self.behind][0], page=5)
+        # Another reader's progress must not count
+        other = User.objects.create_user(username="other", password="password")
+        ReadingHistory.objects.create(user=other, manga=self.behind, chapter=chapters[self.behind][2])
+
+    def test_updates_feed(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/bookmarks/updates/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        results = response.json()['results']
+        self.assertEqual([row['manga_title'] for row in results], ["Behind"])
+        self.assertEqual(results[0]['unread_count'], 2)
+        self.assertEqual(results[0]['last_read'], {'chapter': results[0]['last_read']['chapter'], 'chapter_number': "1", 'page': 5})
+        self.assertEqual(results[0]['latest_chapter']['chapter_number'], "3")
+
+        # A chapter released after bookmarking shows up for a title never opened
+        Chapter.objects.create(manga=self.unopened, chapter_number="1")
+        results = self.client.get('/api/bookmarks/updates/').json()['results']
+        self.assertEqual({row['manga_title']: row['unread_count'] for row in results}, {"Behind": 2, "Unopened": 1})
+
+    def test_lists_do_not_query_per_row(self):
+        for i in range(10):
+            manga = Manga.objects.create(title=f"Extra {i}")
+            Bookmark.objects.create(user=self.user, manga=manga)
+            ReadingHistory.objects.create(user=self.user, manga=manga, chapter=Chapter.objects.create(manga=manga, chapter_number="1"))
+        for url in ('/api/bookmarks/', '/api/history/'):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            # Count and page
+            self.assertEqual(len(queries), 2, url)
+
+
+class CommentThreadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.manga = Manga.objects.create(title="Talked about")
+        self.chapter = Chapter.objects.create(manga=self.manga, chapter_number="1")
+        self.other_chapter = Chapter.objects.create(manga=self.manga, chapter_number="2")
+        response_cache.clear()
+
+    def tearDown(self):
+        response_cache.clear()
+        view_counter.clear()
+
+    def counts(self):
+        return (
+            Manga.objects.get(pk=self.manga.pk).comment_count,
+            Chapter.objects.get(pk=self.chapter.pk).comment_count,
+            Chapter.objects.get(pk=self.other_chapter.pk).comment_count,
+        )
+
+    def test_counters_follow_creates_moves_and_deletes(self):
+        self.client.post('/api/comments/', {'manga': self.manga.id, 'chapter': self.chapter.id, 'content': "First"})
+        comment = Comment.objects.create(manga=self.manga, content="On the manga")
+        self.assertEqual(self.counts(), (2, 1, 0))
+
+        moved = Comment.objects.get(chapter=self.chapter)
+        moved.chapter = self.other_chapter
+        moved.save()
+        self.assertEqual(self.counts(), (2, 0, 1))
+        moved.save()
+        self.assertEqual(self.counts(), (2, 0, 1))
+
+        comment.delete()
+        self.assertEqual(self.counts(), (1, 0, 1))
+        self.assertEqual(self.client.get(f'/api/mangas/{self.manga.id}/').json()['comment_count'], 1)
+        self.assertEqual(self.client.get(f'/api/chapters/{self.other_chapter.id}/').json()['comment_count'], 1)
+
+    def test_admin_cannot_overwrite_counts(self):
+        Comment.objects.create(manga=self.manga, chapter=self.chapter, content="Kept")
+        form = ChapterAdminForm({'manga': self.manga.id, 'chapter_number': "1", 'comment_count': 0}, instance=Chapter.objects.get(pk=self.chapter.pk))
+        self.assertNotIn('comment_count', form.fields)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(self.counts(), (1, 1, 0))
+        self.assertIn('comment_count', admin.site._registry[Manga].readonly_fields)
+
+    def test_cursor_pages_with_authors_in_bulk(self):
+        for i in range(7):
+            user = User.objects.create_user(username=f"author{i}", password="password")
+            Comment.objects.create(manga=self.manga, chapter=self.chapter, user=user, name=user.username, content=f"#{i}")
+        Comment.objects.create(manga=self.manga, content="guest")
+
+        seen, url, page_queries = [], f'/api/comments/?manga={self.manga.id}&limit=3', []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get(url).json()
+            page_queries.append(len(queries))
+            self.assertNotIn('count', data)
+            seen += [comment['content'] for comment in data['results']]
+            url = data['next']
+        self.assertEqual(seen, ["guest"] + [f"#{i}" for i in reversed(range(7))])
+        # The manga filter lookup and the page itself, however many authors
+        self.assertEqual(set(page_queries), {2})
+
+        data = self.client.get(f'/api/comments/?chapter={self.chapter.id}&limit=2').json()
+        self.assertEqual([c['user_username'] for c in data['results']], ["author6", "author5"])
+
+    def test_cursor_keeps_microseconds(self):
+        # Four comments inside one millisecond, split across pages
+        instant = timezone.now().replace(microsecond=123000)
+        for i in range(4):
+            comment = Comment.objects.create(manga=self.manga, content=f"#{i}")
+            Comment.objects.filter(pk=comment.pk).update(created_at=instant + timedelta(microseconds=100 * i))
+
+        seen, url = [], f'/api/comments/?manga={self.manga.id}&limit=2'
+        while url:
+            data = self.client.get(url).json()
+            seen += [comment['content'] for comment in data['results']]
+            url = data['next']
+        self.assertEqual(seen, ["#3", "#2", "#1", "#0"])
@@ -0,0 +1,61 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Manga, Chapter, DailyView
+from .cache import invalidate
+
+# Views and releases older than this many half-lives contribute < 0.4% and are skipped
+WINDOW_HALF_LIVES = 8
+
+
+def decay(age_days, half_life_days):
+    return 0.5 ** (max(age_days, 0) / half_life_days)
+
+
+def compute_trending_scores(now=None, half_life_days=None):
+    """
+    Exponentially time-decayed popularity per manga:
+
+        sum(views_on_day * 0.5 ** (age_days / half_life))
+        + chapter_weight * sum(0.5 ** (chapter_age_days / half_life))
+
+    Reads the DailyView and Chapter rows inside the decay window in two queries.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    half_life = half_life_days or getattr(settings, 'TRENDING_HALF_LIFE_DAYS', 3)
+    chapter_weight = getattr(settings, 'TRENDING_CHAPTER_WEIGHT', 50)
+    window = timedelta(days=half_life * WINDOW_HALF_LIVES)
+
+    scores = defaultdict(float)
+    # One pow() per distinct day, not per row
+    weights = {}
+    for manga_id, date, views in DailyView.objects.filter(date__gte=today - window).values_list('manga_id', 'date', 'views'):
+        age = (today - date).days
+        if age not in weights:
+            weights[age] = decay(age, half_life)
+        scores[manga_id] += views * weights[age]
+
+    for manga_id, released_at in Chapter.objects.filter(released_at__gte=now - window).values_list('manga_id', 'released_at'):
+        age = (now - released_at).total_seconds() / 86400
+        scores[manga_id] += chapter_weight * decay(age, half_life)
+
+    return scores
+
+
+def update_trending_scores(now=None, half_life_days=None):
+    """Recompute and store every trending_score in one batch; returns the number of trending mangas"""
+    scores = compute_trending_scores(now, half_life_days)
+    mangas = [Manga(pk=manga_id, trending_score=round(score, 4)) for manga_id, score in scores.items()]
+    with transaction.atomic():
+        Manga.objects.exclude(trending_score=0).update(trending_score=0)
+        # Mangas deleted since the scores were read are simply not matched
+        Manga.objects.bulk_update(mangas, ['trending_score'], batch_size=500)
+    # bulk_update sends no signals. From cron this only reaches the web
+    # workers through a shared 'api' cache (REDIS_URL, see checks.py).
+    invalidate('manga')
+    return len(mangas)
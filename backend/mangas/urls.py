@@ -18,4 +18,5 @@ urlpatterns = [
     path('', include(router.urls)),
     path('register/', views.RegisterView.as_view(), name='register'),
     path('profile/', views.UserProfileView.as_view(), name='profile'),
+    path('cache-stats/', views.CacheStatsView.as_view(), name='cache-stats'),
 ]
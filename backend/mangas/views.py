@@ -1,22 +1,42 @@
-from rest_framework import viewsets, filters, generics, permissions
+from rest_framework import viewsets, filters, generics, permissions, serializers
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.decorators import action
-from django.db.models import Sum, Count
+from rest_framework.exceptions import NotFound, ValidationError
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Sum, Count, F, FilteredRelation, OuterRef, Q, Subquery
+from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth.models import User
-from datetime import timedelta
-from .models import Manga, Chapter, Comment, Genre, DailyView, Bookmark, ReadingHistory, Rating
-from .serializers import MangaSerializer, MangaDetailSerializer, ChapterDetailSerializer, CommentSerializer, GenreSerializer, UserSerializer, BookmarkSerializer, ReadingHistorySerializer, RatingSerializer
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from .models import RATING_SCORES, MANGA_STATUSES, MANGA_TYPES, label_lookup, Manga, Chapter, Comment, Genre, Bookmark, ReadingHistory, Rating, SiteRollup, ViewRollup
+from .serializers import CHAPTER_ROW_FIELDS, chapter_rows, MangaSerializer, ChapterSerializer, ChapterListSerializer, ChapterDetailSerializer, CommentSerializer, GenreSerializer, UserSerializer, BookmarkSerializer, ReadingHistorySerializer, RatingSerializer
+from django.db import transaction
 from .permissions import IsOwnerOrAdminOrReadOnly
+from .counters import view_counter
+from .progress import progress_buffer, parse_event
+from .search import IndexedSearchFilter
+from .pagination import KeysetPagination, ChapterListPagination, CommentPagination
+from .facets import facet_index, genre_condition, split_param
+from . import rollups
+from .ingest import ingest_pages, IngestError
+from .conditional import ConditionalGetMixin, latest
+from .cache import CachedResponseMixin, response_cache
+from .images import preload_links
+from .projections import ProjectedReadMixin, MangaProjection, MangaDetailProjection, ChapterListProjection, ChapterDetailProjection, CommentProjection, BookmarkProjection, ReadingHistoryProjection
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     permission_classes = (permissions.AllowAny,)
     serializer_class = UserSerializer
 
+class CacheStatsView(APIView):
+    """Response cache hit/miss counts for this worker process"""
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return Response(response_cache.stats())
+
 class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = (permissions.IsAuthenticated,)
     serializer_class = UserSerializer
@@ -24,22 +44,70 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
 
-class BookmarkViewSet(viewsets.ModelViewSet):
+class BookmarkViewSet(ProjectedReadMixin, viewsets.ModelViewSet):
     serializer_class = BookmarkSerializer
+    projection_class = BookmarkProjection
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Bookmark.objects.filter(user=self.request.user)
+        # The related manga is joined in, never loaded per bookmark
+        return Bookmark.objects.filter(user=self.request.user).select_related('manga')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class ReadingHistoryViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def updates(self, request):
+        """
+        Bookmarked mangas with chapters past the user's last read one (or, if
+        they never opened it, released after bookmarking), most recently
+        updated first, with how many chapters are unread. One query.
+        """
+        progress_buffer.flush(user_id=request.user.id)
+        unread = (
+            Q(manga__chapters__sort_key__gt=F('progress__chapter__sort_key'))
+            | Q(progress__isnull=True, manga__chapters__released_at__gt=F('created_at'))
+        )
+        rows = (
+            Bookmark.objects.filter(user=request.user)
+            .annotate(progress=FilteredRelation('manga__readinghistory', condition=Q(manga__readinghistory__user=request.user)))
+            .values(
+                'id', 'manga', 'manga__title', 'manga__cover_image', 'manga__last_update_at',
+                'manga__latest_chapter', 'manga__latest_chapter__chapter_number',
+                'progress__chapter', 'progress__chapter__chapter_number', 'progress__page',
+            )
+            .annotate(unread_count=Count('manga__chapters', filter=unread))
+            .filter(unread_count__gt=0)
+            .order_by('-manga__last_update_at', '-manga')
+        )
+        timestamp = serializers.DateTimeField()
+        return Response({'results': [{
+            'bookmark': row['id'],
+            'manga': row['manga'],
+            'manga_title': row['manga__title'],
+            'manga_cover': row['manga__cover_image'],
+            'last_update_at': timestamp.to_representation(row['manga__last_update_at']),
+            'latest_chapter': {
+                'id': row['manga__latest_chapter'],
+                'chapter_number': row['manga__latest_chapter__chapter_number'],
+            } if row['manga__latest_chapter'] else None,
+            'last_read': {
+                'chapter': row['progress__chapter'],
+                'chapter_number': row['progress__chapter__chapter_number'],
+                'page': row['progress__page'],
+            } if row['progress__chapter'] else None,
+            'unread_count': row['unread_count'],
+        } for row in rows]})
+
+class ReadingHistoryViewSet(ProjectedReadMixin, viewsets.ModelViewSet):
     serializer_class = ReadingHistorySerializer
+    projection_class = ReadingHistoryProjection
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return ReadingHistory.objects.filter(user=self.request.user)
+        return ReadingHistory.objects.filter(user=self.request.user).select_related('manga', 'chapter')
 
     def perform_create(self, serializer):
         # Check if history exists for this manga, update it instead of creating new if logic requires
@@ -49,125 +117,432 @@ class ReadingHistoryViewSet(viewsets.ModelViewSet):
         # Let's override create to use update_or_create logic.
         pass
     
+    def list(self, request, *args, **kwargs):
+        # This worker's buffered progress first, so the reader sees where they
+        # stopped; entries buffered by other workers land with their next flush
+        progress_buffer.flush(user_id=request.user.id)
+        return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        progress_buffer.flush(user_id=request.user.id)
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=False, methods=['post'])
     def update_history(self, request):
-        manga_id = request.data.get('manga')
-        chapter_id = request.data.get('chapter')
-        
-        if not manga_id or not chapter_id:
+        """Record one position: {'manga', 'chapter', 'page'?}. Written with the next progress flush."""
+        if not request.data.get('manga') or not request.data.get('chapter'):
             return Response({'error': 'manga and chapter are required'}, status=400)
-            
-        history, created = ReadingHistory.objects.update_or_create(
-            user=request.user,
-            manga_id=manga_id,
-            defaults={'chapter_id': chapter_id}
-        )
-        
-        serializer = self.get_serializer(history)
-        return Response(serializer.data)
+        try:
+            chapter_id, manga_id, page, read_at = parse_event(request.data)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=400)
+        if Chapter.objects.filter(pk=chapter_id).values_list('manga_id', flat=True).first() != manga_id:
+            return Response({'error': 'chapter does not belong to manga'}, status=400)
+
+        progress_buffer.record(request.user.id, manga_id, chapter_id, page, read_at)
+        return Response({'manga': manga_id, 'chapter': chapter_id, 'page': page}, status=202)
+
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """
+        Many progress events at once: {'events': [{'chapter', 'manga'?, 'page'?, 'read_at'?}, ...]}.
+        The latest event per manga wins (by read_at, then position in the list);
+        invalid events are reported by index and the rest are still accepted.
+        """
+        events = request.data.get('events') if isinstance(request.data, dict) else None
+        if not isinstance(events, list):
+            return Response({'error': 'events must be a list'}, status=400)
+        limit = getattr(settings, 'READING_PROGRESS_SYNC_MAX_EVENTS', 500)
+        if len(events) > limit:
+            return Response({'error': f'at most {limit} events per sync'}, status=400)
+
+        parsed, rejected = [], []
+        for index, event in enumerate(events):
+            try:
+                parsed.append((index, *parse_event(event)))
+            except ValueError as exc:
+                rejected.append({'index': index, 'error': str(exc)})
 
-class GenreViewSet(viewsets.ModelViewSet):
+        # Every chapter's manga in one query
+        mangas = dict(Chapter.objects.filter(pk__in={event[1] for event in parsed}).values_list('pk', 'manga_id'))
+        accepted = 0
+        for index, chapter_id, manga_id, page, read_at in parsed:
+            if chapter_id not in mangas:
+                rejected.append({'index': index, 'error': 'unknown chapter'})
+            elif manga_id is not None and manga_id != mangas[chapter_id]:
+                rejected.append({'index': index, 'error': 'chapter does not belong to manga'})
+            else:
+                progress_buffer.record(request.user.id, mangas[chapter_id], chapter_id, page, read_at)
+                accepted += 1
+
+        rejected.sort(key=lambda item: item['index'])
+        return Response({'accepted': accepted, 'rejected': rejected}, status=202)
+
+class GenreViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
+    cache_scopes = ('genre',)
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
-class ChapterViewSet(viewsets.ModelViewSet):
+class ChapterViewSet(CachedResponseMixin, ConditionalGetMixin, ProjectedReadMixin, viewsets.ModelViewSet):
     queryset = Chapter.objects.all()
     serializer_class = ChapterDetailSerializer
+    projection_class = ChapterDetailProjection
+    cache_scopes = ('chapter',)
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ChapterListSerializer
+        return super().get_serializer_class()
+
+    def get_projection(self, projection_class=None, **context):
+        if projection_class is None and self.action == 'list':
+            # Pages are only served one chapter at a time
+            projection_class = ChapterListProjection
+        return super().get_projection(projection_class, **context)
+
+    def get_list_version(self, queryset):
+        # Generations rather than Count/Max over the whole chapter table (see MangaViewSet)
+        generations = response_cache.shared_generations(self.cache_scopes)
+        if generations is None:
+            return None
+        return generations, None
+
+    def get_object_version(self):
+        try:
+            state = Chapter.objects.filter(pk=self.get_lookup_value()).values_list('updated_at', 'comment_count').first()
+        except (TypeError, ValueError, DjangoValidationError):
+            return None
+        if state is None:
+            return None
+        return list(state), state[0]
+
+    @action(detail=False, methods=['get'])
+    def reader(self, request):
+        """
+        Everything the reader needs for one chapter: ?manga=<id>&number=<chapter number>
+        (or ?id=<chapter id>). Adds the previous chapter and the next one with its
+        pages, so the client can prefetch, and Link preload hints for the first pages.
+        """
+        cached = self.cached_response()
+        if cached is not None:
+            return cached
+
+        params = request.query_params
+        if params.get('id'):
+            lookup = {'pk': params['id']}
+        elif params.get('manga') and params.get('number'):
+            lookup = {'manga_id': params['manga'], 'chapter_number': params['number']}
+        else:
+            raise ValidationError({'detail': 'Pass ?id= or both ?manga= and ?number=.'})
+        try:
+            chapter = Chapter.objects.filter(**lookup).order_by(*Chapter.READING_ORDER).first()
+        except (TypeError, ValueError, DjangoValidationError):
+            chapter = None
+        if chapter is None:
+            raise NotFound()
+
+        # One indexed seek each way
+        previous = chapter.neighbours(forward=False).only('id', 'chapter_number', 'released_at').first()
+        following = chapter.neighbours().first()
+
+        response = Response({
+            'chapter': ChapterDetailSerializer(chapter).data,
+            'prev': ChapterSerializer(previous).data if previous else None,
+            'next': ChapterDetailSerializer(following).data if following else None,
+        })
+        links = preload_links(
+            chapter.pages, chapter.page_variants, getattr(settings, 'READER_PRELOAD_PAGES', 3),
+            absolute=request.build_absolute_uri,
+        )
+        if links:
+            response['Link'] = ', '.join(links)
+        return response
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
-        
-        # Handle file uploads
-        instance = serializer.instance
+
+        # Handle file uploads: pages are streamed to storage in parallel before
+        # the chapter row exists, so the chapter is inserted once with its pages.
         files = request.FILES.getlist('files_input')
-        
+        failed = []
         if files:
-            page_urls = []
-            for f in files:
-                # Save file to media
-                path = default_storage.save(f'chapters/{instance.manga.id}/{instance.chapter_number}/{f.name}', ContentFile(f.read()))
-                url = default_storage.url(path)
-                page_urls.append(url)
-            
-            instance.pages = page_urls
-            instance.save()
-            
-            # Refresh serializer data with updated pages
-            serializer = self.get_serializer(instance)
+            manga = serializer.validated_data['manga']
+            chapter_number = serializer.validated_data['chapter_number']
+            allow_partial = str(request.data.get('allow_partial', '')).lower() in ('1', 'true')
+            try:
+                result = ingest_pages(files, f'chapters/{manga.id}/{chapter_number}', allow_partial=allow_partial)
+            except IngestError as exc:
+                return Response({'error': str(exc), 'failed_pages': [name for name, _ in exc.failed]}, status=502)
+            failed = result.failed
+            if failed and not result.urls:
+                # Partial is fine, an empty chapter is not
+                return Response({'error': str(IngestError(failed)), 'failed_pages': [name for name, _ in failed]}, status=502)
 
+            try:
+                with transaction.atomic():
+                    serializer.save(pages=result.urls, page_variants=result.variants)
+            except Exception:
+                result.discard()
+                raise
+        else:
+            self.perform_create(serializer)
+
+        data = dict(serializer.data)
+        if failed:
+            data['failed_pages'] = [name for name, _ in failed]
         headers = self.get_success_headers(serializer.data)
-        return Response(serializer.data, status=201, headers=headers)
+        return Response(data, status=201, headers=headers)
 
-class MangaViewSet(viewsets.ModelViewSet):
+class MangaViewSet(CachedResponseMixin, ConditionalGetMixin, ProjectedReadMixin, viewsets.ModelViewSet):
     queryset = Manga.objects.all()
     serializer_class = MangaSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['title', 'description']
+    # Genres and the latest chapters come in one query each for the whole page
+    projection_class = MangaProjection
+    # Cards and details embed chapters and genre names
+    cache_scopes = ('manga', 'chapter', 'genre')
+    pagination_class = KeysetPagination
+    # ?search= is answered by the in-process inverted index (see search.py)
+    filter_backends = [IndexedSearchFilter]
+
+    # Supported ?ordering= values. Every one of them is served by an index
+    # declared on Manga.Meta.
+    ORDERINGS = {
+        'views': ('views', 'id'),
+        '-views': ('-views', '-id'),
+        'rating': ('rating', 'id'),
+        '-rating': ('-rating', '-id'),
+        'created_at': ('created_at', 'id'),
+        '-created_at': ('-created_at', '-id'),
+        'title': ('title', 'id'),
+        '-title': ('-title', '-id'),
+        # Most recently updated first
+        'last_update': ('-last_update_at', '-id'),
+        # Hottest right now (time-decayed views and releases, see trending.py)
+        'trending': ('-trending_score', '-id'),
+        # Older clients asked for -updated_at to mean "latest update"
+        '-updated_at': ('-last_update_at', '-id'),
+    }
 
     def get_queryset(self):
         queryset = Manga.objects.all()
-        
+        params = self.request.query_params
+
         # Filter by Featured
-        is_featured = self.request.query_params.get('is_featured')
-        if is_featured == 'true':
+        if params.get('is_featured') == 'true':
             queryset = queryset.filter(is_featured=True)
 
-        # Filter by Type (e.g., Manhwa, Manhua)
-        manga_type = self.request.query_params.get('type')
+        # Filter by Type (e.g., Manhwa, Manhua) and Status (e.g., Ongoing, Completed).
+        # Stored values are normalized on save, so known labels are exact, indexable lookups.
+        manga_type = params.get('type')
         if manga_type:
-            queryset = queryset.filter(type__iexact=manga_type)
+            queryset = queryset.filter(label_lookup('type', manga_type, MANGA_TYPES))
 
-        # Filter by Status (e.g., Ongoing, Completed)
-        status = self.request.query_params.get('status')
+        status = params.get('status')
         if status:
-            queryset = queryset.filter(status__iexact=status)
+            queryset = queryset.filter(label_lookup('status', status, MANGA_STATUSES))
+
+        # Filter by Genre: ?genre=Action,Fantasy&genre_mode=and|or&exclude_genre=Horror
+        # (&or_type=Manhwa also takes in mangas of that type), answered from the in-memory facet posting lists (see facets.py). A long
+        # match list would make a huge IN (...) (past SQLite's parameter limit),
+        # so past FACET_FILTER_MAX_IDS the genre join is left to the database.
+        genre_query = self.get_genre_query()
+        if genre_query['genres'] or genre_query['exclude_genres']:
+            facet_index.sync()
+            ids = facet_index.query(**genre_query)
+            if len(ids) <= getattr(settings, 'FACET_FILTER_MAX_IDS', 500):
+                queryset = queryset.filter(pk__in=ids)
+            else:
+                queryset = queryset.filter(genre_condition(**genre_query))
 
-        # Filter by Genre (contains)
-        genre = self.request.query_params.get('genre')
-        if genre:
-            queryset = queryset.filter(genres__name__icontains=genre)
-        
         # Ordering
-        ordering = self.request.query_params.get('ordering')
+        ordering = params.get('ordering')
         if ordering:
-            queryset = queryset.order_by(ordering)
-            
+            if ordering not in self.ORDERINGS:
+                raise ValidationError({'ordering': f'Unsupported ordering. Choose from: {", ".join(self.ORDERINGS)}.'})
+            queryset = queryset.order_by(*self.ORDERINGS[ordering])
+
         return queryset
 
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        
-        # Increment Views (Fail Silently if error occurs to prevent 500)
+    def get_chapter_limit(self):
+        """?chapters=N inlines only the first N chapters; the full list is paginated at /api/mangas/{id}/chapters/"""
+        limit = self.request.query_params.get('chapters')
+        if limit is None:
+            return None
         try:
-            # Increment Total Views
-            instance.views += 1
-            instance.save()
-
-            # Increment Daily Views
-            today = timezone.now().date()
-            daily_view, created = DailyView.objects.get_or_create(manga=instance, date=today)
-            daily_view.views += 1
-            daily_view.save()
-        except Exception:
-            # Handle race conditions or other errors gracefully
-            try:
-                today = timezone.now().date()
-                daily_view = DailyView.objects.get(manga=instance, date=today)
-                daily_view.views += 1
-                daily_view.save()
-            except Exception:
-                pass
-        
-        serializer = MangaDetailSerializer(instance)
-        return Response(serializer.data)
+            limit = int(limit)
+        except ValueError:
+            limit = -1
+        if limit < 0:
+            raise ValidationError({'chapters': 'Must be a non-negative number.'})
+        return limit
+
+    def get_genre_query(self):
+        params = self.request.query_params
+        genre_mode = params.get('genre_mode', 'and')
+        if genre_mode not in ('and', 'or'):
+            raise ValidationError({'genre_mode': 'Must be "and" or "or".'})
+        return {
+            'genres': split_param(params.get('genre')),
+            'genre_mode': genre_mode,
+            'exclude_genres': split_param(params.get('exclude_genre')),
+            'or_types': split_param(params.get('or_type')),
+        }
+
+    @action(detail=True, methods=['get'], pagination_class=ChapterListPagination)
+    def chapters(self, request, pk=None):
+        """
+        The manga's chapters as compact rows, cursor paginated: highest number
+        first, or lowest first with ?order=asc. Each page is a seek on
+        chapter_manga_sort_idx.
+        """
+        cached = self.cached_response()
+        if cached is not None:
+            return cached
+
+        try:
+            found = Manga.objects.filter(pk=pk).exists()
+        except (TypeError, ValueError):
+            found = False
+        if not found:
+            raise NotFound()
+        chapters = Chapter.objects.filter(manga_id=pk).only(*Chapter.LIST_FIELDS)
+        if request.query_params.get('order') == 'asc':
+            chapters = chapters.order_by(*Chapter.READING_ORDER)
+
+        page = self.paginate_queryset(chapters)
+        response = self.get_paginated_response(chapter_rows(page))
+        response.data['fields'] = CHAPTER_ROW_FIELDS
+        return response
+
+    # Manga fields /batch/ returns unless ?fields= / ?omit= say otherwise
+    BATCH_FIELDS = ('id', 'title', 'cover_image', 'type', 'status', 'rating', 'chapter_count', 'latest_chapter')
+
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """
+        Several mangas by id: ?ids=3,1,2 (results follow that order, unknown ids
+        are listed under `missing`). For a signed-in user every record also
+        carries their bookmark id, rating and last read chapter. One query for
+        the mangas and one per kind of user state, however many ids are sent.
+        """
+        try:
+            ids = list(dict.fromkeys(int(value) for value in split_param(request.query_params.get('ids'))))
+        except ValueError:
+            raise ValidationError({'ids': 'Must be a comma separated list of ids.'})
+        limit = getattr(settings, 'MANGA_BATCH_MAX_IDS', 100)
+        if not ids:
+            raise ValidationError({'ids': 'This parameter is required.'})
+        if len(ids) > limit:
+            raise ValidationError({'ids': f'At most {limit} ids per request.'})
+
+        fields = self.get_sparse_fields(MangaProjection)
+        projection = MangaProjection(self.get_serializer_context(), fields=self.BATCH_FIELDS if fields is None else fields)
+        rows = list(projection.values(Manga.objects.filter(pk__in=ids)))
+        projection.prepare(rows)
+        records = {row['id']: projection.to_representation(row) for row in rows}
+
+        if request.user.is_authenticated:
+            progress_buffer.flush(user_id=request.user.id)
+            bookmarks = dict(Bookmark.objects.filter(user=request.user, manga__in=records).values_list('manga', 'id'))
+            ratings = dict(Rating.objects.filter(user=request.user, manga__in=records).values_list('manga', 'score'))
+            history = {
+                row['manga']: row for row in ReadingHistory.objects.filter(user=request.user, manga__in=records)
+                .values('manga', 'chapter', 'chapter__chapter_number', 'last_read_at')
+            }
+            last_read_at = serializers.DateTimeField()
+            for manga_id, record in records.items():
+                read = history.get(manga_id)
+                record['user'] = {
+                    'bookmark': bookmarks.get(manga_id),
+                    'rating': ratings.get(manga_id),
+                    'last_read': {
+                        'chapter': read['chapter'],
+                        'chapter_number': read['chapter__chapter_number'],
+                        'last_read_at': last_read_at.to_representation(read['last_read_at']),
+                    } if read else None,
+                }
+
+        return Response({
+            'results': [records[manga_id] for manga_id in ids if manga_id in records],
+            'missing': [manga_id for manga_id in ids if manga_id not in records],
+        })
 
-class CommentViewSet(viewsets.ModelViewSet):
-    queryset = Comment.objects.all()
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Matching manga count plus per-genre/type/status counts within the result set"""
+        facet_index.sync()
+        ids = facet_index.query(
+            types=split_param(request.query_params.get('type')),
+            statuses=split_param(request.query_params.get('status')),
+            **self.get_genre_query(),
+        )
+        return Response({'count': len(ids), 'facets': facet_index.counts(ids)})
+
+    # Orderings moved by counter flushes and update_trending, which bump no generation
+    UNVERSIONED_ORDERINGS = ('views', '-views', 'trending')
+
+    def get_list_version(self, queryset):
+        # The cache generations move on every manga/chapter/genre write (see
+        # signals.py), so this is one cache read instead of a scan of the
+        # catalogue. They only version the list when the 'api' cache is shared
+        # (REDIS_URL); otherwise, and for orderings by counters, no ETag is sent.
+        if self.request.query_params.get('ordering') in self.UNVERSIONED_ORDERINGS:
+            return None
+        generations = response_cache.shared_generations(self.cache_scopes)
+        if generations is None:
+            return None
+        return generations, None
+
+    def get_object_version(self):
+        chapters = Chapter.objects.filter(manga=OuterRef('pk')).order_by()
+        comments = Comment.objects.filter(manga=OuterRef('pk')).order_by()
+        try:
+            state = Manga.objects.filter(pk=self.get_lookup_value()).annotate(
+                chapters_changed=Subquery(chapters.order_by('-updated_at').values('updated_at')[:1]),
+                comments_changed=Subquery(comments.order_by('-created_at').values('created_at')[:1]),
+            ).values(
+                'pk', 'updated_at', 'views', 'rating_sum', 'rating_count', 'trending_score',
+                'chapter_count', 'last_update_at', 'chapters_changed', 'comments_changed', 'comment_count',
+            ).first()
+        except (TypeError, ValueError, DjangoValidationError):
+            return None
+        if state is None:
+            return None
+        return list(state.values()), latest(state['updated_at'], state['chapters_changed'], state['comments_changed'])
+
+    def retrieve(self, request, *args, **kwargs):
+        cached = self.cached_response()
+        if cached is not None:
+            # Only successful lookups are cached, so the pk is valid
+            view_counter.incr(int(kwargs['pk']))
+            return cached
+
+        version = self.get_object_version()
+        not_modified = self.not_modified(version)
+        if not_modified is not None:
+            # A revalidated read is still a read (the version parts start with the pk)
+            view_counter.incr(version[0][0])
+            return not_modified
+
+        projection = self.get_projection(MangaDetailProjection, chapter_limit=self.get_chapter_limit())
+        row = self.get_object_row(projection)
+
+        # Views are buffered in memory and written back in batches,
+        # so reading a manga never writes to its row.
+        view_counter.incr(row['id'])
+
+        return Response(projection.one(row))
+
+class CommentViewSet(ProjectedReadMixin, viewsets.ModelViewSet):
+    # Authors are joined in; counts live on Manga/Chapter.comment_count
+    queryset = Comment.objects.select_related('user')
     serializer_class = CommentSerializer
+    projection_class = CommentProjection
+    # ?manga= / ?chapter= pages seek on comment_manga_created_idx / comment_chapter_created_idx
+    pagination_class = CommentPagination
     # permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrAdminOrReadOnly]
     
     def get_permissions(self):
@@ -198,6 +573,13 @@ class RatingViewSet(viewsets.ModelViewSet):
         if not manga_id or not score:
             return Response({'error': 'manga and score are required'}, status=400)
 
+        try:
+            score = int(score)
+        except (TypeError, ValueError):
+            score = None
+        if score not in RATING_SCORES:
+            return Response({'error': 'score must be between 1 and 5'}, status=400)
+
         rating, created = Rating.objects.update_or_create(
             user=request.user,
             manga_id=manga_id,
@@ -209,48 +591,51 @@ class RatingViewSet(viewsets.ModelViewSet):
 
 class AnalyticsViewSet(viewsets.ViewSet):
     def list(self, request):
-        # 1. Total Stats
-        total_mangas = Manga.objects.count()
-        total_views = Manga.objects.aggregate(Sum('views'))['views__sum'] or 0
-        total_chapters = Chapter.objects.count()
-        
-        # 2. Daily Views (Last 7 Days)
-        today = timezone.now().date()
-        last_7_days = today - timedelta(days=6)
-        
-        daily_stats = (
-            DailyView.objects.filter(date__gte=last_7_days)
-            .values('date')
-            .annotate(total_views=Sum('views'))
-            .order_by('date')
+        # ?range=7d (default), 90d, 12w, 12m ... served entirely from rollup tables
+        parsed = rollups.parse_range(request.query_params.get('range', '7d'))
+        if parsed is None:
+            return Response({'error': 'range must look like 30d, 12w or 12m'}, status=400)
+        period, count = parsed
+
+        today = timezone.localdate()
+        # Read-only: rollups are built by `manage.py build_rollups`; a stale
+        # build is still served, flagged with when it was made
+        latest = SiteRollup.objects.filter(period='day').order_by('-period_start').first()
+
+        # 1. Total Stats (snapshotted by the last rollup build)
+        # 2. Views per bucket (ensure all buckets are present)
+        buckets = rollups.bucket_starts(period, count, today)
+        stats_dict = dict(
+            SiteRollup.objects.filter(period=period, period_start__gte=buckets[0])
+            .values_list('period_start', 'views')
+        )
+        chart_data = [
+            {'date': start.strftime('%Y-%m-%d'), 'views': stats_dict.get(start, 0)}
+            for start in buckets
+        ]
+
+        # 3. Top Mangas over the requested range
+        top_mangas = (
+            ViewRollup.objects.filter(period=period, period_start__gte=buckets[0])
+            .values('manga', 'manga__title', 'manga__cover_image')
+            .annotate(total=Sum('views'))
+            .order_by('-total')[:5]
         )
-        
-        # Format for chart (ensure all days are present)
-        chart_data = []
-        current_date = last_7_days
-        stats_dict = {stat['date']: stat['total_views'] for stat in daily_stats}
-        
-        while current_date <= today:
-            chart_data.append({
-                'date': current_date.strftime('%Y-%m-%d'),
-                'views': stats_dict.get(current_date, 0)
-            })
-            current_date += timedelta(days=1)
-            
-        # 3. Top Mangas (Most Views All Time or Recent)
-        # Let's do Top 5 Most Viewed All Time for simplicity, or we can do recent
-        top_mangas = Manga.objects.order_by('-views')[:5]
         top_mangas_data = [
-            {'id': m.id, 'title': m.title, 'views': m.views, 'cover_image': m.cover_image}
+            {'id': m['manga'], 'title': m['manga__title'], 'views': m['total'], 'cover_image': m['manga__cover_image']}
             for m in top_mangas
         ]
 
         return Response({
-            'total_mangas': total_mangas,
-            'total_views': total_views,
-            'total_chapters': total_chapters,
+            'range': f"{count}{period[0]}",
+            'period': period,
+            'total_mangas': latest.total_mangas if latest else 0,
+            'total_views': latest.total_views if latest else 0,
+            'total_chapters': latest.total_chapters if latest else 0,
             'chart_data': chart_data,
-            'top_mangas': top_mangas_data
+            'top_mangas': top_mangas_data,
+            'built_at': latest.built_at if latest else None,
+            'stale': rollups.is_stale(latest, today),
         })
 
 class AdminUserViewSet(viewsets.ModelViewSet):